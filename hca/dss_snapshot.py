@@ -0,0 +1,206 @@
+"""In-memory restore of an OpenDSS circuit to its committed state.
+
+Instead of recompiling the feeder and replaying the full change line history
+every time the hca resets the circuit, DSSSnapshot records how to undo the
+change lines applied since the last restore (disable new elements, restore
+edited properties) and only applies the part of the history that is not yet
+in the circuit. The undo information of the committed lines is kept as well, so
+the circuit can also be rolled back to a shorter history (e.g. that of another
+scenario with the same start). Solution state that a run alters (transformer
+taps, capacitor states, storage energy, monitors, meters) is reset to the
+committed values.
+
+If a change line can not be undone, the restore fails and the caller is
+expected to fall back on a recompile.
+"""
+import re
+from i2x.api import get_control_state, set_control_state
+
+### property=value pairs, values can be grouped by (), [], "" or ''
+PROP_RE = re.compile(r"""(\S+?)=(\([^)]*\)|\[[^\]]*\]|"[^"]*"|'[^']*'|\S+)""")
+
+### commands that do not alter the circuit definition
+PASSIVE = ["?", "set", "solve", "closedi", "show", "export", "select", "sample", "calcvoltagebases"]
+
+### classes of elements that are kept when undoing their creation (harmless and reused)
+KEEP = ["monitor"]
+
+### controls only collect the elements they control when created. When such a control is
+### re-defined via edit, the list of controlled elements needs to be passed explicitly.
+CONTROL_LISTS = {"invcontrol": ("derlist", ["pvsystem", "storage"]), "expcontrol": ("pvsystemlist", ["pvsystem"])}
+
+def split_line(line:str) -> tuple[str, str, str]:
+  """split a dss line into command, object and the remaining arguments"""
+  parts = line.strip().split(None, 2) + ["", ""]
+  return parts[0].lower(), parts[1], parts[2]
+
+def format_value(val:str) -> str:
+  val = val.strip()
+  if (val[:1] in "([\"'") or (" " not in val):
+    return val
+  return f"({val})"
+
+class DSSSnapshot:
+  """Wrapper around a py_dss_interface DSS instance.
+  All attributes are passed through to the dss instance. Lines sent via text()
+  are applied as is, except that `new` is turned into `edit` for elements
+  that already exist from a previous run.
+  Lines sent via apply() are recorded together with their inverse so they can
+  be undone by restore().
+  """
+  def __init__(self, dss):
+    self._dss = dss
+    self.committed = []   # change lines in the circuit that are part of the history
+    self.inverses = []    # inverse of each committed line (None if not invertible)
+    self.applied = []     # [line, inverse] for change lines applied since the last restore
+    self.existing = set() # elements created via text() or apply()
+    self.disabled = set() # elements created via apply() and disabled by a restore
+    self.disabled_class = set() # elements created via text() and disabled by disable_class
+    self.state = {}
+
+  def __getattr__(self, name):
+    return getattr(self._dss, name)
+
+  def text(self, line:str):
+    cmd, obj, args = split_line(line)
+    if cmd == "new":
+      if obj.lower() in self.existing:
+        if obj.lower() in self.disabled_class:
+          self.disabled_class.discard(obj.lower())
+          args = f"enabled=yes {args}"
+        line = f"edit {obj} {args}"
+        if obj.split(".")[0].lower() in CONTROL_LISTS:
+          line += f" {self.control_list(obj)}"
+      self.existing.add(obj.lower())
+    return self._dss.text(line)
+
+  def disable_class(self, cls:str):
+    """disable all elements of class cls, those created via text() are enabled again when re-defined"""
+    self._dss.text(f"batchedit {cls}..* enabled=no")
+    self.disabled_class.update(e for e in self.existing if e.split(".")[0] == cls)
+
+  def control_list(self, obj:str) -> str:
+    """list of all the elements a control would collect on creation"""
+    prop, classes = CONTROL_LISTS[obj.split(".")[0].lower()]
+    names = []
+    for c in classes:
+      elems = self._dss.pvsystems.names if c == "pvsystem" else self._dss.storages.names
+      names.extend(f"{c}.{n}" if prop == "derlist" else n for n in elems if n.lower() != "none")
+    return f"{prop}=[{' '.join(names)}]"
+
+  def commit(self, lines:list):
+    """apply lines that are part of the history"""
+    for l in lines:
+      self.inverses.append(self._apply(l, record=True))
+    self.committed.extend(lines)
+
+  def apply(self, lines:list):
+    """apply change lines, keeping track of how to undo them"""
+    for l in lines:
+      self.applied.append([l, self._apply(l, record=True)])
+
+  def _apply(self, line:str, record:bool):
+    """apply a single line and return its inverse (None if not invertible)"""
+    cmd, obj, args = split_line(line)
+    key = obj.lower()
+    if cmd == "new":
+      if key in self.disabled:
+        self.disabled.discard(key)
+        self._dss.text(f"edit {obj} enabled=yes {args}")
+      elif record and (key in self.existing):
+        self._dss.text(line)
+        return None # re-definition of an existing element, can't be undone
+      else:
+        self._dss.text(line)
+      self.existing.add(key)
+      if key.split(".")[0] in KEEP:
+        return ""
+      return f"edit {obj} enabled=no"
+    elif cmd == "edit":
+      props = PROP_RE.findall(args)
+      if not record:
+        self._dss.text(line)
+        return None
+      if len(props) != len(args.split()):
+        inverse = None # positional arguments
+      else:
+        old = [(p, self._dss.text(f"? {obj}.{p}")) for p, _ in props]
+        inverse = f"edit {obj} " + " ".join(f"{p}={format_value(v)}" for p, v in old)
+      self._dss.text(line)
+      return inverse
+    elif cmd == "batchedit":
+      cls, _, pattern = obj.partition("..")
+      props = PROP_RE.findall(args)
+      inverse = None
+      if record and (pattern in ["*", ".*"]) and (len(props) == len(args.split())):
+        # all elements of the class, restored one by one
+        self._dss.circuit.set_active_class(cls)
+        names = [n for n in self._dss.active_class.names if n.lower() != "none"]
+        inverse = "\n".join(f"edit {cls}.{n} " + " ".join(f"{p}={format_value(self._dss.text(f'? {cls}.{n}.{p}'))}" for p, _ in props)
+                            for n in names)
+      self._dss.text(line)
+      return inverse
+    elif cmd in PASSIVE:
+      self._dss.text(line)
+      return ""
+    self._dss.text(line)
+    return None
+
+  def undo(self, lines:list[list]):
+    for l, inverse in reversed(lines):
+      if not inverse:
+        continue
+      for il in inverse.split("\n"):
+        self._dss.text(il)
+      cmd, obj, _ = split_line(l)
+      if cmd == "new":
+        self.disabled.add(obj.lower())
+
+  def restore(self, history:list) -> bool:
+    """restore the circuit to the state given by the change line history.
+    Committed lines that are not part of it are rolled back.
+    Returns False if this is not possible without a recompile.
+    """
+    n = len(self.committed)
+    if history[:n] != self.committed:
+      # longest common prefix, the rest of the committed lines is rolled back
+      n = 0
+      while (n < len(history)) and (n < len(self.committed)) and (history[n] == self.committed[n]):
+        n += 1
+    delta = history[n:]
+    rollback = [[l, inverse] for l, inverse in zip(self.committed[n:], self.inverses[n:])]
+    ## changes applied since the last restore that are now part of the history are kept
+    k = 0
+    while (not rollback) and (k < len(delta)) and (k < len(self.applied)) and (self.applied[k][0] == delta[k]):
+      k += 1
+    if any(inverse is None for _, inverse in self.applied[k:] + rollback):
+      return False
+
+    self.undo(self.applied[k:])
+    self.committed.extend(delta[:k])
+    self.inverses.extend(inverse for _, inverse in self.applied[:k])
+    self.applied = []
+    self.set_state()
+    ## the rolled back lines restore the properties they changed (the solution state is reset above)
+    self.undo(rollback)
+    del self.committed[n:n + len(rollback)], self.inverses[n:n + len(rollback)]
+    self.commit(delta[k:])
+    self.get_state()
+    return True
+
+  def get_state(self):
+    """save the solution state of the committed circuit"""
+    self.state = get_control_state(self._dss)
+    self.state["storage"] = {}
+    for name in self._dss.storages.names:
+      if name.lower() != "none":
+        self.state["storage"][name] = {p: self._dss.text(f"? storage.{name}.{p}") for p in ["%stored", "state"]}
+
+  def set_state(self):
+    """reset the solution state to the committed circuit"""
+    set_control_state(self._dss, self.state)
+    for name, vals in self.state["storage"].items():
+      self._dss.text(f"edit storage.{name} " + " ".join(f"{p}={v}" for p, v in vals.items()))
+    for what in ["monitors", "meters", "eventlog", "controls"]:
+      self._dss.text(f"reset {what}")
+    self._dss.text("set hour=0 sec=0")
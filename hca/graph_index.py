@@ -0,0 +1,108 @@
+"""Incremental maintenance of the parsed feeder graph (graph_dirs).
+
+i2x.parse_opendss_graph visits every node of the feeder graph. The hca only
+changes a few nodes between parses (the bus of the resource being added or
+removed), so GraphIndex keeps the entries of each node and only re-parses the
+nodes that changed. The dictionaries are kept in node order, so that they are
+identical to those of a full parse (the order matters for random sampling).
+"""
+from bisect import insort
+import i2x.api as i2x
+from i2x.plot_opendss_feeder import GRAPH_DIRS
+
+class GraphIndex:
+  def __init__(self, G):
+    self.G = G
+    self.nodes = list(G.nodes())
+    self.pos = {n: i for i, n in enumerate(self.nodes)}
+    self.entries = {}
+    self.loadkw = {}
+    self.members = {d: [] for d in GRAPH_DIRS} # positions of the nodes with entries, sorted
+    for i, n in enumerate(self.nodes):
+      self.entries[n], self.loadkw[n] = i2x.parse_opendss_node(G, n)
+      for d in self.entries[n]:
+        self.members[d].append(i)
+    self.dirs = {}
+    for d in GRAPH_DIRS:
+      self._rebuild(d)
+    self.total_loadkw = self._sum_loadkw()
+
+  def update(self, nodes):
+    """re-parse the given nodes"""
+    changed = set()
+    loads_changed = False
+    for n in nodes:
+      old = self.entries[n]
+      new, kw = i2x.parse_opendss_node(self.G, n)
+      for d in set(old).union(new):
+        if old.get(d) == new.get(d):
+          continue
+        changed.add(d)
+        if d not in old:
+          insort(self.members[d], self.pos[n])
+        elif d not in new:
+          self.members[d].remove(self.pos[n])
+      self.entries[n] = new
+      if kw != self.loadkw[n]:
+        self.loadkw[n] = kw
+        loads_changed = True
+    for d in changed:
+      self._rebuild(d)
+    if loads_changed:
+      self.total_loadkw = self._sum_loadkw()
+
+  def graph_dirs(self) -> dict:
+    """same as i2x.parse_opendss_graph (dictionaries of unchanged categories are reused)"""
+    return {**self.dirs, "loadkw": self.total_loadkw}
+
+  def _rebuild(self, d):
+    ## a new dictionary, so that earlier results are not altered
+    out = {}
+    for i in self.members[d]:
+      out.update(self.entries[self.nodes[i]][d])
+    self.dirs[d] = out
+
+  def _sum_loadkw(self) -> float:
+    total = 0.0
+    for n in self.nodes:
+      total += self.loadkw[n]
+    return total
+
+class ShuntIndex:
+  """Buses of the shunts (class.key) of the feeder graph, and the shunts of each bus by class.
+  Kept up to date through add/remove, together with the shunt lists of the graph nodes.
+  """
+  def __init__(self, G):
+    self.G = G
+    self.bus = {}
+    self.by_bus = {}
+    for n, d in G.nodes(data=True):
+      for s in d.get("ndata", {}).get("shunts", []):
+        self.bus.setdefault(s, n)
+        self.by_bus.setdefault(n, {}).setdefault(s.split(".")[0], []).append(s)
+
+  def add(self, bus, name, first=False):
+    """add shunt name to bus (first: prepend to the shunt list)"""
+    shunts = self.G.nodes[bus]["ndata"]["shunts"]
+    byclass = self.by_bus.setdefault(bus, {}).setdefault(name.split(".")[0], [])
+    if first:
+      shunts.insert(0, name)
+      byclass.insert(0, name)
+    else:
+      shunts.append(name)
+      byclass.append(name)
+    self.bus.setdefault(name, bus)
+
+  def remove(self, bus, name):
+    self.G.nodes[bus]["ndata"]["shunts"].remove(name)
+    self.by_bus[bus][name.split(".")[0]].remove(name)
+    if self.bus.get(name) == bus:
+      del self.bus[name]
+
+  def node(self, name):
+    """bus of shunt name, None if not found"""
+    return self.bus.get(name)
+
+  def names(self, bus, nclass) -> list:
+    """shunts of class nclass at bus"""
+    return self.by_bus.get(bus, {}).get(nclass, [])
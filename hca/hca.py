@@ -9,11 +9,21 @@ import islands as isl
 import numpy as np
 import py_dss_interface
 from hca_utils import Logger, merge_configs
+from dss_snapshot import DSSSnapshot
+from result_cache import ResultCache, config_key
+from graph_index import GraphIndex, ShuntIndex
+from result_store import ResultStore
+import sensitivity as sens
+import warm_start as ws
 import os
 import pandas as pd
 import copy
 import hashlib
 import pickle
+import tempfile
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 
 SQRT3 = math.sqrt(3.0)
@@ -108,14 +118,18 @@ def get_regcontrol(dss:py_dss_interface.DSSDLL, xfrm:str) -> int:
     idx = dss.regcontrols.next()
   return idx
 
-def get_volt_stats(d:dict) -> dict:
-  try:
-    return {"min": np.min([v["vmin"]/(1000*v["basekv"]/SQRT3) for _,v in d.items()]),
-            "max": np.max([v["vmax"]/(1000*v["basekv"]/SQRT3) for _,v in d.items()]),
-            "diff": np.max([100*v["vdiff"]/(1000*v["basekv"]/SQRT3) for _,v in d.items()])}
-  except ValueError:
-    # if arrays are empty
+def monitor_table(d) -> i2x.MonitorTable:
+  """monitor results as MonitorTable, also for results with one dictionary per element (e.g. saved earlier)"""
+  return d if isinstance(d, i2x.MonitorTable) else i2x.MonitorTable(d)
+
+def get_volt_stats(d) -> dict:
+  d = monitor_table(d)
+  if (len(d) == 0) or ("v" not in d.channels):
     return {"min": None, "max": None, "diff": None}
+  vbase = d.vbase()
+  return {"min": np.min(d.vmin/vbase),
+          "max": np.max(d.vmax/vbase),
+          "diff": np.max(100*d.vdiff/vbase)}
 
 def dict_key_comp(d:list[dict], key:str, f):
   """compare values in a list of dictionaries with the same key using function f
@@ -181,19 +195,20 @@ def calc_di_voltage_stats(di_voltexception:pd.DataFrame, vmin=0.95, vmax=1.05, w
   If Worst case is True, then limits are min(vmin_calc, vmin), max(vmax_calc, vmax) rather
   than simply reporting the limits directly.
   """
-  vlimmin = di_voltexception.loc[:, ["MinVoltage", "MinLVVoltage"]].min()
-  vlimmax = di_voltexception.loc[:, ["MaxVoltage", "MaxLVVoltage"]].max()
+  cols = ["MinVoltage", "MinLVVoltage", "MaxVoltage", "MaxLVVoltage"]
+  v = di_voltexception[cols].to_numpy(dtype=float)
+  # min/max skipping missing values (nan if there are none)
+  vlimmin = np.fmin.reduce(v[:, :2], axis=0, initial=np.nan)
+  vlimmax = np.fmax.reduce(v[:, 2:], axis=0, initial=np.nan)
   if worst_case:
-    vlimmin = vlimmin.apply(lambda x: min(vmin, x))
-    vlimmax = vlimmax.apply(lambda x: max(vmax, x))
-      
-  return pd.concat([
-            pd.concat([vlimmin, vlimmax]).rename("limits"),
-            pd.concat([
-                di_voltexception.loc[:, ["MinVoltage", "MinLVVoltage"]].applymap(lambda x: max(0, vmin - x)).transpose().dot(np.diff(np.insert(di_voltexception.index, 0, [0]))),
-                di_voltexception.loc[:, ["MaxVoltage", "MaxLVVoltage"]].applymap(lambda x: max(0, x-vmax)).transpose().dot(np.diff(np.insert(di_voltexception.index, 0, [0])))
-            ]).rename("integral")
-          ], axis= 1)
+    vlimmin = np.fmin(vlimmin, vmin)
+    vlimmax = np.fmax(vlimmax, vmax)
+  
+  ## deviation beyond the limits (0 for missing values) integrated over the time steps
+  dt = np.diff(di_voltexception.index.to_numpy(dtype=float), prepend=0)
+  integral = np.concatenate([np.nan_to_num(np.clip(vmin - v[:, :2], 0, None)).transpose().dot(dt),
+                             np.nan_to_num(np.clip(v[:, 2:] - vmax, 0, None)).transpose().dot(dt)])
+  return pd.DataFrame({"limits": np.concatenate([vlimmin, vlimmax]), "integral": integral}, index=cols)
 
 def upgrade_line(dss:py_dss_interface.DSSDLL, change_lines:list, name:str, factor:float=2):
   """Decrease length and increase rating by factor (intended to simulate e.g. paralleling line of line (factor=2)) """
@@ -258,10 +273,62 @@ def next_xfrm_kva(kva, nphase, skip=0) -> float:
     return -1
   
 
+### attributes that are not saved by HCA.save (derived or rebuilt by HCA.load)
+SAVE_SKIP = ["logger", "random_state", "dss", "metrics", "lastres", "result_cache", "graph_index", "shunt_index",
+             "journal", "journal_nodes", "feeder_distance", "search_evals", "search_margins", "search_last"]
+
+### attributes that are not journaled as attribute deltas by HCA.checkpoint (not saved, journaled on their own or derived)
+JOURNAL_SKIP = SAVE_SKIP + ["dirty_nodes", "G", "graph_dirs", "comps", "reclosers", "comp2rec", "comp_incidence",
+                            "change_lines_history", "data"]
+
+def _digest(v) -> bytes:
+  return hashlib.sha1(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)).digest()
+
+def attr_digests(v):
+  """digests of an attribute, per item of lists and per key of (nested) dictionaries"""
+  if isinstance(v, dict):
+    return ("dict", {k: attr_digests(x) for k, x in v.items()})
+  if isinstance(v, list):
+    return ("list", [_digest(x) for x in v])
+  return ("value", _digest(v))
+
+def attr_delta(v, old, new):
+  """change of attribute v (digests new) since it had digests old: None, ("set", value),
+  ("extend", items appended to a list) or ("update", {key: delta}, removed keys) of a dictionary"""
+  if (old is None) or (old[0] != new[0]):
+    return ("set", copy.deepcopy(v))
+  if new[0] == "dict":
+    changed = {}
+    for k, d in new[1].items():
+      dk = attr_delta(v[k], old[1].get(k), d)
+      if dk is not None:
+        changed[k] = dk
+    removed = [k for k in old[1] if k not in new[1]]
+    return ("update", changed, removed) if changed or removed else None
+  if new[0] == "list":
+    n = len(old[1])
+    if new[1][:n] != old[1]:
+      return ("set", copy.deepcopy(v))
+    return ("extend", copy.deepcopy(v[n:])) if len(v) > n else None
+  return ("set", copy.deepcopy(v)) if new[1] != old[1] else None
+
+def apply_attr_delta(v, delta):
+  """attribute v changed by delta (see attr_delta)"""
+  if delta[0] == "set":
+    return delta[1]
+  if delta[0] == "extend":
+    v.extend(delta[1])
+    return v
+  for k, d in delta[1].items():
+    v[k] = apply_attr_delta(v.get(k), d)
+  for k in delta[2]:
+    v.pop(k, None)
+  return v
+
 class HCA:
-  def __init__(self, inputs, logger_heading=None, reload=False, reload_filemode="a"):
+  def __init__(self, inputs, logger_heading=None, reload=False, reload_filemode="a", reload_log=None):
     if reload:
-      self.load(inputs, filemode=reload_filemode, reload_heading=logger_heading)
+      self.load(inputs, filemode=reload_filemode, reload_heading=logger_heading, log_config=reload_log)
       return
     self.inputs = inputs
     self.change_lines = []
@@ -274,6 +341,11 @@ class HCA:
     
     self.print_config()
 
+    self.graph_index = None # incremental parse of the graph, see parse_graph
+    self.dirty_nodes = set() # nodes changed since the last parse
+    self.journal = None # position of the last checkpoint, see checkpoint
+    self.journal_nodes = set() # nodes changed since the last checkpoint
+
     ## establish a random seed for reproducibility
     # generate a 32bit seed based on the choice of feeder
     seed = int.from_bytes(hashlib.sha256(f'{inputs["choice"]}'.encode()).digest()[:4], 'little')
@@ -287,7 +359,7 @@ class HCA:
     self.print_parsed_graph()
 
     ## initialize dss model
-    self.dss = i2x.initialize_opendss(**self.inputs)
+    self.dss = self.compile_dss()
     self.update_basekv()
 
     ## create a set of voltage monitors throughout the feeder
@@ -299,10 +371,20 @@ class HCA:
     self.active_bus = None
     self.active_bus_kv = None
     self.cnt = 0 # iteration
+    self.screen_steps = None # critical time steps for screening the search trials (set by runbase)
+    self.screen_states = None
+    self.screening = False
+    self.sensitivity = {} # estimated limits by resource type (see sensitivity_screen)
+    self.sensitivity_at = {} # (round, length of the change line history) of the screen by resource type
+    self.search_guesses = [] # trial capacities [kW] to try first in the next search (see pop_search_guess)
+    self.search_evals = {} # evaluations of the full runs without violations of the current search by kW (see hc_search)
+    self.search_margins = {} # margins of the converged full runs of the current search by kW (see _hc_search)
+    self.search_last = None # capacity [kW] of the last run of the current search
+    self.feeder_distance = None # distances between buses for the warm start (see neighbor_limits)
     # Stotal is keyed by cnt (steps through HCA process)
     # Sij, hc, and eval are keyed by type -> node (i) -> cnt (step through HCA process)
     #      |--> note that these will be sparse since we only have info on a node if it is being altered 
-    self.data = {"Stotal": {}, "Sij": {}, "hc": {}, "eval": {}}
+    self.data = ResultStore()
 
     ## upgrades are keys by object typ -> object name -> cnt (step through HCA process) -> object specifics
     ###  lines: 
@@ -311,6 +393,13 @@ class HCA:
     self.metrics = HCAMetrics(inputs["metrics"]["limits"], 
                               tol=inputs["metrics"]["tolerances"],
                               logger=self.logger)
+    self.result_cache = self.init_result_cache()
+
+  def init_result_cache(self):
+    cfg = self.inputs["result_cache"]
+    if not cfg["enabled"]:
+      return None
+    return ResultCache(size=cfg["size"], path=cfg["path"], model=i2x.feeder_model_hash(self.inputs["choice"]))
 
   def logger_init(self, logger_heading):
     self.logger = Logger(self.inputs["hca_log"]["logname"], 
@@ -325,12 +414,12 @@ class HCA:
 
   def save(self, filename):
     """Save the HCA for later re-instantiation vie load
-    filename is a pickle file to save
+    filename is a pickle file to save. It is replaced only once completely written.
+    Returns the id of the save, that checkpoint journal entries refer to.
     """
     out = {}
-    skip = ["logger", "random_state", "dss", "metrics", "lastres"]
     for k, v in self.__dict__.items():
-      if k in skip:
+      if k in SAVE_SKIP:
         continue
       else:
         out[k] = copy.deepcopy(v)
@@ -339,39 +428,146 @@ class HCA:
     out["metrics_baseres"] = copy.deepcopy(self.metrics.base.res)
     out["lastres"] = {k: copy.deepcopy(v) for k, v in self.lastres.items() if k != "dss"}
     # out["G"] = json.dumps(self.G, default=nx.node_link_data)
+    out["base_id"] = os.urandom(8).hex()
 
-    with open(filename, "wb") as f:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
       pickle.dump(out, f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, filename)
+    return out["base_id"]
   
-  def load(self, filename, filemode=None, reload_heading=None):
+  def load(self, filename, filemode=None, reload_heading=None, log_config=None):
     """Load a saved state of the HCA.
     filename should be a pickle file
+    log_config is an optional (partial) hca_log configuration that overrides the saved one
     """
     with open(filename, "rb") as f:
       tmp = pickle.load(f)
 
-    skip = ["state"]    
+    skip = ["state", "base_id"]    
     for k, v in tmp.items():
       if k not in skip:
         setattr(self, k, v)
+    self.graph_index = None
+    self.feeder_distance = None
+    self.dirty_nodes = getattr(self, "dirty_nodes", set())
+    if not isinstance(self.data, ResultStore):
+      # saved with the nested dictionaries
+      self.data = ResultStore.from_nested(self.data)
+    self.journal = None
+    self.journal_nodes = set()
+    state = self.replay_journal(f"{filename}.journal", tmp.get("base_id"))
+    if state is not None:
+      tmp["state"] = state
+    self.shunt_index = ShuntIndex(self.G)
 
     # self.G = nx.node_link_graph(tmp["G"], directed=True)
 
     if filemode is not None:
       # make it possible to append to file
       self.inputs["hca_log"]["logtofilemode"] = filemode
+    if log_config is not None:
+      merge_configs(self.inputs["hca_log"], log_config)
     self.logger_init(reload_heading)
 
     self.metrics = HCAMetrics(self.inputs["metrics"]["limits"], 
                               tol=self.inputs["metrics"]["tolerances"],
                               logger=self.logger)
     self.metrics.set_base(tmp["metrics_baseres"])
+    self.result_cache = self.init_result_cache()
 
     self.reset_dss(clear_changes=False)
 
     self.random_state = np.random.RandomState()
     self.random_state.set_state(tmp["state"])
 
+  def checkpoint(self, filename, base=False):
+    """Checkpoint the study for a later reload via HCA(filename, reload=True).
+    The first checkpoint (or base=True) saves the full state to filename, subsequent
+    ones append the changes since the previous checkpoint (graph nodes, change line history,
+    round results, changes of the other attributes and random state) to the journal <filename>.journal.
+    Journal entries are tagged with the id of their base, so the entries of a replaced base are never replayed.
+    """
+    journal = f"{filename}.journal"
+    digests = {k: attr_digests(v) for k, v in self.__dict__.items() if k not in JOURNAL_SKIP}
+    if base or (self.journal is None) or (self.journal["file"] != filename) or not os.path.exists(filename):
+      base_id = self.save(filename)
+      open(journal, "wb").close()
+    else:
+      base_id = self.journal["base"]
+      nodes = self.journal_nodes.union(self.dirty_nodes)
+      delta = {"nodes": {n: copy.deepcopy(self.G.nodes[n]) for n in nodes},
+               "history": self.change_lines_history[self.journal["history"]:],
+               "rows": self.data.rows(self.journal["rows"]),
+               "stotal": {k: v for k, v in self.data["Stotal"].items() if k not in self.journal["stotal"]},
+               "attrs": {},
+               "state": self.random_state.get_state(), "base": base_id}
+      for k, d in digests.items():
+        dk = attr_delta(getattr(self, k), self.journal["digests"].get(k), d)
+        if dk is not None:
+          delta["attrs"][k] = dk
+      with open(journal, "ab") as f:
+        pickle.dump(delta, f)
+        f.flush()
+        os.fsync(f.fileno())
+    self.journal = {"file": filename, "base": base_id, "history": len(self.change_lines_history), 
+                    "rows": len(self.data.vals), "stotal": set(self.data["Stotal"].keys()), "digests": digests}
+    self.journal_nodes = set()
+    self.data.mark()
+
+  def replay_journal(self, journal, base_id=None):
+    """Apply the checkpoint journal of the base base_id to the loaded state. 
+    Returns the random state of the last checkpoint (None if there is no journal).
+    An incomplete last entry (e.g. a crash while writing) is ignored, as are the entries
+    of another base (e.g. a crash after replacing the base, before the journal was cleared).
+    """
+    if not os.path.exists(journal):
+      return None
+    state = None
+    with open(journal, "rb") as f:
+      while True:
+        try:
+          delta = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+          break
+        if delta.get("base") != base_id:
+          continue
+        for n, d in delta["nodes"].items():
+          self.G.nodes[n].clear()
+          self.G.nodes[n].update(d)
+        self.change_lines_history.extend(delta["history"])
+        for row in delta["rows"]:
+          self.data.append(*row)
+        self.data["Stotal"].update(delta["stotal"])
+        for k, d in delta["attrs"].items():
+          setattr(self, k, apply_attr_delta(getattr(self, k, None), d))
+        state = delta["state"]
+    if state is not None:
+      self.dirty_nodes = set()
+      self.parse_graph(full=True)
+    return state
+
+  def copy_state(self):
+    """Return a copy of the mutable study state (graph, change lines, data, etc.)
+    that can be reinstated later via restore_state. The dss object is not included.
+    """
+    keys = ["G", "graph_dirs", "pvbases", "change_lines", "change_lines_noprint", "change_lines_history",
+            "upgrade_change_lines", "visited_buses", "exauhsted_buses", "cnt", "data", "upgrades"]
+    out = {k: copy.deepcopy(getattr(self, k)) for k in keys}
+    out["state"] = self.random_state.get_state()
+    return out
+
+  def restore_state(self, state):
+    """Reinstate a study state obtained via copy_state"""
+    for k, v in state.items():
+      if k != "state":
+        setattr(self, k, copy.deepcopy(v))
+    self.shunt_index = ShuntIndex(self.G) # the graph was replaced
+    self.random_state.set_state(state["state"])
+    self.unset_active_bus()
+
   def print_config(self, level="info"):
     if level == "info":
       print_config(self.inputs, printf=self.logger.info)
@@ -393,11 +589,11 @@ class HCA:
     if typ not in ["pv", "bat", "der"]:
       raise ValueError("Currently Only differentiating on pv, bat, der")
     
-    if typ not in self.data[key]:
-      self.data[key][typ] = {}  
-    if self.active_bus not in self.data[key][typ]:
-      self.data[key][typ][self.active_bus] = {}
-    self.data[key][typ][self.active_bus][self.cnt] = copy.deepcopy(vals)
+    self.data.append(key, typ, self.active_bus, self.cnt, vals)
+
+  def export_results(self, path:str):
+    """Write the table of round results to a Parquet (.parquet) or SQLite (.db) file"""
+    self.data.export(path)
   
   def update_upgrades(self, typ:str, name:str, vals:dict, cnt=None):
     "update the upgrades storage values"
@@ -431,14 +627,35 @@ class HCA:
   # def dss_state_nontmp2tmp(self):
   #   self.change_lines_history["tmp"] = copy.deepcopy(self.change_lines_history["nontmp"])
 
+  def compile_dss(self):
+    """compile the feeder. With reset_mode "snapshot" the dss instance is wrapped
+    so that resets can be done in memory (see dss_snapshot.py)
+    """
+    dss = i2x.initialize_opendss(**self.inputs)
+    if self.inputs["reset_mode"] == "snapshot":
+      dss = DSSSnapshot(dss)
+      dss.get_state()
+    return dss
+
   def reset_dss(self, clear_changes=True):
-    """recompile feeder and load changes from history"""
+    """recompile feeder and load changes from history.
+    With reset_mode "snapshot" the circuit is restored in memory where possible,
+    applying only the changes not yet in the circuit.
+    """
     # key = "tmp" if tmp else "nontmp"
     if clear_changes:
       self.clear_changelines()
-    self.dss = i2x.initialize_opendss(**self.inputs)
-    for l in self.change_lines_history:
-      self.dss.text(l)
+    if isinstance(getattr(self, "dss", None), DSSSnapshot) and self.dss.restore(self.change_lines_history):
+      return
+    self.dss = self.compile_dss()
+    if isinstance(self.dss, DSSSnapshot):
+      self.dss.commit(self.change_lines_history)
+      self.dss.get_state()
+    else:
+      script = self.inputs["change_script"]
+      if script is not None:
+        script = os.path.splitext(script)[0] + "_history.dss"
+      i2x.dss_lines(self.dss, self.change_lines_history, False, batch=self.inputs["batch_changes"], script=script)
 
   def save_circuit(self, filename=None, dirname=None):
     filearg = ''
@@ -457,7 +674,7 @@ class HCA:
 
   def replay_resource_addition(self, typ, bus, cnt):
           key = self.resource_key(typ, bus, cnt)
-          self.new_capacity(typ, key, bus=bus, **self.data["Sij"][typ][bus][cnt])
+          self.new_capacity(typ, key, bus=bus, **self.data.get("Sij", typ, bus, cnt))
 
   def resource_key(self, typ, bus, cnt):
     return f"{typ}_{bus}_cnt{cnt}"
@@ -468,41 +685,69 @@ class HCA:
       basekv = self.dss.bus.kv_base*SQRT3
       if self.G.nodes[n]["ndata"]["nomkv"] == 0:
         self.G.nodes[n]["ndata"]["nomkv"] = basekv
+        self.dirty_nodes.add(n)
       elif self.G.nodes[n]["ndata"]["nomkv"] != basekv:
           self.logger.warn(f'Base voltage for bus {n} is {basekv} kv, but graph has {self.G.nodes[n]["ndata"]["nomkv"]} kv. Updating')
           self.G.nodes[n]["ndata"]["nomkv"] = basekv
+          self.dirty_nodes.add(n)
         
 
   def load_graph(self):
     self.G = i2x.load_builtin_graph(self.inputs["choice"])
+    self.shunt_index = ShuntIndex(self.G)
     self.parse_graph()
     self.pv_voltage_base_list()
     self.comps, self.reclosers, self.comp2rec = isl.get_islands(self.G)
+    self.comp_incidence = isl.comp_incidence(self.comp2rec)
 
   def voltage_monitor(self):
-    """Add voltage monitors throughout the system"""
-
-    depth = 1
-    while True:
-      n = list(nx.descendants_at_distance(self.G, "sourcebus", depth))
-      n.sort() # for reproducibility
-      if not n:
-          break
-      n = [i for i in n if self.G.nodes[i]["ndata"]["shunts"]]
-      if not n:
-          depth += 1
-          continue
-      
-      
+    """Add voltage monitors throughout the system.
+    One monitor at a random bus (with shunts) of each breadth first layer from the source,
+    thinned by inputs["voltage_monitors"]:
+      - layer_step: k, monitor every k-th layer (of those with shunts)
+      - island_quota: q, instead place q monitors in each island (self.comps), on evenly spaced layers
+    """
+    layer_step = self.inputs["voltage_monitors"]["layer_step"]
+    island_quota = self.inputs["voltage_monitors"]["island_quota"]
+
+    ## single traversal, sorted for reproducibility
+    layers = [sorted(n) for n in nx.bfs_layers(self.G, "sourcebus")][1:]
+    layers = [[i for i in n if self.G.nodes[i]["ndata"]["shunts"]] for n in layers]
+    if island_quota is None:
+      selected = [n for n in layers if n][::layer_step]
+    else:
+      selected = []
+      for c in self.comps:
+        clayers = [m for m in ([i for i in n if i in c] for n in layers) if m]
+        if len(clayers) > island_quota:
+          clayers = [clayers[i] for i in np.linspace(0, len(clayers) - 1, island_quota).round().astype(int)]
+        selected.extend(clayers)
+    
+    for n in selected:
       # ns = np.random.choice(n, 1)[0] 
       ns = n[self.random_state.randint(0, len(n))] 
       elem = self.G.nodes[ns]["ndata"]["shunts"][0] # select the first shunt
       self.change_lines_noprint.append(f"new monitor.{ns}_volt_vi element={elem} terminal=1 mode=96") # add a voltage monitor
-      depth += 1 
 
-  def parse_graph(self, summarize=False):
-    """ parse the various categories of objects in the graph """
-    self.graph_dirs = i2x.parse_opendss_graph(self.G, bSummarize=summarize)
+  def parse_graph(self, summarize=False, full=False):
+    """ parse the various categories of objects in the graph.
+    Only the nodes changed since the last parse (dirty_nodes) are parsed again, 
+    unless full=True or the graph was replaced.
+    """
+    if summarize:
+      i2x.parse_opendss_graph(self.G, bSummarize=True)
+    self.journal_nodes.update(self.dirty_nodes)
+    if full or (self.graph_index is None) or (self.graph_index.G is not self.G):
+      self.graph_index = GraphIndex(self.G)
+    else:
+      self.graph_index.update(self.dirty_nodes)
+    self.dirty_nodes = set()
+    self.graph_dirs = self.graph_index.graph_dirs()
+
+  def validate_graph_dirs(self) -> list:
+    """names of the graph_dirs entries that differ from a full parse of the graph"""
+    full = i2x.parse_opendss_graph(self.G, bSummarize=False)
+    return [k for k, v in full.items() if (v != self.graph_dirs[k]) or (k != "loadkw" and list(v) != list(self.graph_dirs[k]))]
 
   def show_component(self, i, printvals=True, printheader=False, plot=False, **kwargs):
     isl.show_component(self.G, self.comps, i, printvals=printvals, printheader=printheader, printfun=self.logger.info, plot=plot, **kwargs)
@@ -587,7 +832,8 @@ class HCA:
           self.G.nodes[bus]["ndata"]["pvkva"] = kva
           self.G.nodes[bus]["ndata"]["pvkw"] = kw
           self.G.nodes[bus]["ndata"]["kv"] = kv
-          self.G.nodes[bus]["ndata"]["shunts"].append(f"pvsystem.{key}")
+          self.shunt_index.add(bus, f"pvsystem.{key}")
+          self.dirty_nodes.add(bus)
     self.logger.info('Added {:.2f} kW PV on {:d} residential rooftops'.format(rooftop_kw, rooftop_count))
     self.parse_graph()
     self.pv_voltage_base_list()
@@ -606,24 +852,27 @@ class HCA:
         ## we could end up here
         return 
     if row['type'] == 'solar':
+      nclass = 'pvsystem'
       self.change_lines.append('edit pvsystem.{:s} enabled=no'.format(key))
       self.G.nodes[row["bus"]]["ndata"]["pvkva"] = 0
       self.G.nodes[row["bus"]]["ndata"]["pvkw"] = 0
     elif row['type'] == 'storage':
+      nclass = 'storage'
       self.change_lines.append('edit storage.{:s} enabled=no'.format(key))
       self.G.nodes[row["bus"]]["ndata"]["batkva"] = 0
       self.G.nodes[row["bus"]]["ndata"]["batkw"] = 0
     elif row['type'] == 'generator':
+      nclass = 'generator'
       self.change_lines.append('edit generator.{:s} enabled=no'.format(key))
       self.G.nodes[row["bus"]]["ndata"]["genkva"] = 0
       self.G.nodes[row["bus"]]["ndata"]["genkw"] = 0
     else:
       return
+    self.dirty_nodes.add(row["bus"])
     
     ## update graph (no need to return, G should be passed by reference)
     # remove the element from the shunt list
-    sidx = np.where( [key in s for s in self.G.nodes[row["bus"]]["ndata"]["shunts"]])[0][0]
-    self.G.nodes[row["bus"]]["ndata"]["shunts"].pop(sidx)
+    self.shunt_index.remove(row["bus"], f"{nclass}.{key}")
     self.G.nodes[row["bus"]]["nclass"] = self.update_node_class(row["bus"])
 
   def remove_all_pv(self):
@@ -632,9 +881,10 @@ class HCA:
       if d.get("nclass") == 'solar':
         d["ndata"]["pvkva"] = 0.0
         d["ndata"]["pvkw"] = 0.0
-        shunts_new = [s for s in d["ndata"]["shunts"] if 'pvsystem' not in s]
-        d["ndata"]["shunts"] = shunts_new
+        for s in list(self.shunt_index.names(n, "pvsystem")):
+          self.shunt_index.remove(n, s)
         d["nclass"] = self.update_node_class(n)
+        self.dirty_nodes.add(n)
   
   def disable_regulators(self, reglist=[]):
     if not reglist:
@@ -658,11 +908,12 @@ class HCA:
     # return random.choice(buslist)
 
   def existing_resource_check(self, name, bus, valkey, val):
-    if name in self.G.nodes[bus]["ndata"]["shunts"]:
+    if self.shunt_index.node(name) == bus:
       if val != self.G.nodes[bus]["ndata"][valkey]:
         self.logger.warn(f'Shunt {name} exists of bus {bus}, but {valkey} rating differs new {val} != old {self.G.nodes[bus]["ndata"][valkey]}')
         # remove, since it will be reinserted
-        self.G.nodes[bus]["ndata"]["shunts"].pop(self.G.nodes[bus]["ndata"]["shunts"].index(name))
+        self.shunt_index.remove(bus, name)
+        self.dirty_nodes.add(bus)
       else:
         return True # don't update the graph
     return False
@@ -678,7 +929,8 @@ class HCA:
       self.G.nodes[bus]["ndata"]["pvkva"] = kva
       self.G.nodes[bus]["ndata"]["pvkw"] = kw
       self.G.nodes[bus]["ndata"]["nomkv"] = kv
-      self.G.nodes[bus]["ndata"]["shunts"].insert(0, f"pvsystem.{key}") #prepend to shunt list (make sure this is the first element found)
+      self.shunt_index.add(bus, f"pvsystem.{key}", first=True) #prepend to shunt list (make sure this is the first element found)
+      self.dirty_nodes.add(bus)
 
   def append_large_storage(self, key):
     self._append_large_storage(key, **self.inputs["explicit_storage"][key])
@@ -691,7 +943,8 @@ class HCA:
       self.G.nodes[bus]["ndata"]["batkw"] = kw
       self.G.nodes[bus]["ndata"]["batkwh"] = kwh
       self.G.nodes[bus]["ndata"]["nomkv"] = kv
-      self.G.nodes[bus]["ndata"]["shunts"].insert(0, f"storage.{key}") #prepend to shunt list (make sure this is the first element found)
+      self.shunt_index.add(bus, f"storage.{key}", first=True) #prepend to shunt list (make sure this is the first element found)
+      self.dirty_nodes.add(bus)
 
   def append_large_generator(self, key):
     self._append_large_generator(self, key, **self.inputs["explicit_generator"][key])
@@ -702,7 +955,8 @@ class HCA:
       self.G.nodes[bus]["ndata"]["genkva"] = kva
       self.G.nodes[bus]["ndata"]["genkw"] = kw
       self.G.nodes[bus]["ndata"]["nomkv"] = kv
-      self.G.nodes[bus]["ndata"]["shunts"].insert(0, f"generator.{key}") #prepend to shunt list (make sure this is the first element found)
+      self.shunt_index.add(bus, f"generator.{key}", first=True) #prepend to shunt list (make sure this is the first element found)
+      self.dirty_nodes.add(bus)
 
   def redispatch_large_pv(self, key):
     self._redispatch_large_pv(key, **self.inputs["redisp_pv"][key])
@@ -711,6 +965,7 @@ class HCA:
     bus = self.get_node_from_classkey("pvsystem", key)
     self.G.nodes[bus]["ndata"]["pvkva"] = kva
     self.G.nodes[bus]["ndata"]["pvkw"] = kw
+    self.dirty_nodes.add(bus)
   
   def redispatch_large_storage(self, key):
     self._redispatch_large_storage(key, **self.inputs["redisp_storage"][key])
@@ -719,6 +974,7 @@ class HCA:
     bus = self.get_node_from_classkey("storage", key)
     self.G.nodes[bus]["ndata"]["batkva"] = kva
     self.G.nodes[bus]["ndata"]["batkw"] = kw
+    self.dirty_nodes.add(bus)
 
   def redispatch_large_generator(self, key):
     self._redispatch_large_generator(key, **self.inputs["redisp_gen"][key])
@@ -727,28 +983,21 @@ class HCA:
     bus = self.get_node_from_classkey("generator", key)
     self.G.nodes[bus]["ndata"]["genkva"] = kva
     self.G.nodes[bus]["ndata"]["genkw"] = kw
+    self.dirty_nodes.add(bus)
 
   def get_node_from_classkey(self, nclass, key):
     """Retrive the node name where shunt <nclass>.<key> is connected
     From graph G
     """
-    
-    for n, d in self.G.nodes(data=True):
-      try:
-        if np.any([f"{nclass}.{key}" == s for s in d["ndata"]["shunts"]]):
-          return n
-      except KeyError:
-        pass
+    return self.shunt_index.node(f"{nclass}.{key}")
   
   def get_classkey_from_node(self, nclass, node):
     """Retrive the name of the object of type <nclass> connected at the given node
     Returns None if none is found
     """
 
-    for s in self.G.nodes[node]["ndata"]["shunts"]:
-      if s.split(".")[0] == nclass:
-        return s.split(".")[1]
-    return None
+    names = self.shunt_index.names(node, nclass)
+    return names[0].split(".")[1] if names else None
 
   def deterministic_changes(self):
     self.logger.info('Making some deterministic changes')
@@ -792,15 +1041,74 @@ class HCA:
     for ln in self.change_lines:
       self.logger.info (f' {ln}')    
 
-  def rundss(self):
+  def abort_limits(self):
+    """hard limits for stopping a run early (see i2x.check_limits).
+    Following the metrics, limits violated in the baseline are relaxed to the baseline values.
+    """
+    lims = self.inputs["metrics"]["limits"]
+    tol = self.inputs["metrics"]["tolerances"]
+    vstats = self.metrics.base.volt_stats["limits"]
+    emerg = None
+    if self.inputs["early_abort"].get("thermal", True):
+      emerg = {k.lower(): max(100, v) + tol["thermal"] for k, v in self.metrics.base.res["di_overloads"]["%Emerg"].items()}
+    return {"chunk": self.inputs["early_abort"]["chunk"],
+            "vmin": min(lims["voltage"]["vmin"], vstats["MinVoltage"], vstats["MinLVVoltage"]) - tol["voltage_mag"],
+            "vmax": max(lims["voltage"]["vmax"], vstats["MaxVoltage"], vstats["MaxLVVoltage"]) + tol["voltage_mag"],
+            "emerg": emerg,
+            "emerg_default": 100 + tol["thermal"]}
+
+  def rundss(self, abort=False, capture=False):
+    """run the time series solution. With abort=True (and early_abort enabled), 
+    the run stops at the first violation of the hard limits given by abort_limits.
+    While screening, runs with abort=True only solve the critical time steps, starting from
+    the control states recorded in the run with capture=True (see runbase).
+    With the result cache, a configuration solved before is not solved again: the changes are
+    applied to the circuit and lastres (with "cached": True) is the stored result, so read the
+    results from lastres and not from the solution state of self.dss.
+    """
     pwd = os.getcwd()
-    self.lastres = i2x.run_opendss(**{**{"change_lines": self.change_lines + self.change_lines_noprint + self.upgrade_change_lines, 
-                                         "dss": self.dss, "demandinterval": True}, 
-                                         **self.inputs} )  
-    if self.lastres["converged"]:
-      self.lastres["compflows"] = isl.all_island_flows(self.comp2rec, self.lastres["recdict"])
+    change_lines = self.change_lines + self.change_lines_noprint + self.upgrade_change_lines
+    cache_key = None
+    if (self.result_cache is not None) and not capture:
+      cache_key = config_key(self.inputs, self.change_lines_history + change_lines, self.result_cache.model)
+    if isinstance(self.dss, DSSSnapshot):
+      # apply the changes via the snapshot so they can be undone on reset
+      self.dss.apply(change_lines)
+      change_lines = []
+    if cache_key is not None:
+      res = self.result_cache.get(cache_key)
+      if res is not None:
+        # same configuration solved before, only bring the circuit up to date (it is not solved)
+        for l in change_lines:
+          self.dss.text(l)
+        self.lastres = {**res, "dss": self.dss, "cached": True}
+        self.logger.debug(f"\tUsing cached result {cache_key[:12]}")
+        return
+    abort_limits, timepoints = None, None
+    if abort and self.screening:
+      abort_limits, timepoints = self.abort_limits(), self.screen_steps
+    elif abort and self.inputs["early_abort"]["enabled"] and (self.metrics.base is not None):
+      abort_limits = self.abort_limits()
+    di_memory = (timepoints is None) and (self.inputs["di_output"] == "memory")
+    self.lastres = i2x.run_opendss(**{**{"change_lines": change_lines, 
+                                         "dss": self.dss, "demandinterval": (timepoints is None) and not di_memory}, 
+                                         **self.inputs, "abort_limits": abort_limits, "timepoints": timepoints,
+                                         "control_states": self.screen_states if timepoints else None,
+                                         "capture_steps": self.screen_steps if capture else None,
+                                         "di_memory": di_memory} )  
+    if self.lastres.get("screened", False):
+      pass
+    elif self.lastres.get("aborted", False):
+      self.logger.debug(f"\tRun aborted at step {self.lastres['abort_step']}: {self.lastres['violations']}")
+    elif self.lastres["converged"]:
+      self.lastres["compflows"] = isl.island_flow_array(self.comp2rec, self.lastres["recdict"], self.comp_incidence)
       os.chdir(pwd)
-      self.read_di_outputs()
+      if di_memory:
+        self.read_di_records()
+      else:
+        self.read_di_outputs()
+      if (cache_key is not None) and self.lastres["converged"]:
+        self.result_cache.put(cache_key, self.lastres)
 
   def summary_outputs(self):
     summary_outputs(self.lastres, self.pvbases, print=self.logger.info)
@@ -831,6 +1139,27 @@ class HCA:
     if err:
       self.lastres["converged"] = False
 
+  def read_di_records(self):
+    """same as read_di_outputs, from the demand interval results collected in memory (di_output = "memory")"""
+    rec = self.lastres.pop("di_records")
+    ### Thermal overloads
+    cols = ["Hour", "Element", "NormalAmps", "EmergAmps", "%Normal", "%Emerg", "kVBase", "I1(A)", "I2(A)", "I3(A)"]
+    df = pd.DataFrame(rec["overloads"], columns=cols)
+    self.lastres["di_overloads"] = df.groupby("Element").agg('max').loc[:, cols[2:]]
+    ### Voltage violations
+    cols = ["Hour", "Undervoltages", "MinVoltage", "Overvoltage", "MaxVoltage", "MinBus", "MaxBus",
+            "LVUndervoltages", "MinLVVoltage", "LVOvervoltage", "MaxLVVoltage", "MinLVBus", "MaxLVBus"]
+    self.lastres["di_voltexceptions"] = pd.DataFrame(rec["voltexceptions"], columns=cols).set_index("Hour")
+    ### Totals: the energy registers per interval hour, the max registers as is
+    nregs = len(rec["register_names"])
+    regs = pd.DataFrame([r[:nregs + 1] for r in rec["totals"]], columns=["Time"] + rec["register_names"]).set_index("Time")
+    regs.columns = regs.columns.str.replace(" ", "")
+    cols = ["LoadEEN", "LoadUE", "kWh", "kvarh"]
+    dh = np.diff(np.insert(regs.index, 0, [0]))
+    df = regs.loc[:, cols].diff()
+    df.iloc[0] = regs.loc[:, cols].iloc[0] - np.array(rec["registers0"])[[regs.columns.get_loc(c) for c in cols]]
+    self.lastres["di_totals"] = pd.concat([df.divide(dh, axis=0), regs.loc[:, ["MaxkW", "MaxkVA"]]], axis=1)
+
   def calc_total_een_ue(self, ditotals:pd.DataFrame):
     """perform integration of EEN and UE in the totals result"""
     return ditotals.transpose().dot(np.diff(np.insert(ditotals.index, 0, [0])))
@@ -907,8 +1236,7 @@ class HCA:
 
   def get_data(self, key, typ, bus, cnt=None):
     """Retrieve the hosting capacity, Sij, or eval stored for the given bus for the given type.
-    If no iteration counter is given the process works itself backwards from the
-    current count until a viable index is found.
+    If no iteration counter is given the latest value up to the current count is returned.
     """
     if key not in ["Sij", "hc", "eval"]:
       raise ValueError("key must be Sij, hc, or eval")
@@ -916,19 +1244,9 @@ class HCA:
       raise ValueError("Currently Only differentiating on pv, bat, der")
     
     if cnt is not None:
-      try:
-        return self.data[key][typ][bus][cnt], cnt
-      except KeyError:
-        return None, cnt
+      return self.data.get(key, typ, bus, cnt), cnt
     else:
-      cnt = self.cnt
-      while cnt >= 0:
-        data, cnt =  self.get_data(key, typ, bus, cnt)
-        if data is None:
-          cnt -= 1
-        else:
-          return data, cnt
-      return None, cnt #if we're here then no data was found, cnt should be -1
+      return self.data.latest(key, typ, bus, self.cnt) #(None, -1) if no data was found
     
   def get_hc(self, typ, bus, cnt=None):
     """Retrieve the hosting capacity stored for the given bus for the given type
@@ -936,7 +1254,41 @@ class HCA:
     current count until a viable index is found.
     """
     return self.get_data("hc", typ, bus, cnt=cnt)
-  
+
+  def candidate_buses(self, typ):
+    """Viable bus options for a new hca round (for now):
+    * graph_dirs["bus3phase"]: 3phase buses with nothing on them
+    * any bus already considered in a previous round (since the capacity added may not have been the limit)
+    * **exclude** buses that have zero hosting capacity
+    """
+    return [b for b in list(self.graph_dirs["bus3phase"]) + self.visited_buses if b not in self.exauhsted_buses[typ]]
+
+  def select_capacity(self, typ, Sij=None):
+    """Select the new capacity at the active bus.
+    there are two options:
+    1. this bus an evaluated hc -> use this value as the starting point
+    2. this has not been visited -> sample a capacity (add to existing (0 or otherwise))
+    """
+    nclass = {"pv": "pvsystem", "bat": "storage", "der": "generator"}
+    if Sij is not None:
+      self.logger.info(f"Specified capacity: {Sij}")
+      return Sij
+
+    Sij = self.sample_capacity(typ)
+    self.logger.debug(f"\tsampled {Sij}")
+    keyexist = self.get_classkey_from_node(nclass[typ], self.active_bus)
+    if keyexist is not None:
+      ## Option 1: check if bus already has resource of this type
+      self.logger.debug(f"\tFound resource {keyexist}, at bus {self.active_bus}")
+      hc, hc_cnt = self.get_hc(typ, self.active_bus)
+      if hc is not None:
+        # use the hc value
+        self.logger.debug(f"\tLast hc info from round {hc_cnt}: {hc}")
+        Sij = hc
+      else:
+        self.logger.debug(f"\tNo hc available, using sampled value")
+    return Sij
+
   def hca_round(self, typ, bus=None, Sij=None, allow_violations=False, hciter=True):
     """perform a single round of hca"""
     
@@ -965,39 +1317,24 @@ class HCA:
     # * any bus already considered in a previous round (since the capacity added may not have been the limit)
     # * **exclude** buses that have zero hosting capacity
     if bus is None:
-      buslist = [b for b in list(self.graph_dirs["bus3phase"]) + self.visited_buses if b not in self.exauhsted_buses[typ]]
-      
-      self.set_active_bus(self.sample_buslist(buslist))
+      self.set_active_bus(self.sample_buslist(self.candidate_buses(typ)))
     else:
       self.set_active_bus(bus)
 
-    #### Step 2: Select new capacity, 
-    ## there are two options:
-    ## 1. this bus an evaluated hc -> use this value as the starting point
-    ## 2. this has not been visited -> sample a capacity (add to existing (0 or otherwise))
-    if Sij is not None:
-      self.logger.info(f"Specified capacity: {Sij}")
-    else:
-      Sij = self.sample_capacity(typ)
-      self.logger.debug(f"\tsampled {Sij}")
-      keyexist = self.get_classkey_from_node(nclass[typ], self.active_bus)
-      if keyexist is not None: 
-        ## Option 1: check if bus already has resource of this type
-        self.logger.debug(f"\tFound resource {keyexist}, at bus {bus}")
-        hc, hc_cnt = self.get_hc(typ, self.active_bus)
-        if hc is not None:
-          # use the hc value
-          self.logger.debug(f"\tLast hc info from round {hc_cnt}: {hc}")
-          Sij = hc
-        else:
-          self.logger.debug(f"\tNo hc available, using sampled value")
-          # for k in Sij.keys():
-          #   Sij[k] += self.graph_dirs[graphdir[typ]][key][k]
-          # self.logger.debug(f"\tNew sampled capacity: {Sij}")
-
-      # self.alter_capacity(typ, key, **Sij)
-    # else:
-    #   ## Option 2: first time resource at this node
+    if self.inputs["sensitivity"]["enabled"]:
+      if self.sensitivity_stale(typ):
+        self.sensitivity_screen(typ)
+      if self.inputs["sensitivity"]["seed_search"] and (self.active_bus in self.sensitivity[typ].index):
+        self.search_guesses = [self.sensitivity[typ].loc[self.active_bus, "kw"]]
+    if self.inputs["warm_start"]["enabled"]:
+      nb = self.neighbor_limits(typ)
+      guesses = ws.bracket([l for _, _, l in nb], self.inputs["warm_start"]["width"])
+      if guesses:
+        self.logger.info(f"Warm start from {', '.join(f'{b} ({l:.0f} kW)' for b, _, l in nb)}: trying {guesses[0]:.0f} and {guesses[1]:.0f} kW first")
+        self.search_guesses = self.search_guesses + guesses # together with the sensitivity estimate, if any
+
+    #### Step 2: Select new capacity,
+    Sij = self.select_capacity(typ, Sij)
     key = self.resource_key(typ, self.active_bus, self.cnt) #f"{typ}-init-cnt{self.cnt}"
     self.logger.info(f"Creating new {typ} resource {key} with S = {Sij}")
     self.new_capacity(typ, key, **Sij)
@@ -1008,7 +1345,7 @@ class HCA:
       self.logger.debug (f' {ln}')
 
     ### Step 3: Solve
-    self.rundss()
+    self.rundss(abort=not allow_violations)
     if self.lastres["converged"]:
       # raise ValueError("Open DSS Run did not converge")
 
@@ -1026,7 +1363,7 @@ class HCA:
       self.update_data("Sij", typ, Sij)  # save installed capacity
       if hciter:
         self.logger.info("Iterating to find HC.")
-        Sijlim = self.hc_bisection(typ, key, Sij, None) # find limit via bisection search
+        Sijlim = self.hc_search(typ, key, Sij, None) # find limit via bisection/secant search
         hc = {k: Sijlim[k] - Sij[k] for k in ["kw", "kva"]}
         self.update_data("hc", typ, hc)
       self.update_data("eval", typ, self.metrics.eval)
@@ -1041,7 +1378,7 @@ class HCA:
         self.update_data("eval", typ, self.metrics.eval)
       if hciter:
         self.logger.info("Iterating to find Limit.")
-        Sijlim = self.hc_bisection(typ, key, None, Sij)
+        Sijlim = self.hc_search(typ, key, None, Sij)
         if Sijlim["kw"] == 0: 
           # no capacity at this bus (not just no *additional*, none at all)
           # remove the object from the graph
@@ -1057,6 +1394,7 @@ class HCA:
       # mark bus as exauhsted
       self.exauhsted_buses[typ].append(self.active_bus)
 
+    self.search_guesses = []
     ### Step 5: final run with the actual capacity
     self.logger.info(f"*******Results for bus {self.active_bus} ({typ})\nSij = {Sij}\nhc = {hc}")
     self.remove_der(key, typmap[typ], self.active_bus) # dss command doesn't really matter, but this removes it from graph as well
@@ -1080,6 +1418,95 @@ class HCA:
     ### cleanup
     self.unset_active_bus()
     self.collect_stats()
+    if self.inputs["checkpoint"]:
+      self.checkpoint(self.inputs["checkpoint"])
+
+  def round_result(self, typ, bus, cnt):
+    """collect everything an hca round at bus/cnt stored in data and upgrades"""
+    return {"bus": bus,
+            "cnt": cnt,
+            "data": {k: self.get_data(k, typ, bus, cnt=cnt)[0] for k in ["Sij", "hc", "eval"]},
+            "upgrades": {utyp: {name: vals[cnt] for name, vals in ups.items() if cnt in vals} for utyp, ups in self.upgrades.items()},
+            "exhausted": bus in self.exauhsted_buses[typ]}
+
+  def hca_round_parallel(self, typ, tasks=None, nrounds=None, nproc=None, allow_violations=False, hciter=True):
+    """perform several rounds of hca concurrently in a pool of worker processes.
+    tasks is a list of buses or (bus, Sij) tuples, where either entry may be None
+    to have it sampled as in hca_round. Alternatively nrounds sampled tasks are created.
+
+    Each worker holds its own compiled copy of the feeder and evaluates its rounds
+    against the state at the start of the batch, i.e. rounds within one batch do not see
+    each other's resources. Rounds are numbered, and their results merged, in task order
+    so the outcome does not depend on the number of workers. The upgrades a round records
+    (self.upgrades) are merged under its round number.
+    Note: the calling script must be protected by `if __name__ == "__main__":`
+    since workers are spawned.
+    """
+    if tasks is None:
+      if nrounds is None:
+        raise ValueError("hca_round_parallel: either tasks or nrounds must be provided")
+      tasks = [None]*nrounds
+
+    # prep for new dss run
+    self.save_dss_state()
+    self.reset_dss()
+
+    #### Steps 1 and 2 (bus and capacity) are resolved here, so random draws are reproducible
+    jobs = []
+    picked = []
+    for i, task in enumerate(tasks):
+      bus, Sij = task if isinstance(task, (tuple, list)) else (task, None)
+      if bus is None:
+        bus = self.sample_buslist([b for b in self.candidate_buses(typ) if b not in picked])
+      picked.append(bus)
+      self.active_bus = bus
+      Sij = self.select_capacity(typ, Sij)
+      jobs.append({"typ": typ, "bus": bus, "Sij": Sij, "cnt": self.cnt + i + 1,
+                   "allow_violations": allow_violations, "hciter": hciter})
+    self.unset_active_bus()
+
+    #### Step 3 and 4: evaluate rounds in worker processes
+    with tempfile.TemporaryDirectory() as tmpdir:
+      filename = os.path.join(tmpdir, "hca_batch.pkl")
+      self.save(filename)
+      nproc = min(nproc or os.cpu_count(), len(jobs))
+      self.logger.info(f"\n========= HCA Rounds {self.cnt+1}-{self.cnt+len(jobs)} ({typ}) on {nproc} processes =================")
+      with ProcessPoolExecutor(max_workers=nproc, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_round_worker_init, initargs=(filename, tmpdir)) as pool:
+        results = list(pool.map(_round_worker, jobs))
+
+    #### Step 5: merge results in task order and install the capacities
+    for res in results:
+      self.cnt = res["cnt"]
+      self.set_active_bus(res["bus"])
+      for key, vals in res["data"].items():
+        if vals is not None:
+          self.update_data(key, typ, vals)
+      for utyp, ups in res["upgrades"].items():
+        for name, vals in ups.items():
+          self.update_upgrades(utyp, name, vals, cnt=self.cnt)
+      if res["exhausted"]:
+        self.exauhsted_buses[typ].append(self.active_bus)
+      Sij = res["data"]["Sij"]
+      self.logger.info(f"*******Results for bus {self.active_bus} ({typ}) round {self.cnt}\nSij = {Sij}\nhc = {res['data']['hc']}")
+      if (Sij is not None) and (Sij["kw"] > 0):
+        self.replay_resource_addition(typ, self.active_bus, self.cnt)
+      self.parse_graph()
+      self.unset_active_bus()
+      self.collect_stats()
+    for ln in self.change_lines:
+      self.logger.info (f' {ln}')
+
+    ### final run with all the installed capacity of the batch
+    self.rundss()
+    if not self.lastres["converged"]: #don't allow non-convergence here
+      raise ValueError("Open DSS Run did not converge")
+    self.metrics.load_res(self.lastres)
+    self.metrics.calc_metrics()
+    if self.metrics.violation_count > 0:
+      self.logger.warn(f"hca_round_parallel: combined capacity of the batch results in violations: {','.join(self.metrics.get_violation_list())}")
+    if self.inputs["checkpoint"]:
+      self.checkpoint(self.inputs["checkpoint"])
 
   def hc_bisection(self, typ, key, Sij1=None, Sij2=None, kwtol=5, kwmin=30):
     
@@ -1091,6 +1518,7 @@ class HCA:
     if (Sij1 is None) and (Sij2 is None):
       raise ValueError("At least one of lower or upper bound must be provided")
 
+    guess = self.pop_search_guess(Sij1, Sij2)
     if (Sij1 is not None) and (Sij2 is not None):
       # apply bisection on the kw value
       Sijnew = {"kw": (Sij1["kw"] + Sij2["kw"])/2}
@@ -1099,11 +1527,13 @@ class HCA:
         if k != "kw":
           Sijnew[k] = Sij1[k]*factor # apply to other properties proportionally 
     elif Sij2 is None:
-      # unknown upperbound, double lower bound
-      Sijnew = {k: 2*v for k, v in Sij1.items()}
+      # unknown upperbound, double lower bound (or go to the guess)
+      factor = 2 if guess is None else guess/Sij1["kw"]
+      Sijnew = {k: factor*v for k, v in Sij1.items()}
     elif Sij1 is None:
-      # unknown lower bound, half the upper bound
-      Sijnew = {k: 0.5*v for k, v in Sij2.items()}
+      # unknown lower bound, half the upper bound (or go to the guess)
+      factor = 0.5 if guess is None else guess/Sij2["kw"]
+      Sijnew = {k: factor*v for k, v in Sij2.items()}
     
     self.new_capacity(typ, key, **Sijnew) #add the new capacity
 
@@ -1113,7 +1543,7 @@ class HCA:
       self.logger.debug (f' {ln}')
 
     ### Solve
-    self.rundss()
+    self.rundss(abort=True)
     if self.lastres["converged"]:
       # raise ValueError("Open DSS Run did not converge")
     
@@ -1121,6 +1551,7 @@ class HCA:
       self.metrics.calc_metrics()
     else:
       self.logger.warn(f"hc_bisection: DSS appears to have not converged")
+    self.record_trial(Sijnew)
     if self.lastres["converged"] and (self.metrics.violation_count == 0):
       self.logger.info(f"\tNo violations with capacity {Sijnew}. Iterating to find HC")
       if Sij2 is None:
@@ -1143,6 +1574,12 @@ class HCA:
       if Sijnew["kw"] < kwmin:
         # End criterion: upperbound is below minimum threshold set to 0 and exit
         return {k: 0 for k in Sijnew.keys()}
+      elif self.screening and (Sij1 is not None) and (Sijnew["kw"] - Sij1["kw"] < kwtol):
+        # End criterion (screened trials): violations and search band within tolerance, the lower bound is the limit
+        # (the screened and full runs may disagree, a jump right above the lower bound would recurse endlessly)
+        if Sij1["kw"] < kwmin:
+          return {k: 0 for k in Sij1.keys()}
+        return Sij1
       elif Sij1 is None:
         # still unkonwn lower bound
         return self.hc_bisection(typ, key, None, Sijnew, kwtol, kwmin)
@@ -1150,6 +1587,235 @@ class HCA:
         # recurse and decrease
         return self.hc_bisection(typ, key, Sij1, Sijnew, kwtol, kwmin)
   
+  def hc_search(self, typ, key, Sij1=None, Sij2=None, kwtol=5, kwmin=30):
+    """find the limiting capacity between Sij1 (no violations) and Sij2 (violations)
+    using the search method given by inputs["hc_search"]. The metrics of the last run
+    are used as the evaluation of the given bound. Afterwards, the evaluation in the
+    metrics is that of the returned capacity.
+    """
+    self.search_evals = {}
+    self.search_margins = {}
+    self.search_last = None
+    if Sij1 is not None:
+      self.search_evals[Sij1["kw"]] = copy.deepcopy(self.metrics.eval)
+      self.search_last = Sij1["kw"]
+    elif Sij2 is not None:
+      self.search_last = Sij2["kw"]
+    if (self.search_last is not None) and self.lastres["converged"]:
+      self.search_margins[self.search_last] = self.metrics.margins()
+    if self.screen_steps is not None:
+      Sijlim = self.hc_screened_search(typ, key, Sij1, Sij2, kwtol, kwmin)
+    else:
+      Sijlim = self._hc_search(typ, key, Sij1, Sij2, kwtol, kwmin)
+    if (Sijlim["kw"] > 0) and (Sijlim["kw"] != self.search_last):
+      # the search ended on a bound solved earlier (e.g. a trial with violations right above it)
+      if Sijlim["kw"] in self.search_evals:
+        self.metrics.eval = self.search_evals[Sijlim["kw"]]
+      else:
+        self.solve_capacity(typ, key, Sijlim)
+    self.search_evals = {}
+    self.search_margins = {}
+    return Sijlim
+
+  def record_trial(self, Sij):
+    """note the run of a search trial with capacity Sij (see hc_search)"""
+    self.search_last = Sij["kw"]
+    if self.lastres["converged"] and not self.screening:
+      self.search_margins[Sij["kw"]] = self.metrics.margins()
+      if self.metrics.violation_count == 0:
+        self.search_evals[Sij["kw"]] = copy.deepcopy(self.metrics.eval)
+
+  def solve_capacity(self, typ, key, Sij) -> bool:
+    """full run with capacity Sij of resource key at the active bus, True if it has no violations"""
+    typmap = {"pv": "solar", "bat": "storage", "der": "generator"}
+    self.remove_der(key, typmap[typ], self.active_bus)
+    self.reset_dss()
+    self.new_capacity(typ, key, **Sij)
+    self.parse_graph()
+    self.rundss(abort=True)
+    if self.lastres["converged"]:
+      self.metrics.load_res(self.lastres)
+      self.metrics.calc_metrics()
+    else:
+      self.logger.warn(f"solve_capacity: DSS appears to have not converged")
+    self.record_trial(Sij)
+    return self.lastres["converged"] and (self.metrics.violation_count == 0)
+
+  def hc_screened_search(self, typ, key, Sij1=None, Sij2=None, kwtol=5, kwmin=30):
+    """hc_search with the trials only solved at the critical time steps (screen_steps).
+    The resulting limit is confirmed with a full run. If that shows violations, the
+    search is repeated with full runs below it.
+    """
+    self.screening = True
+    try:
+      Sijlim = self._hc_search(typ, key, Sij1, Sij2, kwtol, kwmin)
+    except ValueError as e:
+      # screening contradicts the full run of a bound
+      self.logger.info(f"\tScreened search failed ({e}). Repeating search with full runs.")
+      Sijlim = None
+    finally:
+      self.screening = False
+    if Sijlim is None:
+      return self._hc_search(typ, key, Sij1, Sij2, kwtol, kwmin)
+    if (Sijlim["kw"] == 0) or (Sijlim == Sij1):
+      # nothing to confirm (Sij1 was evaluated with a full run, its evaluation is restored by hc_search)
+      return Sijlim
+    
+    ### confirm
+    if self.solve_capacity(typ, key, Sijlim):
+      self.logger.info(f"\tScreened limit {Sijlim} confirmed.")
+      return Sijlim
+    if self.lastres["converged"]:
+      self.logger.info(f"\tViolations with screened limit {Sijlim}: {','.join(self.metrics.get_violation_list())}. Repeating search with full runs.")
+    return self._hc_search(typ, key, Sij1, Sijlim, kwtol, kwmin)
+
+  def _hc_search(self, typ, key, Sij1=None, Sij2=None, kwtol=5, kwmin=30):
+    """hc_bisection or hc_secant between the bounds, the secant search starts from the margins
+    of the full runs of the bounds (search_margins), not from those of the last run"""
+    if self.inputs["hc_search"] == "secant":
+      lo, hi = [None if (Sij is None) or (Sij["kw"] not in self.search_margins) else (Sij["kw"], self.search_margins[Sij["kw"]])
+                for Sij in [Sij1, Sij2]]
+      return self.hc_secant(typ, key, Sij1, Sij2, kwtol, kwmin, lo=lo, hi=hi)
+    return self.hc_bisection(typ, key, Sij1, Sij2, kwtol, kwmin)
+
+  def secant_kw(self, Sij1, Sij2, kwtol, lo, hi, prev, widths, interp):
+    """next trial capacity for hc_secant. Returns the capacity and which side of the
+    limit it is expected on (1: no violations, -1: violations, 0: no expectation).
+    lo/hi are (kw, margins) of the current bounds, prev is (kw, margins) of the
+    trial before on the same side (only used while one bound is unknown).
+    The margin of each metric is assumed linear in the capacity, the limit is where
+    the first metric crosses 0.
+    """
+    def crossings(a, b, sel):
+      """capacity where the margins of the metrics selected by sel(ma, mb) cross 0 (line through a and b)"""
+      if (a is None) or (b is None) or (a[0] == b[0]):
+        return []
+      out = []
+      for k in set(a[1]).intersection(b[1]):
+        ma, mb = a[1][k], b[1][k]
+        if sel(ma, mb) and (ma != mb):
+          out.append((a[0] + (b[0] - a[0])*ma/(ma - mb), ma/(ma - mb)))
+      return out
+
+    offset = 0.4*kwtol
+    if Sij2 is None:
+      # unknown upper bound: extrapolate the margins to 0 and aim just past the first crossing, otherwise double
+      r = [x for x, _ in crossings(prev, lo, lambda ma, mb: (mb > 0) and (mb < ma))] if interp else []
+      if r:
+        r = min(r)
+        return min(max(r + max(offset, 0.05*r), 1.25*lo[0]), 4*lo[0]), 0
+      return 2*Sij1["kw"], 0
+    elif Sij1 is None:
+      # unknown lower bound: extrapolate the violated margins to 0 and aim just short of the last crossing, otherwise half
+      r = [x for x, _ in crossings(prev, hi, lambda ma, mb: (mb < 0) and (mb > ma))] if interp else []
+      if r:
+        r = max(r)
+        return min(max(r - max(offset, 0.05*r), 0.1*hi[0]), 0.75*hi[0]), 0
+      return 0.5*Sij2["kw"], 0
+
+    width = Sij2["kw"] - Sij1["kw"]
+    bisect = (Sij1["kw"] + Sij2["kw"])/2, 0
+    if (not interp) or (lo is None) or (hi is None):
+      return bisect
+    if (len(widths) > 2) and (width > 0.5*widths[-3]):
+      # interpolation is not closing the band fast enough (less than half in two steps)
+      return bisect
+    # regula falsi on the metrics that are violated at the upper bound only
+    r = crossings(lo, hi, lambda ma, mb: (ma > 0) and (mb < 0))
+    if not r:
+      # margins not informative
+      return bisect
+    r, frac = min(r)
+    if (frac < 0.02) or (frac > 0.98):
+      # margins of very different magnitude, most likely a jump rather than a crossing
+      return bisect
+    # aim slightly past the estimated limit on the side that was not updated last
+    side = -1 if prev is lo else 1
+    r -= side*offset
+    return min(max(r, Sij1["kw"] + 0.1*kwtol), Sij2["kw"] - 0.1*kwtol), side
+
+  def hc_secant(self, typ, key, Sij1=None, Sij2=None, kwtol=5, kwmin=30, lo=None, hi=None, prev=None, widths=(), interp=True):
+    """Same as hc_bisection, but the next trial capacity is found by interpolating (regula falsi)
+    or extrapolating the normalized margins of the evaluations (see HCAMetrics.margins).
+    Falls back on bisection steps when the margins are not informative or the band does
+    not close fast enough, and for the rest of the search once a trial ends up on the
+    unexpected side of the limit. As in hc_bisection, the returned capacity has no violations
+    and the band to the smallest capacity with violations is less than kwtol.
+    """
+    if (Sij1 is not None) and (Sij2 is not None) and (Sij2["kw"] - Sij1["kw"] < kwtol):
+      # End criterion: the band is within tolerance, the lower bound (known to have no violations) is the limit
+      return Sij1 if Sij1["kw"] >= kwmin else {k: 0 for k in Sij1.keys()}
+    typmap = {"pv": "solar", "bat": "storage", "der": "generator"}
+    #prep for new run
+    self.remove_der(key, typmap[typ], self.active_bus) # dss command doesn't really matter, but this removes it from graph as well
+    self.reset_dss()
+
+    if (Sij1 is None) and (Sij2 is None):
+      raise ValueError("At least one of lower or upper bound must be provided")
+
+    ref = Sij1 if Sij1 is not None else Sij2
+    if (Sij1 is not None) and (Sij2 is not None):
+      widths = widths + (Sij2["kw"] - Sij1["kw"],)
+    kw, side = self.secant_kw(Sij1, Sij2, kwtol, lo, hi, prev, widths, interp)
+    guess = self.pop_search_guess(Sij1, Sij2)
+    if guess is not None:
+      kw, side = guess, 0
+    Sijnew = {k: v*kw/ref["kw"] for k, v in ref.items()} # apply to other properties proportionally
+    Sijnew["kw"] = kw
+
+    self.new_capacity(typ, key, **Sijnew) #add the new capacity
+
+    ### update graph structure and log changes
+    self.parse_graph()
+    for ln in self.change_lines:
+      self.logger.debug (f' {ln}')
+
+    ### Solve
+    self.rundss(abort=True)
+    if self.lastres["converged"]:
+      self.metrics.load_res(self.lastres)
+      self.metrics.calc_metrics()
+      new = (Sijnew["kw"], self.metrics.margins())
+    else:
+      self.logger.warn(f"hc_secant: DSS appears to have not converged")
+      new = (Sijnew["kw"], {})
+    self.record_trial(Sijnew)
+    feasible = self.lastres["converged"] and (self.metrics.violation_count == 0)
+    if side == (-1 if feasible else 1):
+      # margins are not linear in the capacity, continue with bisection
+      self.logger.debug("\thc_secant: trial on unexpected side of the limit, switching to bisection")
+      interp = False
+    if feasible:
+      self.logger.info(f"\tNo violations with capacity {Sijnew} (margin {self.metrics.worst_margin():.4f}). Iterating to find HC")
+      if Sij2 is None:
+        # still uknown upper bound
+        return self.hc_secant(typ, key, Sijnew, None, kwtol, kwmin, lo=new, prev=lo, interp=interp)
+      elif Sij2["kw"] - Sijnew["kw"] < kwtol:
+        # End criterion: no violations and search band within tolerance
+        if Sijnew ["kw"] < kwmin:
+          # if capacity is below a minimum threshold set to 0
+          Sijnew = {k: 0 for k in Sijnew.keys()}
+        return Sijnew
+      else:
+        # recurse and increase
+        return self.hc_secant(typ, key, Sijnew, Sij2, kwtol, kwmin, lo=new, hi=hi, prev=new, widths=widths, interp=interp)
+    else:
+      self.logger.info(f"\tViolations with capacity {Sijnew}. Iterating to find Limit.")
+      if self.lastres["converged"]:
+        self.logger.info(f"\t{','.join(self.metrics.get_violation_list())}")
+        self.logger.debug(f"\t\tviolations: {self.metrics.violation}")
+      if Sijnew["kw"] < kwmin:
+        # End criterion: upperbound is below minimum threshold set to 0 and exit
+        return {k: 0 for k in Sijnew.keys()}
+      elif Sij1 is None:
+        # still unkonwn lower bound
+        return self.hc_secant(typ, key, None, Sijnew, kwtol, kwmin, hi=new, prev=hi, interp=interp)
+      elif Sijnew["kw"] <= Sij1["kw"]:
+        raise ValueError(f"hc_secant: capacity {Sijnew} previously had no violations")
+      else:
+        # recurse and decrease
+        return self.hc_secant(typ, key, Sij1, Sijnew, kwtol, kwmin, lo=lo, hi=new, prev=new, widths=widths, interp=interp)
+
   def runbase(self, verbose=0):
     """runs an initial version of the feeder to establish a baseline.
     Metrics, for example will be evaluated w.r.t to this baseline as opposed
@@ -1177,7 +1843,12 @@ class HCA:
       for i, c in enumerate(self.comps):
         self.show_component(i, printvals=True, printheader=i==0, plot=False)
 
-    self.rundss()
+    if self.inputs["screening"]["enabled"]:
+      self.screen_steps = self.critical_steps(self.inputs["screening"]["npoints"])
+      self.logger.info(f"Screening search trials at time steps {self.screen_steps}")
+    self.rundss(capture=self.screen_steps is not None)
+    if self.screen_steps is not None:
+      self.screen_states = self.lastres.pop("control_states")
     if verbose > 1:
       self.summary_outputs()
 
@@ -1186,6 +1857,136 @@ class HCA:
 
     self.save_dss_state()
 
+  def pop_search_guess(self, Sij1, Sij2):
+    """next search guess beyond the only known bound of the search (the smallest above the lower
+    bound or the largest below the upper bound), None if there is none. The guess is removed from 
+    search_guesses together with those inside the known bounds; all are removed once both bounds are known.
+    """
+    guesses = [g for g in self.search_guesses if np.isfinite(g) and (g > 0)]
+    if (Sij2 is None) and (Sij1 is not None) and (Sij1["kw"] > 0):
+      guesses = sorted(g for g in guesses if g > Sij1["kw"])
+      guess = guesses.pop(0) if guesses else None
+    elif (Sij1 is None) and (Sij2 is not None):
+      guesses = sorted(g for g in guesses if g < Sij2["kw"])
+      guess = guesses.pop() if guesses else None
+    else:
+      guesses, guess = [], None
+    self.search_guesses = guesses
+    return guess
+
+  def neighbor_limits(self, typ, bus=None, k=None) -> list:
+    """(bus, distance, limit [kW]) of the k evaluated buses nearest to bus (default the active bus), 
+    by inputs["warm_start"]["method"] ("distance": line length, "impedance": change of the short circuit impedance).
+    The limit is the installed capacity plus the hosting capacity of the latest round at that bus.
+    """
+    if bus is None:
+      bus = self.active_bus
+    if k is None:
+      k = self.inputs["warm_start"]["neighbors"]
+    if self.feeder_distance is None:
+      self.feeder_distance = self.init_feeder_distance(self.inputs["warm_start"]["method"])
+    evaluated = self.data.buses("hc", typ)
+    dist = self.feeder_distance.distances(bus, evaluated)
+    out = []
+    for i in np.argsort(dist, kind="stable")[:k]:
+      if not np.isfinite(dist[i]):
+        break
+      hc, cnt = self.get_hc(typ, evaluated[i])
+      Sij = self.data.get("Sij", typ, evaluated[i], cnt)
+      if (Sij is not None) and isinstance(hc, dict):
+        out.append((evaluated[i], dist[i], Sij["kw"] + hc["kw"]))
+    return out
+
+  def init_feeder_distance(self, method="distance") -> ws.FeederDistance:
+    """distances along the feeder tree, by line length or by change of the short circuit impedance (see neighbor_limits)"""
+    if method == "distance":
+      return ws.FeederDistance(self.G, lambda u, v: ws.edge_length(self.G, u, v))
+    elif method != "impedance":
+      raise ValueError(f"init_feeder_distance: unknown method {method}, use distance or impedance")
+    tic = time.time()
+    self.setup_circuit()
+    i2x.solve_step(self.dss, 1, self.inputs["stepsize"])
+    zsc1 = {b: complex(*z) for b, z in i2x.bus_zsc1(self.dss, list(self.G.nodes())).items()}
+    self.reset_dss()
+    self.logger.info(f"Short circuit impedance of {len(zsc1)} buses for the warm start in {time.time() - tic:.1f} s")
+    return ws.FeederDistance(self.G, lambda u, v: abs(zsc1.get(v, 0) - zsc1.get(u, 0)))
+
+  def setup_circuit(self):
+    """reset the circuit and apply the present changes, without solving"""
+    self.reset_dss()
+    change_lines = self.change_lines + self.change_lines_noprint + self.upgrade_change_lines
+    if isinstance(self.dss, DSSSnapshot):
+      self.dss.apply(change_lines)
+      change_lines = []
+    i2x.run_opendss(**{**{"change_lines": change_lines, "dss": self.dss}, **self.inputs, 
+                       "demandinterval": False, "timepoints": [], "abort_limits": None})
+
+  def sensitivity_stale(self, typ) -> bool:
+    """whether the sensitivity screen of typ needs to be (re-)run: it was not run yet, or the circuit
+    changed since (the change line history grew) and inputs["sensitivity"]["refresh"] rounds have passed"""
+    if typ not in self.sensitivity:
+      return True
+    cnt, nhistory = self.sensitivity_at[typ]
+    refresh = self.inputs["sensitivity"].get("refresh")
+    return (refresh is not None) and (len(self.change_lines_history) > nhistory) and (self.cnt - cnt >= refresh)
+
+  def sensitivity_screen(self, typ="pv", buses=None, npoints=None) -> pd.DataFrame:
+    """Estimate the hosting capacity [kW] of the candidate buses (or the given buses) at once,
+    from the baseline at the critical time steps and the short circuit impedance of the buses
+    (see sensitivity.estimate_limits). The estimate for each limit type (vmax, vdiff, thermal)
+    and the limiting one are stored in self.sensitivity[typ], sorted by decreasing kw.
+    The resource is assumed to follow the PV profile for typ="pv" and to be at its rating otherwise.
+    """
+    if buses is None:
+      buses = self.candidate_buses(typ)
+    if npoints is None:
+      npoints = self.inputs["sensitivity"]["npoints"]
+    steps = self.critical_steps(npoints)
+    hours = np.arange(1, self.inputs["numsteps"] + 1)*self.inputs["stepsize"]/3600
+    if typ == "pv":
+      pv = i2x.loadshape_values(self.dss, self.inputs["pvcurve"], hours)
+      pv = pv/max(pv.max(), 1e-6)
+      frac, dfrac = pv[np.array(steps) - 1], np.abs(np.diff(pv)).max()
+    else:
+      frac, dfrac = np.ones(len(steps)), 0
+    pf = self.inputs["invpf"] if (typ == "pv") and (self.inputs["invmode"] == "CONSTANT_PF") else 1.0
+    q = np.sign(pf)*np.tan(np.arccos(min(abs(pf), 1)))
+
+    ## baseline at the critical steps
+    self.setup_circuit()
+    kvbase = i2x.bus_kvbase(self.dss)
+    vbus, flows = [], []
+    for step in steps:
+      i2x.solve_step(self.dss, step, self.inputs["stepsize"], None if self.screen_states is None else self.screen_states.get(step))
+      vbus.append(i2x.bus_vmax_pu(self.dss))
+      flows.append(i2x.branch_flows(self.dss, kvbase))
+    zsc1 = i2x.bus_zsc1(self.dss, buses)
+    self.reset_dss()
+
+    lims = self.inputs["metrics"]["limits"]["voltage"]
+    vmax = lims["vmax"] if self.metrics.base is None else max(lims["vmax"], self.metrics.base.volt_stats.loc["MaxVoltage", "limits"])
+    out = sens.estimate_limits(self.G, buses, vbus, flows, zsc1, kvbase, frac, dfrac, vmax=vmax, vdiff=lims["vdiff"], q=q)
+    self.sensitivity[typ] = out.sort_values("kw", ascending=False, kind="stable")
+    self.sensitivity_at[typ] = (self.cnt, len(self.change_lines_history))
+    self.logger.info(f"Sensitivity screen of {len(buses)} buses ({typ}) at time steps {steps}: " 
+                     f"limited by {self.sensitivity[typ]['limit'].value_counts().to_dict()}")
+    return self.sensitivity[typ]
+
+  def critical_steps(self, npoints:int) -> list[int]:
+    """time steps (1 based) most likely to limit the hosting capacity: the steps with the 
+    highest and lowest load, followed by the steps with the highest PV output relative to the load.
+    """
+    hours = np.arange(1, self.inputs["numsteps"] + 1)*self.inputs["stepsize"]/3600
+    pv = i2x.loadshape_values(self.dss, self.inputs["pvcurve"], hours)
+    load = i2x.loadshape_values(self.dss, self.inputs["loadcurve"], hours)
+    net = pv/max(pv.max(), 1e-6) - load/max(load.max(), 1e-6)
+    order = [np.argmax(load), np.argmin(load)] + list(np.argsort(-net, kind="stable"))
+    steps = []
+    for i in order:
+      if (i + 1 not in steps) and (len(steps) < npoints):
+        steps.append(int(i) + 1)
+    return sorted(steps)
+
   def plot(self, **kwargs):
     i2x.plot_opendss_feeder(self.G, **kwargs)
 
@@ -1277,23 +2078,65 @@ class HCAMetrics:
 
   def load_res(self, res:dict, **kwargs):
     self.clear_res()
-    self.res = {k:copy.deepcopy(v) for k, v in res.items() if k != "dss"}
+    ## the monitor tables are read-only, no need to copy them
+    self.res = {k:v if isinstance(v, i2x.MonitorTable) else copy.deepcopy(v) for k, v in res.items() if k != "dss"}
+    if self.res.get("aborted", False) or self.res.get("screened", False):
+      # run was stopped early/only screened, only the violations are known
+      self.volt_stats, self.vdiff = None, None
+      return
     self.volt_stats = calc_di_voltage_stats(res["di_voltexceptions"], **self.lims["voltage"], **kwargs)
     self.vdiff = dict_key_comp([get_volt_stats(res[k]) for k in ["voltdict", "pvdict", "recdict"]], "diff", np.max)
     # self.volt_stats = get_volt_stats(res["voltdict"])
     # self.pv_stats = get_volt_stats(res["pvdict"])
     # self.rec_stats = get_volt_stats(res["recdict"])
   
+  def margins(self) -> dict:
+    """Smallest margin of each metric in the last evaluation, normalized by the respective limit.
+    Positive means feasible, negative a violation. Metrics that carry no information
+    on the distance to the limit (e.g. no overloaded branches) are left out.
+    """
+    ## tolerances of the tests, i.e. a margin down to -tol is still feasible
+    tols = {"vmin": [self.tol["voltage_mag"], self.tol["voltage_integral"]],
+            "vmax": [self.tol["voltage_mag"], self.tol["voltage_integral"]],
+            "vdiff": [self.tol["voltage_diff"]], "emerg": [self.tol["thermal"]]}
+    out = {}
+    for metric_class, metrics in self.eval.items():
+      for metric, margin in metrics.items():
+        lim = self.lims[metric_class][metric]
+        if metric_class == "island":
+          margin = pd.DataFrame(margin)
+          if (margin[["p_dir", "q_dir"]] >= 0).all().any():
+            continue # flows in/out of all components never reverse, island screen is not binding
+          out[f"{metric_class}_{metric}"] = max((margin["p_frac"].min() + self.tol["island"])/lim[0], 
+                                                (margin["q_frac"].min() + self.tol["island"])/lim[1])
+          continue
+        vals = np.asarray(margin, dtype=float)
+        if vals.size == 0:
+          continue
+        vals = vals.reshape(len(vals), -1) if vals.ndim > 0 else vals.reshape(1, 1)
+        vals = np.where(vals != 0, vals + tols[metric][:vals.shape[1]], np.nan) # 0: e.g. no overloaded branches, or integral of violations that is 0 in both base and current run
+        if np.any(~np.isnan(vals)):
+          scale = 100 if metric_class == "thermal" else abs(lim)
+          out[f"{metric_class}_{metric}"] = np.nanmin(vals)/scale
+    return out
+
+  def worst_margin(self) -> float:
+    """Smallest normalized margin over all metrics (nan if none is informative)"""
+    vals = list(self.margins().values())
+    return float(np.nanmin(vals)) if vals else np.nan
+
   def get_vdiff_locations(self, lim=None):
     if lim is None:
       lim = self.lims["voltage"]["vdiff"]
     out = {"v": {}, "vdiff": {}}
     for reskey in ["pvdict", "recdict", "voltdict"]:
-      for k, v in self.res[reskey].items():
-        vbase = 1000*v["basekv"]/SQRT3
-        if 100*v["vdiff"]/vbase > lim:
-          out["v"][v["bus"]] = v["v"]/vbase
-          out["vdiff"][v["bus"]] = 100*np.diff(v["v"])/vbase
+      t = monitor_table(self.res[reskey])
+      if (len(t) == 0) or ("v" not in t.channels):
+        continue
+      vbase = t.vbase()
+      for n in np.flatnonzero(100*t.vdiff/vbase > lim):
+        out["v"][t.bus[n]] = t.v[n]/vbase[n]
+        out["vdiff"][t.bus[n]] = 100*np.diff(t.v[n])/vbase[n]
     return out
 
   def get_violation_list(self):
@@ -1305,16 +2148,21 @@ class HCAMetrics:
   def get_volt_buses(self, minmax, threshold=None):
     d = {}
     for reskey in ['pvdict', 'recdict', 'voltdict']:
-      for k, v  in self.res[reskey].items():
-          vbase = 1000*v["basekv"]/np.sqrt(3)
-          if threshold is not None:
-            tmp = threshold
-          elif v["basekv"] < 1: #LV
-            tmp = self.base.volt_stats.loc[f"{minmax}LVVoltage", "limits"]
-          else: # MV
-            tmp = self.base.volt_stats.loc[f"{minmax}Voltage", "limits"]
-          if ((minmax == "Max") and (v["vmax"]/vbase > tmp)) or ((minmax == "Min") and (v["vmin"]/vbase < tmp)):
-            d[v["bus"]] = v["v"]/vbase
+      t = monitor_table(self.res[reskey])
+      if (len(t) == 0) or ("v" not in t.channels):
+        continue
+      vbase = t.vbase()
+      if threshold is not None:
+        tmp = threshold
+      else: # LV or MV limit
+        tmp = np.where(t.basekv < 1, self.base.volt_stats.loc[f"{minmax}LVVoltage", "limits"],
+                                     self.base.volt_stats.loc[f"{minmax}Voltage", "limits"])
+      if minmax == "Max":
+        mask = t.vmax/vbase > tmp
+      else:
+        mask = t.vmin/vbase < tmp
+      for n in np.flatnonzero(mask):
+        d[t.bus[n]] = t.v[n]/vbase[n]
     return d
   
   def get_volt_max_buses(self, threshold=None):
@@ -1387,81 +2235,44 @@ class HCAMetrics:
       else:
         return self._test(self.res["di_overloads"]["%Emerg"], 100, -1, self.tol["thermal"])
     else:
-      mask = self.res["di_overloads"].index.isin(self.base.res["di_overloads"].index)
+      emerg = self.res["di_overloads"]["%Emerg"]
+      base_emerg = self.base.res["di_overloads"]["%Emerg"]
+      # position of each overloaded branch in the base solution (-1 if not overloaded there)
+      pos = base_emerg.index.get_indexer(emerg.index)
+      mask = pos >= 0
       ## test 1: any of the overloaded branches in base solution are not *more* overloaded
-      ov1 = self.base.res["di_overloads"]["%Emerg"].subtract(self.res["di_overloads"].loc[:,"%Emerg"]).dropna()
-      test1, margin1 = self._test(ov1, 0, 1, self.tol["thermal"])
+      ov1 = base_emerg.to_numpy()[pos[mask]] - emerg.to_numpy()[mask]
+      keep = ~np.isnan(ov1)
+      test1, margin1 = self._test(ov1[keep], 0, 1, self.tol["thermal"])
       ## test 2: no new overloaded branches (i.e. no loading > 100% emergency)
-      ov2 = self.res["di_overloads"].loc[~mask, "%Emerg"]  #<-- should be empty
+      ov2 = emerg.to_numpy()[~mask]  #<-- should be empty
       test2, margin2 = self._test(ov2, 100, -1, self.tol["thermal"])
-      return pd.concat([test1, test2]), pd.concat([margin1[~test1], margin2[~test2]])
-
-  def _all_comps(self, func, *args):
-    """Loop through all components, return first error"""
-    for i in self.res["compflows"].keys():
-      out = func(*args, i=i)
-      if not out[0]:
-        return out
-    return out
-  
+      index = emerg.index[mask][keep].append(emerg.index[~mask])
+      test = pd.Series(np.concatenate([test1, test2]), index=index, name="%Emerg")
+      margin = pd.Series(np.concatenate([margin1, margin2]), index=index, name="%Emerg")
+      return test, margin[~test]
+
   # def _island_dir(self, val, pq:str, i=None):
   def _island_dir(self):
     """Test if flow in/out of component is in total in same direction"""
-    # igonroing i and pq for now
-    # self.res["compflows"][i]["lims"].loc[["min", "max"], pq] -> the minimum and maximum p or q flow for component
-      #   \-> take the sign -> leads to array of [1, -1, etc.] of length 2
-      #   \-> take the sum: options are 2, -2 (both in same direction), 0 (opposite direction), 1 or -1 (unlikely, one element is exactly 0)
-      #   \-> take abs and subtract 1. If this is greater than 0 then both were in the same direction.
-    test = pd.concat([ 
-      pd.Series({i: np.abs(self.res["compflows"][i]["lims"].loc[["min", "max"], pq].apply(np.sign).sum()) - 1
-                 for i in self.res["compflows"].keys()}, name=f"{pq}_dir")
-                 for pq in ["p", "q"]], axis=1)
-    return self._test(test, 0, 1, 0) # this is an integer test so tolerance is 0
-    if i is not None:
-      # self.res["compflows"][i]["lims"].loc[["min", "max"], pq] -> the minimum and maximum p or q flow for component
-      #   \-> take the sign -> leads to array of [1, -1, etc.] of length 2
-      #   \-> take the sum: options are 2, -2 (both in same direction), 0 (opposite direction), 1 or -1 (unlikely, one element is exactly 0)
-      #   \-> take abs and subtract 1. If this is greater than 0 then both were in the same direction.
-      test = np.abs(self.res["compflows"][i]["lims"].loc[["min", "max"], pq].apply(np.sign).sum()) - 1
-      return self._test(test, 0, 1, self.tol["island"])
-    else:
-      return self._all_comps(self._island_dir, val, pq)
+    # the minimum and maximum p or q flow for each component
+    #   \-> take the sign -> 1, -1 (nan for a component without flows counts as 0)
+    #   \-> take the sum: options are 2, -2 (both in same direction), 0 (opposite direction), 1 or -1 (unlikely, one element is exactly 0)
+    #   \-> take abs and subtract 1. If this is greater than 0 then both were in the same direction.
+    lims = self.res["compflows"]["lims"]
+    test = (np.sign(lims["min"]).fillna(0) + np.sign(lims["max"]).fillna(0)).abs() - 1
+    return self._test(test.add_suffix("_dir"), 0, 1, 0) # this is an integer test so tolerance is 0
     
   # def _island_frac(self, val:list[float], pq:str, i=None):
   def _island_frac(self, val:list[float]):
     """get the ratio between the minimum magnitude flow in/out of region to the maximum flow
     val = [p_frac_limit, q_frac_limit]
     """
-    test = pd.concat([
-      pd.Series({i: self.res["compflows"][i]["lims"].transpose().apply(lambda x: x.minabs/np.max([np.abs(x["min"]), np.abs(x["max"])]), axis=1)[pq] 
-                 for i in self.res["compflows"].keys()}, name=f"{pq}_frac")
-                 for pq in ["p", "q"]], axis=1)
+    lims = self.res["compflows"]["lims"]
+    test = lims["minabs"] / np.maximum(lims["min"].abs(), lims["max"].abs())
     # Note that test is a comp x 2 sized DataFrame. when we subtract a list lenght 2
     # from this, it will subract the first entry from the first colum and the second from the second column.
-    return self._test(test, val, 1, self.tol["island"])
-    if i is not None:
-      test = self.res["compflows"][i]["lims"].transpose().apply(lambda x: x.minabs/np.max([np.abs(x["min"]), np.abs(x["max"])]), axis=1)[pq]
-      return self._test(test, val, 1, self.tol["island"])
-    else:
-      return self._all_comps(self._island_frac, val, pq)
-  
-  def _island_test(self, val, pq:str):
-     test, margin = self._island_dir(val, pq, i=self.comp)
-     if np.all(test):
-       # all direction tests passed, no need to continue
-       return test, margin
-     
-     test, margin = self._island_frac(val, pq, i=self.comp)
-     return test, margin
-
-  def _island_pq_old(self, vals):
-      ptest, pmargin = self._island_test(vals[0], "p")
-      if np.all(ptest):
-        # p tests passed, no need to check q
-        return ptest, pmargin
-
-      ## p test failed, check q as well
-      return self._island_test(vals[1], "q")
+    return self._test(test.add_suffix("_frac"), val, 1, self.tol["island"])
   
   def _island_pq(self, vals):
     """
@@ -1495,6 +2306,11 @@ class HCAMetrics:
 
 
   def calc_metrics(self, verbose=0):
+    if self.res.get("aborted", False) or self.res.get("screened", False):
+      self.violation = {"abort": copy.deepcopy(self.res["violations"])} if self.res["violations"] else {}
+      self.violation_count = len(self.res["violations"])
+      self.last_violation_list = self.get_violation_list()
+      return
     violation_count = 0
     for metric_class, metrics in self.lims.items():
       self.eval[metric_class] = {}
@@ -1516,6 +2332,27 @@ class HCAMetrics:
         
 
 
+_worker_hca = None
+_worker_state = None
+
+def _round_worker_init(filename, tmpdir):
+  """process pool initializer: load the saved hca once per worker.
+  Each worker runs in its own directory since the demand interval files are written to the cwd.
+  """
+  global _worker_hca, _worker_state
+  os.chdir(tempfile.mkdtemp(dir=tmpdir))
+  _worker_hca = HCA(filename, reload=True, reload_log={"logtofile": False, "loglevel": "warning"})
+  _worker_hca.inputs["checkpoint"] = None # the main process checkpoints the merged results
+  _worker_state = _worker_hca.copy_state()
+
+def _round_worker(job):
+  """evaluate a single hca round starting from the state of the batch"""
+  _worker_hca.restore_state(_worker_state)
+  _worker_hca.cnt = job["cnt"] - 1 # hca_round increments the count
+  _worker_hca.hca_round(job["typ"], bus=job["bus"], Sij=job["Sij"],
+                        allow_violations=job["allow_violations"], hciter=job["hciter"])
+  return _worker_hca.round_result(job["typ"], job["bus"], job["cnt"])
+
 def print_options():
   print ('Feeder Model Choices for HCA')
   print ('Feeder       Path                 Base File')
@@ -0,0 +1,218 @@
+"""Monte Carlo study of the hosting capacity over random rooftop PV placements.
+
+Every scenario draws its own placement of inputs["res_pv_frac"] rooftop PV
+(HCA.append_rooftop_pv) from an independent random stream spawned from a single
+seed, establishes its baseline and evaluates the hosting capacity of a fixed set
+of buses, each on its own (as in HCA.hca_round, starting from the scenario baseline).
+Scenarios are evaluated in a pool of worker processes, each compiling the feeder once
+(the circuit is restored in memory between scenarios, reset_mode "snapshot").
+
+The limit found at each bus (installed plus hosting capacity [kW]) is added to
+an on-disk histogram per bus (HCAggregate), so the memory does not grow with the
+number of scenarios and an interrupted study continues where it stopped. A scenario
+is written to meta.json as pending before it is added, so one interrupted while
+being added is completed (exactly once) when the study is opened again.
+Quantiles are interpolated within the histogram bins (of width kw_step).
+
+usage: python hca_montecarlo.py config.json
+"""
+import os
+import json
+import tempfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import i2x.api as i2x
+import hca as h
+
+### columns of HCAggregate.moments
+MOMENTS = ["n", "min", "max", "sum", "sumsq"]
+
+def scenario_random_states(seed, n:int, start=0) -> list:
+  """independent random states of scenarios start...n-1, spawned from seed"""
+  children = np.random.SeedSequence(seed).spawn(n)
+  return [np.random.RandomState(np.random.MT19937(s)) for s in children[start:]]
+
+class HCAggregate:
+  """Histograms [bus x bin] of the hosting capacity limits over the scenarios, memory mapped in path.
+  Bins are kw_step wide up to kw_max, the last bin holds everything above (quantiles in it are given as its lower edge).
+  """
+  def __init__(self, path, buses=None, typ="pv", kw_step=25.0, kw_max=20000.0, seed=None):
+    self.path = path
+    meta = os.path.join(path, "meta.json")
+    if os.path.exists(meta):
+      with open(meta) as f:
+        self.meta = json.load(f)
+      if (buses is not None) and (list(buses) != self.meta["buses"]):
+        raise ValueError(f"HCAggregate: {path} holds a study of other buses")
+      mode = "r+"
+    else:
+      if buses is None:
+        raise ValueError(f"HCAggregate: no study in {path}, buses must be given")
+      os.makedirs(path, exist_ok=True)
+      self.meta = {"buses": list(buses), "typ": typ, "kw_step": kw_step, "kw_max": kw_max, "seed": seed, "done": 0}
+      mode = "w+"
+    nbus = len(self.meta["buses"])
+    nbins = int(np.ceil(self.meta["kw_max"]/self.meta["kw_step"])) + 1
+    self.pos = {b: i for i, b in enumerate(self.meta["buses"])}
+    self.counts = np.lib.format.open_memmap(os.path.join(path, "counts.npy"), mode=mode, dtype=np.int64, shape=(nbus, nbins))
+    self.moments = np.lib.format.open_memmap(os.path.join(path, "moments.npy"), mode=mode, dtype=float, shape=(nbus, len(MOMENTS)))
+    if mode == "w+":
+      self.moments[:, MOMENTS.index("min")] = np.inf
+      self.moments[:, MOMENTS.index("max")] = -np.inf
+      self.flush()
+    elif self.meta.get("pending") is not None:
+      self._commit()
+
+  @property
+  def buses(self) -> list:
+    return self.meta["buses"]
+
+  @property
+  def done(self) -> int:
+    """number of scenarios added"""
+    return self.meta["done"]
+
+  def add(self, limits:dict):
+    """add the limits {bus: kw} of one scenario, written through to the files"""
+    self.meta["pending"] = {bus: float(kw) for bus, kw in limits.items()}
+    self._write_meta()
+    self._commit()
+
+  def _commit(self):
+    """add the pending scenario. Every bus holds done scenarios before it is added,
+    so the histogram and moments of a bus already updated (before an interruption) are skipped."""
+    done = self.meta["done"]
+    for bus, kw in self.meta["pending"].items():
+      i = self.pos[bus]
+      if self.counts[i].sum() == done:
+        self.counts[i, min(int(kw//self.meta["kw_step"]), self.counts.shape[1] - 1)] += 1
+      n, kwmin, kwmax, s, s2 = self.moments[i]
+      if n == done:
+        self.moments[i] = [n + 1, min(kwmin, kw), max(kwmax, kw), s + kw, s2 + kw*kw]
+    self.meta["done"] += 1
+    self.meta["pending"] = None
+    self.flush()
+
+  def _write_meta(self):
+    ## replace the file, so that it is never left partly written
+    fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+      json.dump(self.meta, f)
+    os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+  def flush(self):
+    self.counts.flush()
+    self.moments.flush()
+    self._write_meta()
+
+  def quantiles(self, q=(0.05, 0.5, 0.95)) -> pd.DataFrame:
+    """quantiles [kW] of the limit of each bus, interpolated within the bins"""
+    q = np.atleast_1d(q)
+    step = self.meta["kw_step"]
+    cum = np.cumsum(self.counts, axis=1)
+    out = np.full((len(self.buses), len(q)), np.nan)
+    for i in range(len(self.buses)):
+      n = cum[i, -1]
+      if n == 0:
+        continue
+      for j, qj in enumerate(q):
+        k = np.searchsorted(cum[i], qj*n) # first bin reaching the quantile
+        below = cum[i, k-1] if k > 0 else 0
+        frac = (qj*n - below)/max(self.counts[i, k], 1) if k < cum.shape[1] - 1 else 0 # above kw_max: lower bound
+        out[i, j] = (k + frac)*step
+      out[i] = np.clip(out[i], self.moments[i, 1], self.moments[i, 2])
+    return pd.DataFrame(out, index=self.buses, columns=q)
+
+  def summary(self, q=(0.05, 0.5, 0.95)) -> pd.DataFrame:
+    """number of samples, mean, standard deviation, extremes and quantiles [kW] of the limit of each bus"""
+    m = pd.DataFrame(self.moments, index=self.buses, columns=MOMENTS)
+    n = m["n"].where(m["n"] > 0)
+    out = pd.DataFrame({"n": m["n"].astype(int), "mean": m["sum"]/n,
+                        "std": np.sqrt(np.maximum(m["sumsq"]/n - (m["sum"]/n)**2, 0)),
+                        "min": m["min"].where(m["n"] > 0), "max": m["max"].where(m["n"] > 0)})
+    return pd.concat([out, self.quantiles(q).add_prefix("q")], axis=1)
+
+_worker_hca = None
+_worker_state = None
+
+def _scenario_worker_init(inputs, tmpdir):
+  """process pool initializer: compile the feeder once per worker (in its own directory for the demand interval files)"""
+  global _worker_hca, _worker_state
+  os.chdir(tempfile.mkdtemp(dir=tmpdir))
+  inputs = {**inputs, "reset_mode": "snapshot", "checkpoint": None,
+            "hca_log": {**inputs["hca_log"], "logtofile": False, "loglevel": "warning"}}
+  _worker_hca = h.HCA(inputs)
+  _worker_state = _worker_hca.copy_state()
+
+def _scenario_worker(job) -> dict:
+  """limits {bus: kw} of one scenario"""
+  hca = _worker_hca
+  hca.restore_state(_worker_state)
+  hca.reset_dss(clear_changes=False) # the compiled feeder, without the resources of the previous scenario
+  hca.random_state = job["random_state"]
+  hca.sensitivity = {}
+  hca.screen_steps, hca.screen_states = None, None
+  hca.runbase()
+  base = hca.copy_state()
+  out = {}
+  for bus in job["buses"]:
+    hca.restore_state(base)
+    hca.hca_round(job["typ"], bus=bus)
+    Sij, _ = hca.get_data("Sij", job["typ"], bus, cnt=hca.cnt)
+    hc, _ = hca.get_hc(job["typ"], bus, cnt=hca.cnt)
+    out[bus] = Sij["kw"] + hc["kw"]
+  return out
+
+def sample_buses(inputs, nbuses:int, seed=None) -> list:
+  """nbuses of the 3 phase buses without resources of the feeder, sampled with seed"""
+  G = i2x.load_builtin_graph(inputs["choice"])
+  buses = sorted(i2x.parse_opendss_graph(G, bSummarize=False)["bus3phase"])
+  rng = np.random.RandomState(np.random.MT19937(np.random.SeedSequence(seed)))
+  return sorted(str(b) for b in rng.choice(buses, size=min(nbuses, len(buses)), replace=False))
+
+def run_montecarlo(inputs, nscenarios=None, path=None, buses=None, nproc=None, logger=print) -> HCAggregate:
+  """evaluate scenarios up to nscenarios (default inputs["montecarlo"]), adding to the study in path.
+  Returns the aggregate. Note: the calling script must be protected by `if __name__ == "__main__":`
+  since workers are spawned.
+  """
+  mc = inputs["montecarlo"]
+  nscenarios = mc["nscenarios"] if nscenarios is None else nscenarios
+  path = mc["path"] if path is None else path
+  nproc = mc["nproc"] if nproc is None else nproc
+  if os.path.exists(os.path.join(path, "meta.json")):
+    agg = HCAggregate(path, buses)
+  else:
+    # keep the seed with the study, so that it can be continued
+    seed = mc["seed"] if mc["seed"] is not None else np.random.SeedSequence().entropy
+    if buses is None:
+      buses = mc["buses"] or sample_buses(inputs, mc["nbuses"], seed)
+    agg = HCAggregate(path, buses, mc["typ"], mc["kw_step"], mc["kw_max"], seed)
+  start = agg.done
+  if start >= nscenarios:
+    return agg
+  jobs = [{"typ": agg.meta["typ"], "buses": agg.buses, "random_state": rs}
+          for rs in scenario_random_states(agg.meta["seed"], nscenarios, start)]
+  nproc = min(nproc or os.cpu_count(), len(jobs))
+  logger(f"Monte Carlo scenarios {start+1}-{nscenarios} of {len(agg.buses)} buses on {nproc} processes")
+  with tempfile.TemporaryDirectory() as tmpdir:
+    with ProcessPoolExecutor(max_workers=nproc, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_scenario_worker_init, initargs=(inputs, tmpdir)) as pool:
+      for i, limits in enumerate(pool.map(_scenario_worker, jobs)):
+        agg.add(limits)
+        logger(f"\tscenario {start+i+1}: {', '.join(f'{b} {kw:.0f}' for b, kw in limits.items())} kW")
+  return agg
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="i2X Monte Carlo Hosting Capacity Analysis")
+  parser.add_argument("config", nargs='?', help="configuration file", default="defaults.json")
+  parser.add_argument("--nscenarios", type=int, help="number of scenarios (default montecarlo.nscenarios)")
+  parser.add_argument("--nproc", type=int, help="number of processes (default montecarlo.nproc)")
+  args = parser.parse_args()
+
+  inputs = h.load_config(args.config)
+  agg = run_montecarlo(inputs, nscenarios=args.nscenarios, nproc=args.nproc)
+  pd.set_option("display.max_rows", None)
+  print(agg.summary())
@@ -0,0 +1,149 @@
+"""Parameter sweeps of the feeder solution (i2x.run_opendss) or the hca baseline (HCA.runbase).
+
+A sweep evaluates every combination of the values in a grid, e.g.
+  {"invmode": ["CONSTANT_PF", "VOLT_WATT"], "loadmult": [0.8, 1.0, 1.2]}
+in a pool of worker processes and returns one row per combination with the
+grid values and the scalar results of the run (converged, vminpu, kWh_PV, ...).
+
+The settings in LATE_KEYS are only applied by run_opendss after the feeder is
+compiled. Combinations that differ only in these share a compiled base in each
+worker, which is restored in memory between runs (dss_snapshot.DSSSnapshot)
+instead of being compiled again. Other keys of the grid (e.g. "choice" or
+"res_pv_frac") get a base of their own.
+
+usage: python hca_sweep.py config.json
+"""
+import os
+import json
+import time
+import tempfile
+import argparse
+import itertools
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import i2x.api as i2x
+import hca as h
+from dss_snapshot import DSSSnapshot
+from result_cache import KEY_INPUTS
+
+### settings applied by run_opendss on top of the compiled feeder
+LATE_KEYS = ["invmode", "invpf", "loadmult", "pvcurve", "loadcurve", "ctrlmode"]
+
+### scalar results of run_opendss included in the sweep table
+OUTPUT_KEYS = ["converged", "vminpu", "vmaxpu", "num_low_voltage", "num_high_voltage", "num_cap_switches",
+               "num_tap_changes", "num_relay_trips", "kWh_Net", "kWh_Load", "kWh_Loss", "kWh_Gen", "kWh_PV",
+               "kvarh_PV", "kWh_EEN", "kWh_UE", "kWh_OverN", "kWh_OverE"]
+
+### number of compiled bases kept per worker
+BASES_PER_WORKER = 2
+
+def configurations(grid:dict) -> list:
+  """all combinations of the grid values, the last key varying fastest"""
+  keys = list(grid)
+  return [dict(zip(keys, vals)) for vals in itertools.product(*[grid[k] for k in keys])]
+
+def base_key(inputs:dict) -> str:
+  """identifies the compiled base of a configuration: the inputs that affect the solution except the late settings"""
+  return json.dumps({k: inputs[k] for k in KEY_INPUTS if (k in inputs) and (k not in LATE_KEYS)}, sort_keys=True, default=str)
+
+def disable_controls(dss:DSSSnapshot):
+  """disable the inverter controls of a previous run (run_opendss re-defines those of its invmode)"""
+  for c in ["invcontrol", "expcontrol"]:
+    dss.disable_class(c)
+
+_worker_bases = OrderedDict()
+
+def _sweep_worker_init(tmpdir):
+  """process pool initializer: each worker runs in its own directory since the demand interval files are written to the cwd"""
+  os.chdir(tempfile.mkdtemp(dir=tmpdir))
+
+def _worker_base(key:str, make):
+  """compiled base of key (created by make), keeping the most recently used ones"""
+  base = _worker_bases.get(key)
+  if base is None:
+    base = make()
+    _worker_bases[key] = base
+    while len(_worker_bases) > BASES_PER_WORKER:
+      _worker_bases.popitem(last=False)
+  else:
+    _worker_bases.move_to_end(key)
+  return base
+
+def _run_config(job) -> dict:
+  """run_opendss of one configuration on the shared compiled base"""
+  inputs = {**job["inputs"], "debug_output": False}
+  change_lines = job["change_lines"]
+  def make():
+    dss = DSSSnapshot(i2x.initialize_opendss(**inputs))
+    dss.commit(change_lines)
+    dss.get_state()
+    return dss
+  tic = time.time()
+  dss = _worker_base(job["key"], make)
+  if not dss.restore(change_lines):
+    raise ValueError("hca_sweep: compiled base can not be restored")
+  disable_controls(dss)
+  res = i2x.run_opendss(**{**inputs, "dss": dss, "change_lines": None, "demandinterval": False})
+  return {**{k: res.get(k) for k in OUTPUT_KEYS}, "time": time.time() - tic}
+
+def _base_config(job) -> dict:
+  """HCA.runbase of one configuration on the shared compiled base"""
+  inputs = {**job["inputs"], "reset_mode": "snapshot", "checkpoint": None,
+            "hca_log": {**job["inputs"]["hca_log"], "logtofile": False, "loglevel": "warning"}}
+  def make():
+    hca = h.HCA(inputs)
+    return hca, hca.copy_state()
+  tic = time.time()
+  hca, clean = _worker_base(job["key"], make)
+  hca.restore_state(clean)
+  hca.inputs.update({k: inputs[k] for k in LATE_KEYS})
+  hca.screen_steps, hca.screen_states = None, None
+  hca.reset_dss(clear_changes=False)
+  disable_controls(hca.dss)
+  hca.runbase()
+  out = {k: hca.lastres.get(k) for k in OUTPUT_KEYS}
+  out["vdiff"] = float(hca.metrics.base.vdiff) if hca.metrics.base.vdiff is not None else None
+  return {**out, "time": time.time() - tic}
+
+def sweep(inputs:dict, grid:dict, mode="run", change_lines=None, nproc=None, logger=print) -> pd.DataFrame:
+  """evaluate all combinations of grid (overriding inputs) with run_opendss (mode="run", applying change_lines)
+  or HCA.runbase (mode="base"), on nproc worker processes.
+  Returns a table with the grid values and the results (OUTPUT_KEYS, vdiff for mode="base" and the run time [s]).
+  Note: the calling script must be protected by `if __name__ == "__main__":` since workers are spawned.
+  """
+  if mode not in ["run", "base"]:
+    raise ValueError(f"hca_sweep: unknown mode {mode}, use run or base")
+  configs = configurations(grid)
+  jobs = []
+  for i, config in enumerate(configs):
+    cinputs = {**inputs, **config}
+    jobs.append({"i": i, "inputs": cinputs, "key": base_key(cinputs), "change_lines": list(change_lines or [])})
+  ## configurations with the same base after each other, so workers mostly reuse theirs
+  keys = list(dict.fromkeys(j["key"] for j in jobs))
+  jobs.sort(key=lambda j: keys.index(j["key"]))
+  nproc = min(nproc or os.cpu_count(), len(jobs))
+  logger(f"Sweep of {len(jobs)} configurations ({len(keys)} compiled bases) on {nproc} processes")
+  results = [None]*len(jobs)
+  with tempfile.TemporaryDirectory() as tmpdir:
+    with ProcessPoolExecutor(max_workers=nproc, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_sweep_worker_init, initargs=(tmpdir,)) as pool:
+      for job, res in zip(jobs, pool.map(_run_config if mode == "run" else _base_config, jobs)):
+        results[job["i"]] = res
+  return pd.concat([pd.DataFrame(configs), pd.DataFrame(results)], axis=1)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="i2X parameter sweep")
+  parser.add_argument("config", nargs='?', help="configuration file", default="defaults.json")
+  parser.add_argument("--mode", help="run (run_opendss) or base (HCA.runbase), default sweep.mode")
+  parser.add_argument("--nproc", type=int, help="number of processes (default sweep.nproc)")
+  parser.add_argument("--out", help="write the table to this csv file")
+  args = parser.parse_args()
+
+  inputs = h.load_config(args.config)
+  df = sweep(inputs, inputs["sweep"]["grid"], mode=args.mode or inputs["sweep"]["mode"], nproc=args.nproc or inputs["sweep"]["nproc"])
+  if args.out:
+    df.to_csv(args.out, index=False)
+  pd.set_option("display.max_rows", None)
+  print(df)
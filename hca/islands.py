@@ -207,24 +207,37 @@ def plot_components(n, m, G, comps):
     plt.show()
     
 
-def island_flows(compid:int, comp2rec:dict, recdict:dict):
-    """
-    Collect active and reactive power flowing in/out of
-    component `compid`
-    """
-    df = {"p": {}, "q": {}}
-    for e in comp2rec[compid]:
-        name = e[2]["ename"]
-        direction = e[2]["direction"]
-        df["p"][name] = direction * recdict[name]["p"]
-        df["q"][name] = direction * recdict[name]["q"]
-    df = {k: pd.DataFrame(v) for k, v in df.items()}
-    df["lims"] = pd.DataFrame({k: df[k].sum(axis=1).agg(["min", "max", minabs]).to_dict() for k in ["p", "q"]})
-
-    return df
-
-def all_island_flows(comp2rec:dict, recdict:dict):
-    return {i: island_flows(i, comp2rec, recdict) for i in comp2rec.keys()}    
-
-def minabs(x):
-    return x.abs().min()
\ No newline at end of file
+def comp_incidence(comp2rec:dict) -> Tuple[np.ndarray, list]:
+    """
+    Component x recloser incidence matrix, with the direction
+    (positive means flow *out* of component) of each recloser of a component.
+    Returns the matrix and the recloser names (columns)
+    """
+    names = list(dict.fromkeys(e[2]["ename"] for recs in comp2rec.values() for e in recs))
+    col = {name: j for j, name in enumerate(names)}
+    A = np.zeros((len(comp2rec), len(names)))
+    for i, recs in enumerate(comp2rec.values()):
+        for e in recs:
+            A[i, col[e[2]["ename"]]] = e[2]["direction"]
+    return A, names
+
+def island_flow_array(comp2rec:dict, recdict, incidence=None) -> dict:
+    """
+    Net active and reactive power flowing out of all components (component x time),
+    from the recloser flows in recdict (a MonitorTable), and their min, max and minabs
+    over time (DataFrames indexed by component, columns p and q).
+    """
+    A, names = comp_incidence(comp2rec) if incidence is None else incidence
+    rows = [recdict.index[name] for name in names]
+    out = {"comps": list(comp2rec.keys())}
+    lims = {"min": {}, "max": {}, "minabs": {}}
+    for pq in ["p", "q"]:
+        flows = A @ np.nan_to_num(getattr(recdict, pq)[rows]) if rows else np.zeros((len(A), 0))
+        out[pq] = flows
+        ## components without reclosers have no flows (nan)
+        empty = ~A.any(axis=1)
+        for k, func in [("min", np.min), ("max", np.max), ("minabs", lambda x, axis: np.abs(x).min(axis=axis))]:
+            vals = func(flows, axis=1) if flows.shape[1] > 0 else np.full(len(A), np.nan)
+            lims[k][pq] = np.where(empty, np.nan, vals)
+    out["lims"] = {k: pd.DataFrame(v, index=out["comps"]) for k, v in lims.items()}
+    return out
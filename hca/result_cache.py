@@ -0,0 +1,86 @@
+"""Cache of power flow results keyed by the circuit configuration.
+
+The hca solves the same circuit more than once, e.g. the final run of a round
+installs the capacity that was already solved as the last trial of the search.
+A configuration is identified by the inputs that affect the solution, a hash of
+the feeder model files and the full list of change lines applied to the compiled
+feeder, normalized (case, whitespace) and hashed. Results are kept in memory
+with least recently used eviction and, optionally, pickled to a directory that
+can be shared between runs/processes.
+"""
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+### inputs that affect the solution (the compiled feeder, the time series and the results read back),
+### any other input is left out of the key
+KEY_INPUTS = ["choice", "loadcurve", "loadmult", "pvcurve", "invmode", "invpf", "solnmode", "ctrlmode", "stepsize", "numsteps",
+              "res_pv_frac", "remove_all_pv", "allow_forms", "feeder_cache", "di_output", "voltage_monitors", "reg_control",
+              "remove_large_der", "explicit_storage", "explicit_pv", "explicit_gen", "explicit_generator",
+              "redisp_pv", "redisp_gen", "redisp_storage"]
+
+def normalize_line(line:str) -> str:
+  """dss commands and names are case insensitive"""
+  return " ".join(line.split()).lower()
+
+def config_key(inputs:dict, lines:list, model:str="") -> str:
+  """hash of the run inputs, the model hash (see i2x.feeder_model_hash) and the change lines"""
+  h = hashlib.sha256()
+  h.update(model.encode())
+  h.update(json.dumps({k: inputs[k] for k in KEY_INPUTS if k in inputs}, sort_keys=True, default=str).encode())
+  for l in lines:
+    h.update(b"\n")
+    h.update(normalize_line(l).encode())
+  return h.hexdigest()
+
+class ResultCache:
+  def __init__(self, size=32, path=None, model=""):
+    self.size = size
+    self.path = path
+    self.model = model # hash of the feeder model files, part of each key
+    self.mem = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    if path is not None:
+      os.makedirs(path, exist_ok=True)
+
+  def _file(self, key:str) -> str:
+    return os.path.join(self.path, f"{key}.pkl")
+
+  def get(self, key:str):
+    """cached result (a shallow copy) or None"""
+    res = self.mem.get(key)
+    if res is not None:
+      self.mem.move_to_end(key)
+    elif (self.path is not None) and os.path.exists(self._file(key)):
+      with open(self._file(key), "rb") as f:
+        res = pickle.load(f)
+      self._put_mem(key, res)
+    if res is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return dict(res)
+
+  def put(self, key:str, res:dict):
+    res = {k: v for k, v in res.items() if k != "dss"}
+    self._put_mem(key, res)
+    if self.path is not None:
+      ## write to a temporary file first so that other processes never read a partial file
+      fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+      with os.fdopen(fd, "wb") as f:
+        pickle.dump(res, f)
+      os.replace(tmp, self._file(key))
+
+  def _put_mem(self, key:str, res:dict):
+    self.mem[key] = res
+    self.mem.move_to_end(key)
+    while len(self.mem) > self.size:
+      self.mem.popitem(last=False)
+
+  def clear(self):
+    """clear the memory tier (files are kept)"""
+    self.mem.clear()
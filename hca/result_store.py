@@ -0,0 +1,158 @@
+"""Store of the per round results of the hca (installed capacity, hosting capacity and evaluation).
+
+Results are appended to a columnar table (cnt, typ, bus, key, kw, kva, kwh, margins) together
+with the stored values, and indexed by (key, typ, bus) on the sorted round counters, so the
+latest result of a bus is found with a binary search instead of walking back one round at a time.
+A result of a round that already has one replaces it in its row, as in the earlier HCA.data.
+Indexing the store by key (store["hc"]) gives a read only view of the nested {typ: {bus: {cnt: vals}}}
+dictionaries of the earlier HCA.data, and the table can be exported to Parquet or SQLite for post processing.
+"""
+import os
+import copy
+import sqlite3
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+KEYS = ["Sij", "hc", "eval"]
+COLUMNS = ["cnt", "typ", "bus", "key", "kw", "kva", "kwh", "margins"]
+
+def flatten_margins(vals:dict) -> dict:
+  """smallest margin of each metric ("class.metric") of an evaluation"""
+  out = {}
+  for metric_class, metrics in vals.items():
+    for metric, margin in metrics.items():
+      m = np.asarray(margin, dtype=float)
+      out[f"{metric_class}.{metric}"] = np.nanmin(m) if np.any(~np.isnan(m)) else np.nan
+  return out
+
+class NestedView(Mapping):
+  """read only view of nested dictionaries, down to depth levels"""
+  def __init__(self, d:dict, depth:int):
+    self.d = d
+    self.depth = depth
+
+  def __getitem__(self, k):
+    v = self.d[k]
+    return NestedView(v, self.depth - 1) if self.depth > 1 else v
+
+  def __iter__(self):
+    return iter(self.d)
+
+  def __len__(self):
+    return len(self.d)
+
+  def __repr__(self):
+    return repr(self.d)
+
+class ResultStore(Mapping):
+  def __init__(self):
+    self.columns = {c: [] for c in COLUMNS}
+    self.vals = []
+    self.index = {} # (key, typ, bus) -> (sorted cnts, rows)
+    self.nested = {key: {} for key in KEYS} # key -> {typ: {bus: {cnt: vals}}}, see __getitem__
+    self.modified = set() # rows replaced since the last mark, see rows
+    self.stotal = {} # cnt -> total installed capacity (HCA.collect_stats)
+
+  @classmethod
+  def from_nested(cls, data:dict):
+    """store from the nested dictionaries of HCA.data"""
+    out = cls()
+    out.stotal = data.get("Stotal", {})
+    rows = [(cnt, key, typ, bus, vals) for key in KEYS for typ, buses in data.get(key, {}).items()
+            for bus, cnts in buses.items() for cnt, vals in cnts.items()]
+    for cnt, key, typ, bus, vals in sorted(rows, key=lambda x: x[0]):
+      out.append(key, typ, bus, cnt, vals)
+    return out
+
+  def append(self, key:str, typ:str, bus:str, cnt:int, vals:dict):
+    """add a result (a copy of vals), replacing any earlier one of the same round in its row"""
+    vals = copy.deepcopy(vals)
+    margins = flatten_margins(vals) if key == "eval" else None
+    cnts, rows = self.index.setdefault((key, typ, bus), ([], []))
+    i = bisect_left(cnts, cnt)
+    if (i < len(cnts)) and (cnts[i] == cnt):
+      row = rows[i]
+      self.vals[row] = vals
+      self.modified.add(row)
+    else:
+      row = len(self.vals)
+      self.vals.append(vals)
+      for c in COLUMNS:
+        self.columns[c].append(None)
+      cnts.insert(i, cnt)
+      rows.insert(i, row)
+    for c, v in zip(COLUMNS, [cnt, typ, bus, key, vals.get("kw", np.nan), vals.get("kva", np.nan), vals.get("kwh", np.nan), margins]):
+      self.columns[c][row] = v
+    self.nested[key].setdefault(typ, {}).setdefault(bus, {})[cnt] = vals
+
+  def rows(self, start=0) -> list:
+    """(key, typ, bus, cnt, vals) of the results appended from row start on, 
+    preceded by those of the earlier rows replaced since the last mark"""
+    changed = sorted(r for r in self.modified if r < start) + list(range(start, len(self.vals)))
+    return [(self.columns["key"][r], self.columns["typ"][r], self.columns["bus"][r], self.columns["cnt"][r], self.vals[r])
+            for r in changed]
+
+  def mark(self):
+    """start tracking the replaced rows anew (e.g. at a checkpoint)"""
+    self.modified = set()
+
+  def get(self, key:str, typ:str, bus:str, cnt:int):
+    """result of round cnt, None if there is none"""
+    cnts, rows = self.index.get((key, typ, bus), ([], []))
+    i = bisect_left(cnts, cnt)
+    if (i < len(cnts)) and (cnts[i] == cnt):
+      return self.vals[rows[i]]
+    return None
+
+  def latest(self, key:str, typ:str, bus:str, cnt:int) -> tuple:
+    """latest result at or before round cnt and its round, (None, -1) if there is none"""
+    cnts, rows = self.index.get((key, typ, bus), ([], []))
+    i = bisect_right(cnts, cnt)
+    if i == 0:
+      return None, -1
+    return self.vals[rows[i-1]], cnts[i-1]
+
+  def buses(self, key:str, typ:str) -> list:
+    """buses with results of key and typ"""
+    return [bus for (k, t, bus) in self.index if (k == key) and (t == typ)]
+
+  def __getitem__(self, key:str) -> dict:
+    if key == "Stotal":
+      return self.stotal
+    if key not in KEYS:
+      raise KeyError(key)
+    return NestedView(self.nested[key], 3)
+
+  def __iter__(self):
+    return iter(["Stotal"] + KEYS)
+
+  def __len__(self):
+    return len(KEYS) + 1
+
+  def to_frame(self) -> pd.DataFrame:
+    """the table of results, with a column per evaluation margin"""
+    df = pd.DataFrame({c: self.columns[c] for c in COLUMNS if c != "margins"})
+    margins = pd.DataFrame([m or {} for m in self.columns["margins"]])
+    return pd.concat([df, margins.add_prefix("margin.")], axis=1)
+
+  def export(self, path:str, table="results"):
+    """write the table to a Parquet (.parquet) or SQLite (.db, .sqlite) file"""
+    df = self.to_frame()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in [".parquet", ".pq"]:
+      df.to_parquet(path, index=False)
+    elif ext in [".db", ".sqlite", ".sqlite3"]:
+      with sqlite3.connect(path) as con:
+        df.to_sql(table, con, if_exists="replace", index=False)
+    else:
+      raise ValueError(f"ResultStore.export: unknown file type {ext}, use .parquet or .db/.sqlite")
+
+def read_results(path:str, table="results") -> pd.DataFrame:
+  """read a table written by ResultStore.export"""
+  ext = os.path.splitext(path)[1].lower()
+  if ext in [".parquet", ".pq"]:
+    return pd.read_parquet(path)
+  with sqlite3.connect(path) as con:
+    return pd.read_sql(f"select * from {table}", con)
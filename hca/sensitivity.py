@@ -0,0 +1,83 @@
+"""Linear sensitivity screen of the hosting capacity of many buses at once.
+
+The voltage rise due to an injection of P kW and Q kvar at a bus is estimated from the
+positive sequence short circuit impedance of the bus, dV [pu] = (R1*P + X1*Q)/(1000*kV_LL^2),
+and the injection is assumed to flow back to the source along the (radial) feeder, adding
+to the terminal powers of the branches on the way. Together with the bus voltages and branch
+flows of a few baseline solves (the critical time steps) this gives, for every bus, the
+injection at which the maximum voltage, the voltage change between time steps (vdiff)
+and the branch emergency ratings are reached.
+"""
+import numpy as np
+import pandas as pd
+import networkx as nx
+import islands as isl
+
+### OpenDSS class of the elements behind the edge classes of the feeder graph
+EDGE_CLASS = {"line": "line", "switch": "line", "recloser": "line", "swtcontrol": "line",
+              "transformer": "transformer", "regulator": "transformer", "reactor": "reactor"}
+
+def feeder_tree(G, source="sourcebus") -> tuple:
+  """parent bus (towards the source) of each bus, the element connecting them,
+  and all buses in breadth first order from the source
+  """
+  H = isl.get_nondir_tree(G)
+  parent, elem, order = {}, {}, [source]
+  for u, v in nx.bfs_edges(H, source):
+    d = H.edges[u, v]
+    parent[v] = u
+    elem[v] = f'{EDGE_CLASS.get(d["eclass"], d["eclass"])}.{d["ename"]}'.lower()
+    order.append(v)
+  return parent, elem, order
+
+def thermal_headroom(S:complex, rating:float, sign:int, q:float) -> float:
+  """largest injection x [kW] (with q*x kvar) such that the branch power |S + sign*x*(1 + jq)|
+  stays within the rating, or within the present power if that already exceeds the rating.
+  sign is -1 if the injection flows against the direction of S (i.e. S is measured upstream).
+  """
+  lim = max(rating, abs(S))
+  a = 1 + q*q
+  b = S.real + q*S.imag
+  c = abs(S)**2 - lim**2
+  return (-sign*b + np.sqrt(max(b*b - a*c, 0)))/a
+
+def estimate_limits(G, buses:list, vbus:list, flows:list, zsc1:dict, kvbase:dict, frac, dfrac:float,
+                    vmax=1.05, vdiff=3.0, q=0.0, source="sourcebus") -> pd.DataFrame:
+  """estimated injection limit [kW] at each bus, by limit type.
+  vbus and flows are the bus voltages (bus_vmax_pu) and branch flows (branch_flows) of the
+  baseline at a number of time steps, frac the output of the resource (fraction of its rating)
+  at these steps and dfrac the largest change of the output between consecutive time steps.
+  vmax is in pu, vdiff in percent and q the reactive power per kW of the resource.
+  """
+  parent, elem, order = feeder_tree(G, source)
+  r1 = np.array([zsc1[b][0] for b in buses])
+  x1 = np.array([zsc1[b][1] for b in buses])
+  kv = np.array([np.sqrt(3)*kvbase.get(b, 0) for b in buses])
+  with np.errstate(divide="ignore", invalid="ignore"):
+    sens = np.where(kv > 0, (r1 + q*x1)/(1000*kv**2), 0) # pu per kW
+    lims = {"vmax": np.full(len(buses), np.inf), "thermal": np.full(len(buses), np.inf)}
+    for v, f, fr in zip(vbus, flows, frac):
+      if fr <= 0:
+        continue
+      ## highest voltage in the part of the feeder fed through each bus
+      vsub = dict(v)
+      for n in reversed(order[1:]):
+        if n in vsub:
+          vsub[parent[n]] = max(vsub.get(parent[n], -np.inf), vsub[n])
+      ## smallest thermal headroom on the way to the source
+      path = {source: np.inf}
+      for n in order[1:]:
+        hr = np.inf
+        if elem[n] in f:
+          bus1, S, rating = f[elem[n]]
+          if rating > 0:
+            hr = thermal_headroom(S, rating, -1 if bus1 == parent[n] else 1, q)
+        path[n] = min(path[parent[n]], hr)
+      headroom = np.maximum(vmax - np.array([vsub.get(b, -np.inf) for b in buses]), 0)
+      lims["vmax"] = np.fmin(lims["vmax"], np.where(sens > 0, headroom/(sens*fr), np.inf))
+      lims["thermal"] = np.fmin(lims["thermal"], np.array([path.get(b, np.inf) for b in buses])/fr)
+    lims["vdiff"] = np.where((sens > 0) & (dfrac > 0), vdiff/100/(sens*dfrac), np.inf)
+  out = pd.DataFrame({"kv": kv, "r1": r1, "x1": x1, **lims}, index=buses)
+  out["kw"] = out[["vmax", "vdiff", "thermal"]].min(axis=1)
+  out["limit"] = out[["vmax", "vdiff", "thermal"]].idxmin(axis=1)
+  return out
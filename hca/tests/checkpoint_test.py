@@ -0,0 +1,51 @@
+import sys
+import os
+import time
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+
+def main(nrounds=3, filename="hca_checkpoint_tmp.pkl"):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["hca_log"]["logname"] = "hca_checkpoint_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+
+    hca = h.HCA(inputs) # instantiate hca instance
+    hca.runbase()       # run baseline
+    hca.checkpoint(filename) # base snapshot
+    last = 0
+    for i in range(nrounds):
+        hca.hca_round("pv")
+        tic = time.time()
+        hca.checkpoint(filename) # journal entry
+        t_journal = time.time() - tic
+        tic = time.time()
+        hca.save("hca_save_tmp.pkl")
+        t_save = time.time() - tic
+        size = os.path.getsize(f"{filename}.journal")
+        print(f"round {hca.cnt}: checkpoint {1000*t_journal:.1f} ms vs. save {1000*t_save:.1f} ms, journal entry {size - last} bytes")
+        last = size
+    os.remove("hca_save_tmp.pkl")
+
+    ## reload from the base snapshot and the journal
+    reload = h.HCA(filename, reload=True, logger_heading="*******************RELOAD FROM CHECKPOINT *******************")
+    print(f"cnt match = {hca.cnt == reload.cnt}, history match = {hca.change_lines_history == reload.change_lines_history}")
+    print(f"Sij match = {hca.data['Sij'] == reload.data['Sij']}, hc match = {hca.data['hc'] == reload.data['hc']}")
+    print(f"graph match = {dict(hca.G.nodes(data=True)) == dict(reload.G.nodes(data=True))}, graph_dirs mismatches = {reload.validate_graph_dirs()}")
+    print(f"attributes match = {all(hca.__dict__[k] == reload.__dict__[k] for k in ['visited_buses', 'exauhsted_buses', 'upgrades', 'cnt'])}")
+
+    ## a new base written without clearing the journal (a crash in between) does not replay the old entries
+    hca.save(filename)
+    reload2 = h.HCA(filename, reload=True, logger_heading="*******************RELOAD FROM NEW BASE *******************")
+    print(f"new base: history match = {hca.change_lines_history == reload2.change_lines_history}, Sij match = {hca.data['Sij'] == reload2.data['Sij']}")
+
+    ## both continue the same way
+    hca.hca_round("pv")
+    reload.hca_round("pv")
+    print(f"next round: {hca.data['hc']['pv']} vs. {reload.data['hc']['pv']} (should match)")
+    os.remove(filename)
+    os.remove(f"{filename}.journal")
+
+if __name__ == "__main__":
+    main()
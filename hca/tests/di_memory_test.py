@@ -0,0 +1,19 @@
+import time
+import numpy as np
+import hca_test_utils as ht
+
+def main(di_output):
+    hca = ht.setup_hca("hca_di_memory_test", {"di_output": di_output}, runbase=False)
+    tic = time.time()
+    hca.runbase()       # run baseline
+    return hca.lastres, time.time() - tic
+
+if __name__ == "__main__":
+    ## the demand interval results should agree up to the precision of the files
+    res = {m: main(m) for m in ["files", "memory"]}
+    (files, t1), (memory, t2) = res["files"], res["memory"]
+    print(f"baseline in {t1:.1f} s (files) vs. {t2:.1f} s (memory)")
+    for key, col in [("di_overloads", "%Emerg"), ("di_voltexceptions", "MinVoltage"), ("di_voltexceptions", "MaxLVVoltage"), ("di_totals", "kWh")]:
+        a = files[key][col]
+        b = memory[key][col].reindex(a.index) if key == "di_overloads" else memory[key][col]
+        print(f"{key} {col}: {len(a)} vs. {len(memory[key])} rows, max. difference {np.max(np.abs(a.values - b.values)):.2e}")
@@ -0,0 +1,13 @@
+import hca_test_utils as ht
+
+def main(enabled, buses, Sij):
+    hca = ht.setup_hca("hca_early_abort_test", {"early_abort": {"enabled": enabled}})
+    return [(bus, hca.data["hc"]["pv"][bus][hca.cnt]["kw"], t) for bus, t in ht.timed_rounds(hca, buses, Sij)]
+
+if __name__ == "__main__":
+    ## the hc should be the same, with less time spent on the infeasible trials when aborting early
+    buses = ["n1134480", "m1069514"]
+    Sij = {"kw": 2000.0, "kva": 2500.0}
+    res = {e: main(e, buses, Sij) for e in [False, True]}
+    for (bus, hc1, t1), (_, hc2, t2) in zip(res[False], res[True]):
+        print(f"{bus}: hc {hc1:.1f} kW in {t1:.1f} s (full runs) vs. {hc2:.1f} kW in {t2:.1f} s (early abort)")
@@ -0,0 +1,35 @@
+import sys
+import os
+import time
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+import i2x.api as i2x
+
+def main(nrounds=3):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["hca_log"]["logname"] = "hca_graph_dirs_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+
+    hca = h.HCA(inputs) # instantiate hca instance
+    hca.runbase()       # run baseline
+    print(f"after baseline, mismatches: {hca.validate_graph_dirs()}")
+
+    for i in range(nrounds):
+        hca.hca_round("pv", Sij={"kw": 300.0, "kva": 375.0})
+        print(f"after round {hca.cnt}, mismatches: {hca.validate_graph_dirs()}")
+
+    ## time the incremental update against a full parse
+    bus = next(iter(hca.graph_dirs["pvder"].values()))["bus"]
+    tic = time.time()
+    hca.dirty_nodes.add(bus)
+    hca.parse_graph()
+    t_inc = time.time() - tic
+    tic = time.time()
+    i2x.parse_opendss_graph(hca.G, bSummarize=False)
+    t_full = time.time() - tic
+    print(f"parse_graph: {1000*t_inc:.2f} ms incremental vs. {1000*t_full:.2f} ms full")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import hca_test_utils as ht
+
+ht.count_solves()
+
+def main(hc_search, nrounds=4):
+    hca = ht.setup_hca("hca_search_test", {"hc_search": hc_search})
+    return [(bus, hca.data["hc"]["pv"][bus][hca.cnt]["kw"], n) for bus, n in ht.counted_rounds(hca, nrounds)]
+
+if __name__ == "__main__":
+    ## same buses are sampled in both cases, the hc should agree within kwtol 
+    ## (unless the feasible capacities are not contiguous), with fewer solves for the secant search
+    res = {s: main(s) for s in ["bisection", "secant"]}
+    for (bus, hc1, n1), (_, hc2, n2) in zip(res["bisection"], res["secant"]):
+        print(f"{bus}: hc {hc1:.1f} kW in {n1} solves (bisection) vs. {hc2:.1f} kW in {n2} solves (secant)")
@@ -0,0 +1,55 @@
+"""Setup shared by the hca test scripts"""
+import sys
+import os
+import time
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+import i2x.api as i2x
+from hca_utils import merge_configs
+
+## number of OpenDSS solves, counted once count_solves was called
+nsolves = {"n": 0}
+
+def count_solves():
+    """count the calls of i2x.run_opendss in nsolves["n"]"""
+    run_opendss = i2x.run_opendss
+    if getattr(run_opendss, "counted", False):
+        return
+    def counted_run_opendss(*args, **kwargs):
+        nsolves["n"] += 1
+        return run_opendss(*args, **kwargs)
+    counted_run_opendss.counted = True
+    i2x.run_opendss = counted_run_opendss
+
+def load_inputs(logname, changes=None):
+    """inputs of the test config with changes (a partial config), logging to <logname>.log"""
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    merge_configs(inputs, changes or {})
+    inputs["hca_log"]["logname"] = logname
+    inputs["hca_log"]["logtofilemode"] = "a"
+    return inputs
+
+def setup_hca(logname, changes=None, runbase=True) -> h.HCA:
+    """HCA instance of the test config with changes (see load_inputs), with its baseline run"""
+    heading = ", ".join(f"{k}={v}" for k, v in (changes or {}).items())
+    hca = h.HCA(load_inputs(logname, changes), logger_heading=f"********* Run with {heading} ****************")
+    if runbase:
+        hca.runbase()
+    return hca
+
+def timed_rounds(hca, buses, Sij, typ="pv"):
+    """hca rounds at buses starting with capacity Sij, yields each bus and the time of its round"""
+    for bus in buses:
+        tic = time.time()
+        hca.hca_round(typ, bus=bus, Sij=Sij)
+        yield bus, time.time() - tic
+
+def counted_rounds(hca, nrounds, typ="pv"):
+    """nrounds hca rounds at sampled buses, yields each bus and the number of solves of its round (see count_solves)"""
+    for i in range(nrounds):
+        n = nsolves["n"]
+        hca.hca_round(typ)
+        bus = [b for b, v in hca.data["Sij"][typ].items() if hca.cnt in v][0]
+        yield bus, nsolves["n"] - n
@@ -0,0 +1,67 @@
+import sys
+import os
+import timeit
+import numpy as np
+import pandas as pd
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+
+def voltage_stats_pandas(di_voltexception, vmin=0.95, vmax=1.05, worst_case=False, **kwargs):
+    """reference: the element wise pandas implementation of hca.calc_di_voltage_stats"""
+    vlimmin = di_voltexception.loc[:, ["MinVoltage", "MinLVVoltage"]].min()
+    vlimmax = di_voltexception.loc[:, ["MaxVoltage", "MaxLVVoltage"]].max()
+    if worst_case:
+        vlimmin = vlimmin.apply(lambda x: min(vmin, x))
+        vlimmax = vlimmax.apply(lambda x: max(vmax, x))
+    dt = np.diff(np.insert(di_voltexception.index, 0, [0]))
+    return pd.concat([
+        pd.concat([vlimmin, vlimmax]).rename("limits"),
+        pd.concat([
+            di_voltexception.loc[:, ["MinVoltage", "MinLVVoltage"]].applymap(lambda x: max(0, vmin - x)).transpose().dot(dt),
+            di_voltexception.loc[:, ["MaxVoltage", "MaxLVVoltage"]].applymap(lambda x: max(0, x - vmax)).transpose().dot(dt)
+        ]).rename("integral")
+    ], axis=1)
+
+def thermal_pandas(res, base, tol):
+    """reference: the index aligned pandas implementation of HCAMetrics._thermal"""
+    mask = res["di_overloads"].index.isin(base["di_overloads"].index)
+    ov1 = base["di_overloads"]["%Emerg"].subtract(res["di_overloads"].loc[:, "%Emerg"]).dropna()
+    margin1 = ov1
+    ov2 = res["di_overloads"].loc[~mask, "%Emerg"]
+    margin2 = -(ov2 - 100)
+    test1, test2 = margin1 >= -tol, margin2 >= -tol
+    return pd.concat([test1, test2]), pd.concat([margin1[~test1], margin2[~test2]])
+
+def main(n=200):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["hca_log"]["logname"] = "hca_metrics_kernel_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+
+    hca = h.HCA(inputs) # instantiate hca instance
+    hca.runbase()       # run baseline (288 steps)
+    base = hca.metrics.base.res
+    hca.hca_round("pv", bus="m1069514", Sij={"kw": 2000.0, "kva": 2500.0})
+    res = hca.lastres
+    lims = hca.metrics.lims["voltage"]
+
+    for worst_case in [False, True]:
+        new = h.calc_di_voltage_stats(res["di_voltexceptions"], worst_case=worst_case, **lims)
+        ref = voltage_stats_pandas(res["di_voltexceptions"], worst_case=worst_case, **lims)
+        print(f"voltage stats (worst_case={worst_case}) equal: {np.allclose(new, ref.loc[new.index], equal_nan=True)}")
+    t_new = timeit.timeit(lambda: h.calc_di_voltage_stats(res["di_voltexceptions"], **lims), number=n)
+    t_ref = timeit.timeit(lambda: voltage_stats_pandas(res["di_voltexceptions"], **lims), number=n)
+    print(f"calc_di_voltage_stats: {1000*t_new/n:.3f} ms vs. {1000*t_ref/n:.3f} ms (pandas)")
+
+    hca.metrics.load_res(res)
+    tol = hca.metrics.tol["thermal"]
+    test, margin = hca.metrics._thermal(hca.metrics.lims["thermal"]["emerg"])
+    ref, ref_margin = thermal_pandas(res, base, tol)
+    print(f"thermal test equal: {test.sort_index().equals(ref.sort_index())}, {len(res['di_overloads'])} overloads")
+    t_new = timeit.timeit(lambda: hca.metrics._thermal(0), number=n)
+    t_ref = timeit.timeit(lambda: thermal_pandas(res, base, tol), number=n)
+    print(f"thermal: {1000*t_new/n:.3f} ms vs. {1000*t_ref/n:.3f} ms (pandas)")
+
+if __name__ == "__main__":
+    main()
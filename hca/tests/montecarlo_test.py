@@ -0,0 +1,76 @@
+import sys
+import os
+import shutil
+import tempfile
+import numpy as np
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+import hca_montecarlo as mc
+
+def load_inputs(nbuses=2):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["res_pv_frac"] = 0.2
+    inputs["montecarlo"]["seed"] = 1
+    inputs["montecarlo"]["nbuses"] = nbuses
+    inputs["hca_log"]["logname"] = "hca_montecarlo_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+    return inputs
+
+def main(path, nproc, nscenarios=4, nbuses=2):
+    return mc.run_montecarlo(load_inputs(nbuses), nscenarios=nscenarios, path=path, nproc=nproc)
+
+def count_compiles(nscenarios=2):
+    """number of feeder compiles of a worker that evaluates nscenarios"""
+    ncompiles = {"n": 0}
+    compile_dss = h.HCA.compile_dss
+    def counted_compile_dss(self):
+        ncompiles["n"] += 1
+        return compile_dss(self)
+    h.HCA.compile_dss = counted_compile_dss
+    inputs = load_inputs()
+    buses = mc.sample_buses(inputs, inputs["montecarlo"]["nbuses"], inputs["montecarlo"]["seed"])
+    pwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            mc._scenario_worker_init(inputs, tmpdir)
+            for rs in mc.scenario_random_states(inputs["montecarlo"]["seed"], nscenarios):
+                mc._scenario_worker({"typ": "pv", "buses": buses, "random_state": rs})
+    finally:
+        os.chdir(pwd)
+        h.HCA.compile_dss = compile_dss
+    return ncompiles["n"]
+
+if __name__ == "__main__":
+    ## quantiles of the histogram are within a bin of the exact ones
+    agg = mc.HCAggregate("hca_montecarlo_tmp", ["a", "b"], kw_step=10, kw_max=1000)
+    x = np.random.RandomState(0).uniform(0, 1200, size=(500, 2))
+    for row in x:
+        agg.add({"a": row[0], "b": row[1]})
+    print(agg.quantiles([0.1, 0.5, 0.75, 0.9]))
+    print(np.quantile(x, [0.1, 0.5, 0.75, 0.9], axis=0).T, "(exact, the 0.9 quantile is above kw_max)")
+
+    ## a scenario interrupted after updating only bus "a" is completed once when the study is opened again
+    agg.meta["pending"] = {"a": 10.0, "b": 20.0}
+    agg._write_meta()
+    agg.counts[0, 1] += 1
+    del agg
+    agg = mc.HCAggregate("hca_montecarlo_tmp")
+    print(f"recovered: done = {agg.done}, counts = {agg.counts.sum(axis=1)}, n = {agg.moments[:, 0]}")
+    del agg
+    shutil.rmtree("hca_montecarlo_tmp")
+
+    ## a worker compiles the feeder once, the following scenarios are restored in memory
+    n = count_compiles()
+    print(f"compiles for 2 scenarios: {n}")
+    assert n == 1, "the worker recompiled the feeder"
+
+    ## the outcome should not depend on the number of processes, or on the study being continued
+    agg1 = main("hca_montecarlo_tmp1", nproc=1)
+    agg2 = main("hca_montecarlo_tmp2", nproc=2, nscenarios=2)
+    agg2 = main("hca_montecarlo_tmp2", nproc=2)
+    print(agg1.summary())
+    print(f"counts match = {np.array_equal(agg1.counts, agg2.counts)}, moments match = {np.allclose(agg1.moments, agg2.moments)}")
+    shutil.rmtree("hca_montecarlo_tmp1")
+    shutil.rmtree("hca_montecarlo_tmp2")
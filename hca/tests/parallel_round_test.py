@@ -0,0 +1,32 @@
+import sys
+import os
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+
+def main(logname, nproc=None):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["invmode"] = "CONSTANT_PF"
+    inputs["hca_log"]["logname"] = logname
+    inputs["hca_log"]["logtofilemode"] = "w"
+
+    # disable line regulators but not substation regulators
+    inputs["reg_control"]["disable_list"] = [f"vreg{i}_{j}" for i in [1,2,3] for j in ["a", "b", "c"]]
+
+    logger_heading = "*******************HCA PARALLEL ROUND TEST *******************"
+    hca = h.HCA(inputs, logger_heading=logger_heading) # instantiate hca instance
+    hca.runbase()       # run baseline
+
+    hca.hca_round_parallel("pv", nrounds=4, nproc=nproc)
+
+    h.print_config(hca.data, printf=hca.logger.info, title="HCA DATA")
+    return hca
+
+if __name__ == "__main__":
+    ## the outcome should not depend on the number of processes
+    hca1 = main("hca_parallel_test", nproc=1)
+    hca2 = main("hca_parallel_test2", nproc=2)
+    for typ, buses in hca1.data["hc"].items():
+        for bus, vals in buses.items():
+            print(f"{bus}: {vals} vs. {hca2.data['hc'][typ][bus]} (should match)")
@@ -0,0 +1,16 @@
+import hca_test_utils as ht
+
+def main(enabled, buses, Sij):
+    hca = ht.setup_hca("hca_result_cache_test", {"result_cache": {"enabled": enabled}})
+    out = [(bus, hca.data["hc"]["pv"][bus][hca.cnt]["kw"], t) for bus, t in ht.timed_rounds(hca, buses, Sij)]
+    if enabled:
+        print(f"cache hits: {hca.result_cache.hits}, misses: {hca.result_cache.misses}")
+    return out
+
+if __name__ == "__main__":
+    ## the hc should be the same, the final run of each round is taken from the cache
+    buses = ["n1134480", "l3047060"]
+    Sij = {"kw": 300.0, "kva": 375.0}
+    res = {e: main(e, buses, Sij) for e in [False, True]}
+    for (bus, hc1, t1), (_, hc2, t2) in zip(res[False], res[True]):
+        print(f"{bus}: hc {hc1:.1f} kW in {t1:.1f} s (no cache) vs. {hc2:.1f} kW in {t2:.1f} s (cache)")
@@ -0,0 +1,43 @@
+import sys
+import os
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+from result_store import ResultStore, read_results
+
+def main(nrounds=4, path="hca_results_tmp.db"):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["hca_log"]["logname"] = "hca_result_store_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+
+    hca = h.HCA(inputs) # instantiate hca instance
+    hca.runbase()       # run baseline
+    for i in range(nrounds):
+        hca.hca_round("pv")
+
+    ## latest hosting capacity of each bus, from the nested view and from the index
+    for bus, vals in hca.data["hc"]["pv"].items():
+        cnt = max(vals.keys())
+        print(f"{bus}: hc {vals[cnt]['kw']:.1f} kW (round {cnt}), get_hc: {hca.get_hc('pv', bus)}")
+
+    ## export and query without the hca
+    hca.export_results(path)
+    df = read_results(path)
+    print(df.loc[df["key"] != "eval", ["cnt", "typ", "bus", "key", "kw", "kva"]].to_string())
+    print(df.loc[df["key"] == "eval"].filter(like="margin.").min().to_string())
+    os.remove(path)
+
+if __name__ == "__main__":
+    ## a result of the same round replaces the earlier one in its row, the nested view is read only
+    store = ResultStore()
+    for kw in [100.0, 200.0, 150.0]:
+        store.append("hc", "pv", "b1", 1, {"kw": kw, "kva": kw})
+    store.append("hc", "pv", "b1", 2, {"kw": 50.0, "kva": 50.0})
+    print(f"rows = {len(store.vals)} (2), round 1 hc = {store['hc']['pv']['b1'][1]['kw']} kW (150), replaced rows = {store.rows(2)}")
+    try:
+        store["hc"]["pv"]["b1"][3] = {"kw": 0.0}
+        print("write to the nested view was accepted")
+    except TypeError:
+        print("write to the nested view raises TypeError")
+    main()
@@ -0,0 +1,24 @@
+import copy
+import hca_test_utils as ht
+
+def main(enabled, buses, Sij, hc_search="bisection"):
+    hca = ht.setup_hca("hca_screening_test", {"screening": {"enabled": enabled}, "hc_search": hc_search})
+    out = []
+    for bus, t in ht.timed_rounds(hca, buses, Sij):
+        Sijlim = hca.data["Sij"]["pv"][bus][hca.cnt]["kw"] + hca.data["hc"]["pv"][bus][hca.cnt]["kw"]
+        hca.metrics.eval = copy.deepcopy(hca.data["eval"]["pv"][bus][hca.cnt])
+        out.append((bus, Sijlim, t, hca.metrics.worst_margin()))
+    return out
+
+if __name__ == "__main__":
+    ## the limits should agree within kwtol (both are confirmed with a full run), 
+    ## with much less time spent on the search trials when screening.
+    ## The stored evaluation is that of the limit (no violations, worst normalized margin >= 0)
+    buses = ["n1134480", "m1069514"]
+    Sij = {"kw": 300.0, "kva": 375.0}
+    res = {e: main(e, buses, Sij) for e in [False, True]}
+    for (bus, hc1, t1, m1), (_, hc2, t2, m2) in zip(res[False], res[True]):
+        print(f"{bus}: limit {hc1:.1f} kW in {t1:.1f} s (full runs) vs. {hc2:.1f} kW in {t2:.1f} s (screening), worst margin {m1:.4f} vs. {m2:.4f}")
+    ## the same with the secant search, which continues from the margins of the full runs of the bounds
+    for (bus, hc1, t1, m1), (_, hc2, t2, m2) in zip(res[True], main(True, buses, Sij, "secant")):
+        print(f"{bus}: limit {hc1:.1f} kW in {t1:.1f} s (bisection) vs. {hc2:.1f} kW in {t2:.1f} s (secant), worst margin {m1:.4f} vs. {m2:.4f}")
@@ -0,0 +1,19 @@
+import time
+import hca_test_utils as ht
+
+ht.count_solves()
+
+def main(seed_search, nrounds=4):
+    hca = ht.setup_hca("hca_sensitivity_test", {"sensitivity": {"enabled": True, "seed_search": seed_search}})
+    tic = time.time()
+    est = hca.sensitivity_screen("pv")
+    print(f"sensitivity screen of {len(est)} buses in {time.time() - tic:.1f} s, highest estimates:")
+    print(est.head(5))
+    return [(bus, est.loc[bus, "kw"], hca.data["hc"]["pv"][bus][hca.cnt]["kw"], n) for bus, n in ht.counted_rounds(hca, nrounds)]
+
+if __name__ == "__main__":
+    ## same buses are sampled in both cases, the hc should agree within kwtol,
+    ## with fewer solves when the search starts from the estimate
+    res = {s: main(s) for s in [False, True]}
+    for (bus, est, hc1, n1), (_, _, hc2, n2) in zip(res[False], res[True]):
+        print(f"{bus}: estimate {est:.1f} kW, hc {hc1:.1f} kW in {n1} solves vs. {hc2:.1f} kW in {n2} solves (seeded)")
@@ -0,0 +1,32 @@
+import sys
+import os
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import time
+import hca as h
+
+def main(reset_mode, invmode):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["invmode"] = invmode
+    inputs["reset_mode"] = reset_mode
+    inputs["hca_log"]["logname"] = "hca_snapshot_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+
+    logger_heading = f"********* Run with reset_mode={reset_mode}, {invmode} ****************"
+    hca = h.HCA(inputs, logger_heading=logger_heading) # instantiate hca instance
+    hca.runbase()       # run baseline
+
+    t = time.time()
+    hca.hca_round("pv", bus="n1134480", Sij={"kw": 300.0, "kva": 375.0})
+    hca.hca_round("pv", bus="m1069514", Sij={"kw": 2000.0, "kva": 2500.0})
+    hca.logger.info(f"two rounds took {time.time() - t:.1f} s")
+    return hca
+
+if __name__ == "__main__":
+    for invmode in ["CONSTANT_PF", "VOLT_VAR_CATB"]:
+        hca1 = main("recompile", invmode)
+        hca2 = main("snapshot", invmode)
+        ## results should be identical
+        print(f"{invmode}: Sij match = {hca1.data['Sij'] == hca2.data['Sij']}, hc match = {hca1.data['hc'] == hca2.data['hc']}")
+        print(f"{invmode}: kWh_PV {hca1.lastres['kWh_PV']:.3f} vs. {hca2.lastres['kWh_PV']:.3f}")
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+if os.path.abspath("..") not in sys.path:
+    sys.path.append(os.path.abspath(".."))
+import hca as h
+import hca_sweep
+import i2x.api as i2x
+
+def serial(inputs, grid, mode):
+    """the same configurations, each compiled from scratch"""
+    rows = []
+    for config in hca_sweep.configurations(grid):
+        cinputs = {**inputs, **config}
+        if mode == "run":
+            res = i2x.run_opendss(**{**cinputs, "debug_output": False})
+        else:
+            hca = h.HCA(cinputs)
+            hca.runbase()
+            res = hca.lastres
+        rows.append({k: res.get(k) for k in ["converged", "vmaxpu", "kWh_PV", "kWh_Loss", "num_tap_changes"]})
+    return rows
+
+def main(mode, grid, nproc=None):
+    ### load config (note: just changes to defaults)
+    inputs = h.load_config("hca9500node_testconfig.json")
+    inputs["hca_log"]["logname"] = "hca_sweep_test"
+    inputs["hca_log"]["logtofilemode"] = "a"
+    inputs["res_pv_frac"] = 0.2
+
+    tic = time.time()
+    df = hca_sweep.sweep(inputs, grid, mode=mode, nproc=nproc)
+    t_sweep = time.time() - tic
+    tic = time.time()
+    ref = serial(inputs, grid, mode)
+    t_serial = time.time() - tic
+    print(df)
+    for (_, row), r in zip(df.iterrows(), ref):
+        ## the smart inverter controls iterate to a tolerance, from a different starting point on a reused circuit
+        rel = max(abs(row[k] - v)/max(1, abs(v)) for k, v in r.items() if isinstance(v, float))
+        match = all(row[k] == v for k, v in r.items() if not isinstance(v, float)) and (rel <= 1e-6)
+        label = ", ".join(f"{k}={row[k]}" for k in grid)
+        print(f"{label}: kWh_PV {row['kWh_PV']:.3f} vs. {r['kWh_PV']:.3f}, max. rel. difference {rel:.1e}, match = {match}")
+    print(f"mode {mode}: sweep {t_sweep:.1f} s on {nproc or os.cpu_count()} processes vs. serial {t_serial:.1f} s")
+
+if __name__ == "__main__":
+    ## results should match runs compiled from scratch
+    main("run", {"invmode": ["CONSTANT_PF", "VOLT_WATT", "VOLT_VAR_CATB"], "loadmult": [0.8, 1.0]})
+    ## (the baseline of the smart inverter modes fails with rooftop PV, also without the sweep)
+    main("base", {"invpf": [1.0, 0.95], "loadmult": [0.9, 1.0]})
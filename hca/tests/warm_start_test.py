@@ -0,0 +1,16 @@
+import hca_test_utils as ht
+
+ht.count_solves()
+
+def main(method, nrounds=10):
+    changes = {"warm_start": {"enabled": True, "method": method}} if method is not None else {"warm_start": {"enabled": False}}
+    hca = ht.setup_hca("hca_warm_start_test", changes)
+    return [(bus, hca.data["hc"]["pv"][bus][hca.cnt]["kw"], n) for bus, n in ht.counted_rounds(hca, nrounds)]
+
+if __name__ == "__main__":
+    ## same buses are sampled in all cases, the hc should agree within kwtol 
+    ## (unless the feasible capacities are not contiguous), with fewer solves once neighbors have been evaluated
+    res = {m: main(m) for m in [None, "distance", "impedance"]}
+    for (bus, hc1, n1), (_, hc2, n2), (_, hc3, n3) in zip(res[None], res["distance"], res["impedance"]):
+        print(f"{bus}: hc {hc1:.1f} kW in {n1} solves (cold) vs. {hc2:.1f} kW in {n2} solves (distance) vs. {hc3:.1f} kW in {n3} solves (impedance)")
+    print(f"total solves: {sum(n for *_, n in res[None])} (cold), {sum(n for *_, n in res['distance'])} (distance), {sum(n for *_, n in res['impedance'])} (impedance)")
@@ -0,0 +1,54 @@
+"""Warm start of the hosting capacity search from the results of nearby buses.
+
+The hosting capacity is strongly correlated along a feeder, so the limits found
+at the nearest evaluated buses bracket the limit of a new bus well. Distances are
+measured along the (radial) feeder tree, either as line length or as the change of
+the short circuit impedance across each branch (electrical distance).
+"""
+import numpy as np
+import sensitivity as sens
+
+### line length units of OpenDSS, in km
+UNITS = {"km": 1.0, "m": 1e-3, "cm": 1e-5, "mm": 1e-6, "ft": 0.3048e-3, "kft": 0.3048, "in": 0.0254e-3, "mi": 1.609344}
+
+def edge_length(G, u, v) -> float:
+  """length [km] of the branch between u and v (0 for transformers, reactors etc.)"""
+  edata = G.edges[u, v]["edata"] if G.has_edge(u, v) else G.edges[v, u]["edata"]
+  return edata.get("length", 0.0)*UNITS.get(str(edata.get("units")).lower(), 1.0)
+
+class FeederDistance:
+  """Distance between buses along the feeder tree from source.
+  weight(parent, bus) is the length of the branch from a bus to its parent.
+  """
+  def __init__(self, G, weight, source="sourcebus"):
+    self.parent, _, order = sens.feeder_tree(G, source)
+    self.depth = {source: 0.0}
+    for n in order[1:]:
+      p = self.parent[n]
+      self.depth[n] = self.depth[p] + weight(p, n)
+
+  def distances(self, bus, others) -> np.ndarray:
+    """distance from bus to each of others (inf if not connected)"""
+    if bus not in self.depth:
+      return np.full(len(others), np.inf)
+    anc = {bus}
+    n = bus
+    while n in self.parent:
+      n = self.parent[n]
+      anc.add(n)
+    out = np.full(len(others), np.inf)
+    for i, b in enumerate(others):
+      if b not in self.depth:
+        continue
+      n = b
+      while n not in anc:
+        n = self.parent[n]
+      out[i] = self.depth[bus] + self.depth[b] - 2*self.depth[n]
+    return out
+
+def bracket(limits, width=0.2) -> list:
+  """trial capacities [kW] bracketing the limits of the neighbors, widened by width on both sides"""
+  limits = [l for l in limits if np.isfinite(l) and (l > 0)]
+  if not limits:
+    return []
+  return [(1 - width)*min(limits), (1 + width)*max(limits)]
@@ -21,10 +21,11 @@ from .opendss_graph import make_builtin_graph
 from .plot_opendss_feeder import plot_opendss_feeder
 from .plot_opendss_feeder import load_opendss_graph
 from .plot_opendss_feeder import load_builtin_graph
-from .plot_opendss_feeder import parse_opendss_graph
+from .plot_opendss_feeder import parse_opendss_graph, parse_opendss_node
 from .opendss_interface import print_opendss_interface
-from .opendss_interface import run_opendss, initialize_opendss, opendss_output, get_basekv, check_element_status
+from .opendss_interface import run_opendss, initialize_opendss, feeder_model_hash, dss_lines, opendss_output, get_basekv, check_element_status, check_limits, loadshape_values, get_control_state, set_control_state, di_setup, di_sample, monitor_data, monitor_meta, MonitorTable, solve_step, bus_vmax_pu, branch_flows, bus_kvbase, bus_zsc1, event_counts, progress_summary
 from .pcc_analysis import trace_pcc_path
+from .solver_service import SolverService
 
 from .der_choices import feederChoices
 from .der_choices import solarChoices
@@ -32,6 +33,7 @@ from .der_choices import loadChoices
 from .der_choices import inverterChoices
 from .der_choices import solutionModeChoices
 from .der_choices import controlModeChoices
+from .der_choices import load_shape, resample_shape, resampled_shape_line
 
 from .bes_hca import bes_hca
 
@@ -1,7 +1,18 @@
 # Copyright (C) 2017-2023 Battelle Memorial Institute
 # file: der_choices.py
 """Configuration data for DER test feeders
+
+The loadshapes with a file are stored in the cache as binary files of their 
+dtype (float64 or float32), which are memory mapped by load_shape and used by
+the cached feeders (see feeder_cache.py). If the cache can not be written, 
+the text files are read instead.
 """
+import os
+import re
+import hashlib
+import numpy as np
+import pkg_resources
+from .feeder_cache import binary_shape, write_binary, cache_dir, SHAPE_EXT
 
 # TODO: consider migration to a JSON file for customization
 
@@ -12,9 +23,9 @@ feederChoices = {
   }
 
 solarChoices = {
-  'pclear':{'dt':1.0, 'file':'pclear.dat', 'npts':0, 'data':None},
-  'pcloud':{'dt':1.0, 'file':'pcloud.dat', 'npts':0, 'data':None},
-  'pvduty':{'dt':1.0, 'file':'pvloadshape-1sec-2900pts.dat', 'npts':0, 'data':None},
+  'pclear':{'dt':1.0, 'file':'pclear.dat', 'dtype':'float64', 'npts':0, 'data':None},
+  'pcloud':{'dt':1.0, 'file':'pcloud.dat', 'dtype':'float64', 'npts':0, 'data':None},
+  'pvduty':{'dt':1.0, 'file':'pvloadshape-1sec-2900pts.dat', 'dtype':'float64', 'npts':0, 'data':None},
   'step':{'t':[0,6,6.003,18,18.003,24], 'p':[0,0,1,1,0,0]}
   }
 
@@ -24,9 +35,9 @@ solarChoices = {
 #           'p':[0.677,0.6256,0.6087,0.5833,0.58028,0.6025,0.657,0.7477,0.832,0.88,0.94,0.989,0.985,0.98,0.9898,0.999,1,0.958,0.936,0.913,0.876,0.876,0.828,0.756,0.677]},
 
 loadChoices = {
-  'qdaily':{'dt':1.0, 'file':'qdaily.dat', 'npts':0, 'data':None},
-  'ldaily':{'dt':1.0, 'file':'ldaily.dat', 'npts':0, 'data':None},
-  'cdaily':{'dt':1.0, 'file':'cdaily.dat', 'npts':0, 'data':None},
+  'qdaily':{'dt':1.0, 'file':'qdaily.dat', 'dtype':'float64', 'npts':0, 'data':None},
+  'ldaily':{'dt':1.0, 'file':'ldaily.dat', 'dtype':'float64', 'npts':0, 'data':None},
+  'cdaily':{'dt':1.0, 'file':'cdaily.dat', 'dtype':'float64', 'npts':0, 'data':None},
   'flat':{'t':[0,24], 'p':[1.0, 1.0]}
   }
 
@@ -57,3 +68,86 @@ inverterChoices = {
 solutionModeChoices = ['SNAPSHOT', 'DAILY', 'DUTY']#, 'YEARLY']
 controlModeChoices = ['OFF', 'STATIC'] #, 'TIME', 'EVENT']
 
+
+support_dir = 'models/support/'
+
+### number of resampled loadshape files kept in the cache per loadshape name (see resampled_shape_line)
+RESAMPLED_KEEP = 8
+
+def shape_dtypes():
+  """storage dtype of the loadshapes with a file, by name"""
+  return {key: row.get('dtype', 'float64') for choices in [solarChoices, loadChoices] for key, row in choices.items() if 'file' in row}
+
+def shape_file(row):
+  """binary file of the loadshape row (with a file), converted from its text file if needed"""
+  return binary_shape(pkg_resources.resource_filename(__name__, support_dir + row['file']), row.get('dtype', 'float64'))
+
+def load_shape(row):
+  """read only np.memmap of the values of loadshape row (with a file), 
+  shared by all processes that load it. If the binary file can not be written,
+  a read only array of the values of the text file."""
+  dtype = row.get('dtype', 'float64')
+  try:
+    return np.memmap(shape_file(row), dtype=dtype, mode='r')
+  except OSError:
+    data = np.loadtxt(pkg_resources.resource_filename(__name__, support_dir + row['file']), dtype=float, ndmin=1).astype(dtype)
+    data.flags.writeable = False
+    return data
+
+def resample_shape(row, stepsize, numsteps, npts=None):
+  """values of loadshape row at the time steps 1...numsteps of stepsize [s], normalized to the peak.
+  For data at intervals dt, these are the points OpenDSS uses at these steps, of the first npts 
+  (default all) values. Otherwise the points t [hr], p are interpolated.
+  """
+  hours = np.arange(1, numsteps + 1) * stepsize / 3600.0
+  if 'file' in row:
+    data = load_shape(row)[:npts]
+    npts = len(data)
+    idx = np.rint(hours * 3600.0 / row['dt']).astype(int)
+    idx = np.where(idx > npts, idx % npts, idx)
+    idx = np.where(idx == 0, npts, idx)
+    vals = np.array(data[idx - 1], dtype=float)
+    peak = np.max(np.abs(data))
+  else:
+    vals = np.interp(hours, row['t'], row['p'])
+    peak = np.max(np.abs(row['p']))
+  return vals / peak
+
+def resampled_shape_line(name, row, stepsize, numsteps, npts=None):
+  """dss command that redefines loadshape name with its values at stepsize (see resample_shape), 
+  from a binary file of the row's dtype in the cache. For rows with a file and dtype float64,
+  the solution at these steps does not change. Only the RESAMPLED_KEEP most recently used files 
+  of each name are kept. If the cache can not be written, the values are given in the command."""
+  dtype = row.get('dtype', 'float64')
+  data = resample_shape(row, stepsize, numsteps, npts).astype(dtype)
+  path = os.path.join(cache_dir(), 'shapes')
+  binfile = os.path.join(path, '{:s}-{:d}x{:d}-{:s}{:s}'.format(name, int(stepsize), numsteps,
+                         hashlib.sha256(data.tobytes()).hexdigest()[:16], SHAPE_EXT[dtype]))
+  try:
+    if os.path.exists(binfile):
+      os.utime(binfile) # most recently used
+    else:
+      os.makedirs(path, exist_ok=True)
+      write_binary(data, binfile)
+      remove_resampled(path, name)
+  except OSError:
+    return 'edit loadshape.{:s} npts={:d} sinterval={:d} mult=({:s})'.format(name, numsteps, int(stepsize),
+           ' '.join('{:.17g}'.format(v) for v in data))
+  return 'edit loadshape.{:s} npts={:d} sinterval={:d} mult=({:s}="{:s}")'.format(name, numsteps, int(stepsize),
+         'dblfile' if dtype == 'float64' else 'sngfile', binfile)
+
+def remove_resampled(path, name, keep=RESAMPLED_KEEP):
+  """remove all but the keep most recently used resampled files of loadshape name in path (see resampled_shape_line)"""
+  pattern = re.compile(re.escape(name) + r'-\d+x\d+-[0-9a-f]{16}\.(?:dbl|sng)$')
+  files = []
+  for fname in os.listdir(path):
+    if pattern.match(fname):
+      try:
+        files.append((os.path.getmtime(os.path.join(path, fname)), fname))
+      except OSError: # removed by another process in the meantime
+        pass
+  for _, fname in sorted(files, reverse=True)[keep:]:
+    try:
+      os.remove(os.path.join(path, fname))
+    except OSError:
+      pass
@@ -25,6 +25,7 @@ import pkg_resources
 import datetime
 import random
 import math
+import queue
 import requests
 
 try:
@@ -36,7 +37,6 @@ import matplotlib.pyplot as plt
 
 import numpy as np
 
-support_dir = 'models/support/'
 SQRT3 = math.sqrt(3.0)
 fontchoice=('Segoe UI', 16)
 monochoice=('Courier', fontchoice[1])
@@ -46,6 +46,9 @@ class DERConfigGUI:
   def __init__(self, master):
     self.master = master
     self.master.protocol('WM_DELETE_WINDOW', self.on_closing)
+    self.solver = None # started on the first run, keeps the feeders compiled between runs
+    self.run_future = None # the run in progress on the solver
+    self.run_events = queue.Queue() # progress and completion of the run, posted by the solver threads
 
     self.nb = ttk.Notebook(master)
     self.nb.pack(fill='both', expand='yes')
@@ -53,20 +56,13 @@ class DERConfigGUI:
     s = ttk.Style()
     s.configure('.', font=fontchoice)
 
-    for key, row in i2x.solarChoices.items():
-      if 'file' in row:
-        fname = pkg_resources.resource_filename (__name__, support_dir + row['file'])
-        row['data'] = np.loadtxt (fname)
-        row['npts'] = row['data'].shape[0]
-        peak = max(np.abs(row['data']))
-        row['data'] /= peak
-    for key, row in i2x.loadChoices.items():
-      if 'file' in row:
-        fname = pkg_resources.resource_filename (__name__, support_dir + row['file'])
-        row['data'] = np.loadtxt (fname)
-        row['npts'] = row['data'].shape[0]
-        peak = max(np.abs(row['data']))
-        row['data'] /= peak
+    ## the shapes are memory mapped from their binary files, and normalized when plotted
+    for choices in [i2x.solarChoices, i2x.loadChoices]:
+      for key, row in choices.items():
+        if 'file' in row:
+          row['data'] = i2x.load_shape (row)
+          row['npts'] = row['data'].shape[0]
+          row['peak'] = float(np.max(np.abs(row['data'])))
 
     self.f1 = ttk.Frame(self.nb, name='varsNet')
     lab = ttk.Label(self.f1, text='Feeder Model: ', relief=tk.RIDGE)
@@ -204,6 +200,10 @@ class DERConfigGUI:
     self.btn_run.grid(row=2, column=2, sticky=tk.NSEW)
     self.btn_version = tk.Button(self.f6, text='Check for Updates', command=self.CheckLatestVersion, font=fontchoice, bg='cyan')
     self.btn_version.grid(row=2, column=3, sticky=tk.NSEW)
+    self.btn_cancel = tk.Button(self.f6, text='Cancel', command=self.CancelOpenDSS, font=fontchoice, state=tk.DISABLED)
+    self.btn_cancel.grid(row=2, column=4, sticky=tk.NSEW)
+    self.pb_run = ttk.Progressbar(self.f6, orient=tk.HORIZONTAL, mode='determinate', maximum=100.0)
+    self.pb_run.grid(row=2, column=5, sticky=tk.NSEW)
     self.lab_relay = ttk.Label(self.f6, text='   Relay Trips', relief=tk.RIDGE, justify=tk.RIGHT)
     self.lab_relay.grid(row=3, column=0, sticky=tk.NSEW)
     self.lab_vmin = ttk.Label(self.f6, text='      Vmin pu', relief=tk.RIDGE, justify=tk.RIGHT)
@@ -243,6 +243,10 @@ class DERConfigGUI:
     self.nb.add(self.f6, text='Output', underline=0, padding=2)
 
   def on_closing(self):
+    if self.solver is not None:
+      if self.run_future is not None:
+        self.solver.cancel(self.run_future)
+      self.solver.close()
     self.master.quit()
     self.master.destroy()
 #    if messagebox.askokcancel('Quit', 'Do you want to close this window? It will stop all simulations.'):
@@ -389,21 +393,67 @@ class DERConfigGUI:
 
     print (feeder_choice, solar_profile, load_mult, load_profile, inv_mode, inv_pf,
            soln_mode, ctrl_mode, step_seconds, num_steps)
-    d = i2x.run_opendss(choice = feeder_choice,
-                        pvcurve = solar_profile,
-                        loadmult = load_mult,
-                        loadcurve = load_profile,
-                        invmode = inv_mode,
-                        invpf = inv_pf, 
-                        stepsize = step_seconds, 
-                        numsteps = num_steps,
-                        ctrlmode = ctrl_mode,
-                        solnmode = soln_mode,
-                        change_lines = change_lines)
     self.txt_output.insert(tk.END, 'Analysis Run on {:s} at {:s}'.format(feeder_choice, datetime.datetime.now().strftime('%a %d-%b-%Y %H:%M:%S')))
     self.txt_output.insert(tk.END, '  Large DER={:.2f} kW, Rooftop PV={:.2f} kW\n'.format(large_total, rooftop_total))
     self.txt_output.insert(tk.END, '  LoadMult={:.4f}, LoadProfle={:s}\n'.format(load_mult, load_profile))
     self.txt_output.insert(tk.END, '  SolarProfile={:s}, InvMode={:s}, InvPF={:.3f}\n'.format(solar_profile, inv_mode, inv_pf))
+    if self.solver is None:
+      self.solver = i2x.SolverService()
+    ## solve in the background, PollOpenDSS shows the progress and results
+    self.run_future = self.solver.submit(feeder_choice,
+                                         pvcurve = solar_profile,
+                                         loadmult = load_mult,
+                                         loadcurve = load_profile,
+                                         invmode = inv_mode,
+                                         invpf = inv_pf, 
+                                         stepsize = step_seconds, 
+                                         numsteps = num_steps,
+                                         ctrlmode = ctrl_mode,
+                                         solnmode = soln_mode,
+                                         change_lines = change_lines,
+                                         debug_output = True,
+                                         progress = lambda step, numsteps, partial: self.run_events.put(('progress', step, numsteps, partial)))
+    self.run_future.add_done_callback(lambda fut: self.run_events.put(('done', fut)))
+    self.btn_run.configure(state=tk.DISABLED)
+    self.btn_cancel.configure(state=tk.NORMAL)
+    self.pb_run['value'] = 0.0
+    self.master.after(100, self.PollOpenDSS, soln_mode)
+
+  def CancelOpenDSS(self):
+    if self.run_future is not None:
+      self.solver.cancel(self.run_future)
+      self.btn_cancel.configure(state=tk.DISABLED)
+
+  def PollOpenDSS(self, soln_mode):
+    """show the partial results posted by the solver since the last poll, until the run is done"""
+    while not self.run_events.empty():
+      event = self.run_events.get()
+      if event[0] == 'progress':
+        step, numsteps, p = event[1:]
+        self.pb_run['value'] = 100.0 * step / numsteps
+        self.txt_output.insert(tk.END, 'Step {:d}/{:d}: Converged={:s}, {:d} cap switchings, {:d} tap changes, {:d} relay trips, Load={:.2f} kWh, Losses={:.2f} kWh\n'.format(
+                               step, numsteps, str(p['converged']), p['num_cap_switches'], p['num_tap_changes'], p['num_relay_trips'], p['kWh_Load'], p['kWh_Loss']))
+        self.txt_output.see(tk.END)
+        continue
+      fut = event[1]
+      self.run_future = None
+      self.btn_run.configure(state=tk.NORMAL)
+      self.btn_cancel.configure(state=tk.DISABLED)
+      try:
+        d = fut.result()
+      except Exception as e:
+        self.txt_output.insert(tk.END, 'Solution Failed: {:s}\n'.format(str(e)))
+        return
+      if d.get('cancelled', False):
+        self.txt_output.insert(tk.END, 'Solution Cancelled at Step {:d}\n'.format(d['cancel_step']))
+        return
+      self.pb_run['value'] = 100.0
+      self.ShowOpenDSS(d, soln_mode)
+      self.txt_output.see(tk.END)
+      return
+    self.master.after(100, self.PollOpenDSS, soln_mode)
+
+  def ShowOpenDSS(self, d, soln_mode):
     self.txt_output.insert(tk.END, 'Number of Capacitor Switchings = {:d}\n'.format(d['num_cap_switches']))
     self.txt_output.insert(tk.END, 'Number of Tap Changes = {:d}\n'.format(d['num_tap_changes']))
     self.txt_output.insert(tk.END, 'Number of Relay Trips = {:d}\n'.format(d['num_relay_trips']))
@@ -458,8 +508,10 @@ class DERConfigGUI:
     pv_vmin = 100.0
     pv_vmax = 0.0
     pv_vdiff = 0.0
+    pvrows = {} # the rows of the monitor table are new dictionaries, keep the scaled ones
     for key, row in d['pvdict'].items():
       v_base = 1000.0 * self.get_pv_kv_base (key)
+      pvrows[key] = row
       row['vmin'] /= v_base
       row['vmax'] /= v_base
       row['vmean'] /= v_base
@@ -483,7 +535,7 @@ class DERConfigGUI:
 
     if self.output_details.get() > 0:
       self.txt_output.insert(tk.END, 'PV Name                    kWh     kvarh     Vmin     Vmax    Vmean Vdiff[%]\n')
-      for key, row in d['pvdict'].items():
+      for key, row in pvrows.items():
         self.txt_output.insert(tk.END, '{:20s} {:9.2f} {:9.2f} {:8.4f} {:8.4f} {:8.4f} {:8.4f}\n'.format(key, row['kWh'], row['kvarh'], 
                                                                                row['vmin'], row['vmax'], row['vmean'], row['vdiff']))
 
@@ -582,7 +634,7 @@ class DERConfigGUI:
       dt = row['dt']
       npts = row['npts']
       tmax = dt * (npts - 1)
-      y = row['data']
+      y = row['data'] / row['peak']
       t = np.linspace (0.0, tmax, npts) / 3600.0
     else:
       t = row['t']
@@ -602,7 +654,7 @@ class DERConfigGUI:
       dt = row['dt']
       npts = row['npts']
       tmax = dt * (npts - 1)
-      p = row['data']
+      p = row['data'] / row['peak']
       t = np.linspace (0.0, tmax, npts) / 3600.0
     else:
       t = row['t']
@@ -0,0 +1,197 @@
+# Copyright (C) 2023 Battelle Memorial Institute
+# file: feeder_cache.py
+"""Cache of the test feeder models in a form that compiles faster
+
+About half of the compile time of a feeder is spent parsing the 86401 point
+loadshapes in models/support from text. The cache holds each of them as a
+binary file of doubles (or singles, see der_choices.py), loaded with 
+mult=(dblfile=...), and a copy of the feeder's HCABase.dss that redirects to 
+these instead of the text versions. The values of doubles are the same as 
+parsed from the text files. The binary loadshapes are shared by all feeders 
+and can also be memory mapped (der_choices.load_shape).
+
+A cached feeder is identified by a hash of the model files of the feeder and
+of models/support, so it is rebuilt automatically when any of them changes,
+and by the dtypes of its loadshapes. Versions built from other model files are
+removed, those of other dtypes are kept (they may be in use by other processes).
+The cache directory is $I2X_CACHE, or ~/.cache/i2x by default. The binary
+loadshapes of earlier contents of a file are removed when it is converted again.
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+### binary loadshape files by numpy dtype
+SHAPE_EXT = {'float64': '.dbl', 'float32': '.sng'}
+
+### model files that are hashed
+MODEL_EXT = ['.dss', '.dat', '.txt', '.csv']
+
+### loadshape multipliers read from a text file
+SHAPE_RE = re.compile(r'(?i)\b(?:csvfile=("[^"]*"|\S+)|mult=\(file=([^)]+)\))')
+
+### name of a loadshape
+NAME_RE = re.compile(r'(?i)\bloadshape\.(\S+)')
+
+### number of points of a loadshape
+NPTS_RE = re.compile(r'(?i)\bnpts=(\d+)')
+
+### redirect to the loadshapes and curves of models/support
+SUPPORT_RE = re.compile(r'(?i)^\s*redirect\s+"?\.\./support/(\S+?)"?\s*$')
+
+## hashes by file signatures (name, size, mtime), so unchanged models are not read again
+_hashes = {}
+
+def cache_dir() -> str:
+  return os.environ.get('I2X_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'i2x')
+
+def files_hash(files) -> str:
+  """hash of the names and contents of files"""
+  sig = []
+  for fname in files:
+    st = os.stat(fname)
+    sig.append((fname, st.st_size, st.st_mtime_ns))
+  sig = tuple(sig)
+  if sig not in _hashes:
+    h = hashlib.sha256()
+    for fname in files:
+      h.update(os.path.basename(fname).encode())
+      with open(fname, 'rb') as f:
+        h.update(f.read())
+    _hashes[sig] = h.hexdigest()
+  return _hashes[sig]
+
+def model_hash(paths) -> str:
+  """hash of the contents of the model files in the directories paths"""
+  files = []
+  for path in paths:
+    for name in sorted(os.listdir(path)):
+      fname = os.path.join(path, name)
+      if os.path.isfile(fname) and (os.path.splitext(name)[1].lower() in MODEL_EXT):
+        files.append(fname)
+  return files_hash(files)
+
+def write_binary(data, fname):
+  """write the array data to the binary file fname, via a temporary file so that other processes never read a partial file"""
+  fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fname), suffix='.tmp')
+  with os.fdopen(fd, 'wb') as f:
+    data.tofile(f)
+  os.replace(tmp, fname)
+
+def binary_shape(fname, dtype='float64', npts=None) -> str:
+  """binary file (in the cache) of the loadshape in the single column text file fname, 
+  with at most npts values of dtype (float64 or float32). Returns None for other files.
+  The file name depends on the contents, so the cached version of a changed file is never used.
+  """
+  path = os.path.join(cache_dir(), 'shapes')
+  stem = os.path.join(path, '{:s}-{:s}'.format(os.path.splitext(os.path.basename(fname))[0], files_hash([fname])[:16]))
+  full = '{:s}-all{:s}'.format(stem, SHAPE_EXT[dtype])
+  part = '{:s}-{:s}{:s}'.format(stem, str(npts), SHAPE_EXT[dtype])
+  ## a file of all the values is shared with loadshapes of npts >= its length
+  if os.path.exists(full) and ((npts is None) or (os.path.getsize(full) <= npts * np.dtype(dtype).itemsize)):
+    return full
+  if (npts is not None) and os.path.exists(part):
+    return part
+  data = np.loadtxt(fname, dtype=float, ndmin=1)
+  if data.ndim != 1:
+    return None
+  os.makedirs(path, exist_ok=True)
+  ## OpenDSS reads npts values of a text file, but all of a binary one (e.g. pvduty has extra values)
+  binfile = part if (npts is not None) and (len(data) > npts) else full
+  write_binary(data[:npts].astype(dtype), binfile)
+  remove_stale_shapes(stem)
+  return binfile
+
+def remove_stale_shapes(stem):
+  """remove the binary files of other contents of the loadshape file with stem <path>/<name>-<hash> (see binary_shape)"""
+  path, base = os.path.split(stem)
+  pattern = re.compile(re.escape(base[:-17]) + r'-[0-9a-f]{16}-(?:all|\d+)\.(?:dbl|sng)$')
+  for name in os.listdir(path):
+    if pattern.match(name) and not name.startswith(base + '-'):
+      try:
+        os.remove(os.path.join(path, name))
+      except OSError: # removed by another process in the meantime
+        pass
+
+def convert_loadshapes(src, dst, dtypes):
+  """copy the dss script src to dst, with loadshape multipliers from single column text files
+  replaced by binary files of dtypes[name] (default float64)"""
+  srcdir = os.path.dirname(os.path.abspath(src))
+  def convert(m, name, npts):
+    fname = (m.group(1) or m.group(2)).strip().strip('"')
+    dtype = dtypes.get(name, 'float64')
+    binfile = binary_shape(os.path.join(srcdir, fname), dtype, npts)
+    if binfile is None:
+      return m.group(0)
+    return 'mult=({:s}="{:s}")'.format('dblfile' if dtype == 'float64' else 'sngfile', binfile)
+  lines = []
+  with open(src) as f:
+    for line in f:
+      npts = NPTS_RE.search(line)
+      name = NAME_RE.search(line)
+      lines.append(SHAPE_RE.sub(lambda m: convert(m, name.group(1).lower() if name else None, int(npts.group(1)) if npts else None), line))
+  with open(dst, 'w') as f:
+    f.writelines(lines)
+
+def build(fdr_path, support_path, outdir, final, dtypes):
+  """write the cached HCABase.dss of the feeder in fdr_path and its scripts to outdir (moved to final later)"""
+  lines = []
+  with open(os.path.join(fdr_path, 'HCABase.dss')) as f:
+    for line in f:
+      m = SUPPORT_RE.match(line)
+      if m:
+        script = m.group(1)
+        if not os.path.exists(os.path.join(outdir, script)):
+          convert_loadshapes(os.path.join(support_path, script), os.path.join(outdir, script), dtypes)
+        line = 'redirect "{:s}"\n'.format(os.path.join(final, script))
+      lines.append(line)
+      if line.strip().lower() == 'clear':
+        ## the other files are found relative to the feeder
+        lines.append('cd "{:s}"\n'.format(fdr_path))
+  if not any(l.strip().lower() == 'clear' for l in lines):
+    lines.insert(0, 'cd "{:s}"\n'.format(fdr_path))
+  with open(os.path.join(outdir, 'HCABase.dss'), 'w') as f:
+    f.writelines(lines)
+
+def cached_base(choice, fdr_path, dtypes=None) -> str:
+  """file name of the cached HCABase.dss of feeder choice (in fdr_path), built if needed, with
+  the loadshapes stored as dtypes[name] (see binary_shape). Stale versions of the feeder are removed
+  (see remove_stale_bases).
+  Returns None if the cache can not be written.
+  """
+  dtypes = dtypes or {}
+  fdr_path = os.path.abspath(fdr_path)
+  support_path = os.path.join(os.path.dirname(fdr_path), 'support')
+  models = model_hash([fdr_path, support_path])
+  key = hashlib.sha256(json.dumps(dtypes, sort_keys=True).encode()).hexdigest()
+  root = cache_dir()
+  path = os.path.join(root, '{:s}-{:s}-{:s}'.format(choice, models[:16], key[:16]))
+  base = os.path.join(path, 'HCABase.dss')
+  if os.path.exists(base):
+    return base
+  try:
+    os.makedirs(root, exist_ok=True)
+    ## build in a temporary directory that is renamed when complete, so that concurrent processes never see a partial cache
+    tmp = tempfile.mkdtemp(dir=root, prefix='.build-')
+    build(fdr_path, support_path, tmp, path, dtypes)
+    try:
+      os.rename(tmp, path)
+    except OSError: # built by another process in the meantime
+      shutil.rmtree(tmp, ignore_errors=True)
+  except OSError:
+    return None
+  remove_stale_bases(root, choice, models)
+  return base
+
+def remove_stale_bases(root, choice, models):
+  """remove the cached versions of feeder choice in root that were built from model files other 
+  than those with hash models (see cached_base), for any dtypes"""
+  pattern = re.compile(re.escape(choice) + r'-([0-9a-f]{16})(?:-[0-9a-f]{16})?$')
+  for name in os.listdir(root):
+    m = pattern.match(name)
+    if m and (m.group(1) != models[:16]):
+      shutil.rmtree(os.path.join(root, name), ignore_errors=True)
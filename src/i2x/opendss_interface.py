@@ -4,6 +4,19 @@ import inspect
 import numpy as np
 from numpy import trapz
 import os
+import ctypes
+import tempfile
+import weakref
+from collections.abc import Mapping
+from .feeder_cache import cached_base, model_hash
+from .der_choices import shape_dtypes
+
+## static monitor metadata by dss instance and (monitor, element, terminal), see monitor_meta. 
+## Cleared when a feeder is compiled, since the bus voltages may change.
+_monitor_meta = weakref.WeakKeyDictionary()
+
+## private ctypes prototypes of the OpenDSS ...V (variant) functions by address, see variant_bytes
+_variant_funcs = {}
 
 def print_class_doc (key, root, doc_fp):
   print ('-------------------------', file=doc_fp)
@@ -47,13 +60,39 @@ def dss_line (dss, line, debug_output):
     print ('dss: ', line)
   dss.text (line)
 
-def initialize_opendss(choice, debug_output=True, **kwargs):
+def dss_lines (dss, lines, debug_output, batch=False, script=None):
+  """apply change lines. With batch=True they are written to a script that is run with a single 
+  redirect, either the file `script` (kept, e.g. to replay the changes later) or a temporary file.
+  """
+  if (not batch) or (len(lines) < 2):
+    for line in lines:
+      dss_line (dss, line, debug_output)
+    return
+  if script is None:
+    fd, fname = tempfile.mkstemp(suffix='.dss', text=True)
+    f = os.fdopen(fd, 'w')
+  else:
+    fname = os.path.abspath(script)
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    f = open(fname, 'w')
+  with f:
+    f.write('\n'.join(lines) + '\n')
+  try:
+    dss_line (dss, 'redirect "{:s}"'.format(fname), debug_output)
+  finally:
+    if script is None:
+      os.remove(fname)
+
+def initialize_opendss(choice, debug_output=True, feeder_cache=True, **kwargs):
   """
-  Load and compile the open dss feeder model
+  Load and compile the open dss feeder model.
+  With feeder_cache, the cached version of the model with binary loadshapes is compiled (see feeder_cache.py)
   """
   pwd = os.getcwd()
   dss = py_dss_interface.DSS()
+  _monitor_meta.clear()
   fdr_path = pkg.resource_filename (__name__, 'models/{:s}'.format(choice))
+  base = cached_base (choice, fdr_path, shape_dtypes()) if feeder_cache else None
 
   if debug_output:
     print ('default cache:', pkg.get_default_cache())
@@ -62,10 +101,15 @@ def initialize_opendss(choice, debug_output=True, **kwargs):
     print ('     version:', dss.dssinterface.version)
     pkg.resource_listdir (__name__, 'models/{:s}'.format(choice))
 
-  dss_line (dss, 'compile "{:s}/HCABase.dss"'.format (fdr_path), debug_output)
+  dss_line (dss, 'compile "{:s}"'.format (base or '{:s}/HCABase.dss'.format (fdr_path)), debug_output)
   os.chdir(pwd)
   return dss
 
+def feeder_model_hash(choice) -> str:
+  """hash of the model files of feeder choice and of models/support (see feeder_cache.model_hash)"""
+  fdr_path = pkg.resource_filename (__name__, 'models/{:s}'.format(choice))
+  return model_hash([fdr_path, os.path.join(os.path.dirname(fdr_path), 'support')])
+
 def get_event_log (dss):
   return dss.solution.event_log
   fname = dss.text ('export eventlog')
@@ -81,7 +125,25 @@ def get_event_log (dss):
 def run_opendss(choice, pvcurve, loadmult, stepsize, numsteps, 
                 loadcurve, invmode, invpf, solnmode, ctrlmode, 
                 change_lines=None, debug_output=True, dss=None, output=True,
-                demandinterval=False, allow_forms=1, **kwargs):
+                demandinterval=False, allow_forms=1, abort_limits=None, timepoints=None, control_states=None, capture_steps=None, 
+                di_memory=False, batch_changes=False, change_script=None, progress=None, progress_chunk=None, **kwargs):
+  """Run the time series (or snapshot) solution of the feeder.
+  If abort_limits is given, the solution is advanced in chunks of abort_limits["chunk"] steps,
+  and stopped as soon as check_limits finds a violation at the end of a chunk. The result is
+  then {'converged': True, 'aborted': True, 'abort_step': step, 'violations': {...}}.
+  Since every solve rewrites the demand interval files, their rows are collected per chunk.
+  If timepoints (a list of steps) is given, only these steps of the time series are solved,
+  each as a single step starting from the present state (or control_states[step], see 
+  get_control_state), and checked against abort_limits (if given). The result is the same as for an 
+  aborted run in case of a violation, otherwise {'converged': True, 'screened': True, 'violations': {}}.
+  With capture_steps, the control states at these steps are returned as 'control_states'.
+  With di_memory, the solution is advanced one step at a time and the demand interval results
+  are collected in memory (see di_sample) instead of the DI_* files, returned as 'di_records'.
+  With batch_changes, the change lines are applied with a single redirect (see dss_lines).
+  With progress, a time series is solved in chunks of progress_chunk steps (default 1/50 of numsteps),
+  calling progress(step, numsteps, partial) after each chunk with the results so far (see progress_summary).
+  If it returns False, the run is cancelled: {'converged': ..., 'cancelled': True, 'cancel_step': step}.
+  """
 
   # dss = py_dss_interface.DSS()
   # fdr_path = pkg.resource_filename (__name__, 'models/{:s}'.format(choice))
@@ -97,8 +159,7 @@ def run_opendss(choice, pvcurve, loadmult, stepsize, numsteps,
     dss = initialize_opendss(choice, debug_output=debug_output, **kwargs)
 
   if change_lines is not None:
-    for line in change_lines:
-      dss_line (dss, line, debug_output)
+    dss_lines (dss, change_lines, debug_output, batch=batch_changes, script=change_script)
 
   dss_line (dss, 'batchedit PVSystem..* irradiance=1 daily={:s} %cutin=0.1 %cutout=0.1 varfollowinverter=true'.format (pvcurve), debug_output) #kvarmax=?
   dss_line (dss, 'batchedit load..* daily={:s} duty={:s} yearly={:s}'.format (loadcurve, loadcurve, loadcurve), debug_output)
@@ -139,12 +200,109 @@ def run_opendss(choice, pvcurve, loadmult, stepsize, numsteps,
     dss_line(dss, f'set DataPath="{os.getcwd()}"', debug_output)
 
   dss.dssinterface.allow_forms = allow_forms
-  dss_line (dss, 'solve mode={:s} number={:d} stepsize={:d}s'.format(solnmode, numsteps, stepsize), debug_output)
-  if demandinterval:
-    dss_line(dss, 'closedi', debug_output)
+  if timepoints is not None:
+    dss_line (dss, 'set mode={:s} number=1 stepsize={:d}s'.format(solnmode, stepsize), debug_output)
+    for step in timepoints:
+      solve_step(dss, step, stepsize, None if control_states is None else control_states[step], debug_output)
+      if not dss.solution.converged:
+        break
+      violations = {} if abort_limits is None else check_limits(dss, **abort_limits)
+      if violations:
+        if demandinterval:
+          dss_line(dss, 'closedi', debug_output)
+        return {'converged': True, 'aborted': True, 'abort_step': step, 'violations': violations}
+    if demandinterval:
+      dss_line(dss, 'closedi', debug_output)
+    return {'converged': bool(dss.solution.converged), 'screened': True, 'violations': {}}
+  elif (abort_limits is None) and (capture_steps is None) and (not di_memory) and ((progress is None) or (solnmode == 'SNAPSHOT')):
+    dss_line (dss, 'solve mode={:s} number={:d} stepsize={:d}s'.format(solnmode, numsteps, stepsize), debug_output)
+    if demandinterval:
+      dss_line(dss, 'closedi', debug_output)
+  else:
+    ## solve up to the end of each chunk and each capture step
+    stops = set(capture_steps or [])
+    checks = set([numsteps])
+    if abort_limits is not None:
+      chunk = abort_limits.get("chunk", 12)
+      checks.update(range(chunk, numsteps, chunk))
+    stops.update(checks)
+    if di_memory:
+      stops.update(range(1, numsteps))
+    if progress is not None:
+      progress_chunk = progress_chunk or max(1, numsteps // 50)
+      stops.update(range(progress_chunk, numsteps, progress_chunk))
+    stops = sorted(k for k in stops if k <= numsteps)
+    dss_line (dss, 'set mode={:s} number={:d} stepsize={:d}s'.format(solnmode, stops[0], stepsize), debug_output)
+    step = 0
+    di_rows = {}
+    states = {}
+    di_info = None
+    if di_memory:
+      di_records = {'overloads': [], 'voltexceptions': [], 'totals': [], 
+                    'register_names': dss.meters.register_names, 'registers0': dss.meters.totals}
+    for stop in stops:
+      dss_line (dss, 'set number={:d}'.format(stop - step), debug_output)
+      dss_line (dss, 'solve', debug_output)
+      step = stop
+      if di_memory:
+        ## the primitive Y matrices are only complete after the first solve
+        di_info = di_info or di_setup(dss)
+        di_sample(dss, di_info, di_records)
+      if demandinterval:
+        ## every solve rewrites the demand interval files, keep the rows of each chunk
+        dss_line(dss, 'closedi', debug_output)
+        collect_di_rows(dss, di_rows)
+      if not dss.solution.converged:
+        break
+      if (progress is not None) and (progress(step, numsteps, progress_summary(dss)) is False):
+        return {'converged': bool(dss.solution.converged), 'cancelled': True, 'cancel_step': step}
+      if step in (capture_steps or []):
+        states[step] = get_control_state(dss)
+      if (abort_limits is None) or (step not in checks):
+        continue
+      violations = check_limits(dss, **abort_limits)
+      if violations:
+        if debug_output:
+          print ('Solution aborted at step {:d}: {:s}'.format(step, str(violations)))
+        return {'converged': True, 'aborted': True, 'abort_step': step, 'violations': violations}
+    if demandinterval:
+      for fname, lines in di_rows.items():
+        with open(fname, 'w') as f:
+          f.writelines(lines)
   if output:
-    return opendss_output(dss, solnmode, pvnames, debug_output=debug_output, **kwargs)
+    res = opendss_output(dss, solnmode, pvnames, debug_output=debug_output, **kwargs)
+    if capture_steps is not None:
+      res['control_states'] = states
+    if di_memory:
+      res['di_records'] = di_records
+    return res
   
+def event_counts(log) -> dict:
+  """capacitor switching operations, regulator tap changes and relay trips in the event log"""
+  num_cap_switches = 0
+  num_tap_changes = 0
+  num_relay_trips = 0
+  for row in log:
+    if 'Element=Relay' in row:
+      if 'Action=OPENED' in row:
+        num_relay_trips += 1
+    if 'Element=Capacitor' in row:
+      if '**OPENED**' in row or '**CLOSED**' in row:
+        num_cap_switches += 1
+    if 'Element=Regulator' in row:
+      if 'CHANGED' in row and 'TAP' in row:
+        num_tap_changes += abs(int(row.split()[6]))
+  return {'num_cap_switches': num_cap_switches, 'num_tap_changes': num_tap_changes, 'num_relay_trips': num_relay_trips}
+
+def progress_summary(dss) -> dict:
+  """convergence, event counts and energy meter totals of a time series solution so far"""
+  out = {'converged': bool(dss.solution.converged), **event_counts (get_event_log (dss))}
+  dss.meters.first()
+  regs = dict(zip(dss.meters.register_names, dss.meters.register_values))
+  for key, reg in [('kWh_Net', 'kWh'), ('kWh_Load', 'Zone kWh'), ('kWh_Loss', 'Zone Losses kWh'), ('kWh_Gen', 'Gen kWh')]:
+    out[key] = regs.get(reg, 0.0)
+  return out
+
 def opendss_output(dss, solnmode, pvnames, debug_output=True, **kwargs):
   if debug_output:
     print ('{:d} PVSystems and {:d} generators'.format (dss.pvsystems.count, dss.generators.count))
@@ -168,22 +326,15 @@ def opendss_output(dss, solnmode, pvnames, debug_output=True, **kwargs):
   converged = bool(dss.solution.converged)
   if debug_output:
     print ('Converged = ', converged)
-  num_cap_switches = 0
-  num_tap_changes = 0
-  num_relay_trips = 0
-  for row in get_event_log (dss):
-    if ('Action=RESETTING' not in row) and ('Action=**RESET**' not in row) and ('Action=**ARMED**' not in row):
-      if solnmode != 'DUTY' and debug_output:
+  log = get_event_log (dss)
+  if solnmode != 'DUTY' and debug_output:
+    for row in log:
+      if ('Action=RESETTING' not in row) and ('Action=**RESET**' not in row) and ('Action=**ARMED**' not in row):
         print (row)
-    if 'Element=Relay' in row:
-      if 'Action=OPENED' in row:
-        num_relay_trips += 1
-    if 'Element=Capacitor' in row:
-      if '**OPENED**' in row or '**CLOSED**' in row:
-        num_cap_switches += 1
-    if 'Element=Regulator' in row:
-      if 'CHANGED' in row and 'TAP' in row:
-        num_tap_changes += abs(int(row.split()[6]))
+  counts = event_counts (log)
+  num_cap_switches = counts['num_cap_switches']
+  num_tap_changes = counts['num_tap_changes']
+  num_relay_trips = counts['num_relay_trips']
   if debug_output:
     print ('{:4d} capacitor bank switching operations'.format (num_cap_switches))
     print ('{:4d} regulator tap changes'.format (num_tap_changes))
@@ -228,42 +379,46 @@ def opendss_output(dss, solnmode, pvnames, debug_output=True, **kwargs):
     # for name in pvnames:
     #   pvdict[name] = {'kWh':0.0, 'kvarh':0.0, 'vmin':0.0, 'vmax':0.0, 'vmean':0.0, 'vdiff':0.0}
     idx = dss.monitors.first()
-    if idx > 0:
-      hours = np.array(dss.monitors.dbl_hour)
-      dh = hours[1] - hours[0]
+    dh = None
     ## loop over monitor elements
     while idx > 0:
       name = dss.monitors.name # name of monitor
-      elem = dss.monitors.element # name of monitored element
+      meta = monitor_meta(dss, name)
+      elem = meta['elem'] # name of monitored element
       if check_element_status(dss, elem) == 0:
         # element is not active, skip
         idx = dss.monitors.next()
         continue
+      data = monitor_data(dss)
+      if dh is None:
+        hours = data[:, 0] + data[:, 1]/3600.0
+        dh = hours[1] - hours[0]
       if name.endswith('_rec_pq'):
         # recloser pq monitor
         # key = name[0:-7]
         key = elem.split(".")[1]
-        get_pq_monitor(dss, key, elem, name, recdict, dh=dh)
+        _add_monitor_row(recdict, key, name, meta, p=data[:, 2], q=data[:, 3])
       elif name.endswith('_rec_vi'):
         # recloser vi monitor
         # key = name[0:-7]
         key = elem.split(".")[1]
-        get_vi_monitor(dss, key, elem, name, recdict)
+        _add_monitor_row(recdict, key, name, meta, v=data[:, 2], i=data[:, 3])
       elif name.endswith("_volt_vi"):
         # voltage monitor 
         key = name[:-8] #this is the bus name
-        get_vi_monitor(dss, key, elem, name, voltdict)
+        _add_monitor_row(voltdict, key, name, meta, v=data[:, 2], i=data[:, 3])
       elif name.endswith('_pq'):
         # PV system pq monitor
         key = name[0:-3]
-        get_pq_monitor(dss, key, elem, name, pvdict, dh=dh)
-        kWh_PV += pvdict[key]["kWh"]
-        kvarh_PV += pvdict[key]["kvarh"]
+        _add_monitor_row(pvdict, key, name, meta, p=data[:, 2], q=data[:, 3])
       elif name.endswith('_vi'):
         # PV system vi monitor
         key = name[0:-3]
-        get_vi_monitor(dss, key, elem, name, pvdict)
+        _add_monitor_row(pvdict, key, name, meta, v=data[:, 2], i=data[:, 3])
       idx = dss.monitors.next()
+    pvdict, recdict, voltdict = [MonitorTable(d, dh=dh or 0) for d in [pvdict, recdict, voltdict]]
+    kWh_PV = float(np.sum(pvdict.kWh)) if 'p' in pvdict.channels else 0.0
+    kvarh_PV = float(np.sum(pvdict.kvarh)) if 'q' in pvdict.channels else 0.0
 
     dss.meters.first()
     names = dss.meters.register_names
@@ -324,56 +479,346 @@ def opendss_output(dss, solnmode, pvnames, debug_output=True, **kwargs):
           'kWh_OverE':kWh_OverE,
           'dss': dss}
 
-def get_vi_monitor(dss:py_dss_interface.DSSDLL, key:str, elem:str, name:str, d:dict):
-  """update dictionary d at `key` with values from a voltage/current monitor
-  `elem`: name of monitored element
-  `name`: name of monitor object
-  `d`: dictionary to be updated
+def monitor_meta(dss:py_dss_interface.DSSDLL, name:str) -> dict:
+  """element, terminal, basekv and bus of the active monitor `name`, looked up once per compiled 
+  circuit (and monitor definition) and cached"""
+  elem, terminal = dss.monitors.element, dss.monitors.terminal
+  cache = _monitor_meta.setdefault(dss, {})
+  key = (name, elem, terminal)
+  if key not in cache:
+    cache[key] = {'elem': elem, 'terminal': terminal, 
+                  'basekv': get_basekv(dss, elem, terminal), 'bus': get_bus(dss, elem, terminal)}
+  return cache[key]
+
+def variant_bytes(f, mode:int) -> bytes:
+  """raw result of mode of the OpenDSS variant function f (e.g. dss.monitors._dss_obj.MonitorsV).
+  Called through a prototype of its own with the 32 bit (Longint) arguments of the DLL, so the 
+  argtypes that py_dss_interface sets on the shared function are left alone.
+  """
+  addr = ctypes.cast(f, ctypes.c_void_p).value
+  if addr not in _variant_funcs:
+    proto = ctypes.CFUNCTYPE(None, ctypes.c_int32, ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_int32), ctypes.POINTER(ctypes.c_int32))
+    _variant_funcs[addr] = proto(addr)
+  ptr, vtype, size = ctypes.c_void_p(), ctypes.c_int32(), ctypes.c_int32()
+  _variant_funcs[addr](mode, ctypes.byref(ptr), ctypes.byref(vtype), ctypes.byref(size))
+  if not ptr:
+    return b''
+  return ctypes.string_at(ptr, size.value)
+
+def monitor_data(dss:py_dss_interface.DSSDLL) -> np.ndarray:
+  """samples of the active monitor read from its byte stream in one call, 
+  one row per sample with the hour, seconds and channel values (i.e. channel k is column k+1)
+  """
+  raw = variant_bytes(dss.monitors._dss_obj.MonitorsV, 1) # 1: byte stream
+  if not raw:
+    return np.zeros((0, 2))
+  ## header: signature, version, record size (number of channels), mode, 256 character string
+  nch = np.frombuffer(raw, dtype=np.int32, count=4)[2]
+  return np.frombuffer(raw, dtype=np.float32, offset=272).reshape(-1, nch + 2).astype(float)
+
+def _add_monitor_row(rows:dict, key:str, name:str, meta:dict, **channels):
+  """stage the channels of monitor `name` as row `key` of a MonitorTable"""
+  if key not in rows:
+    rows[key] = {'elem': meta['elem'], 'monitor': name, 'basekv': meta['basekv'], 'bus': meta['bus']}
+  rows[key].update(channels)
+
+class MonitorTable(Mapping):
+  """Monitor time series of one kind of element (PV systems, reclosers, voltage monitors),
+  stored as read-only 2-D arrays (element x time) per channel ('v', 'i', 'p', 'q'), 
+  with the statistics of each row calculated at once. 
+  Indexing by key gives a dictionary with the element's metadata, statistics and views of its time series.
+  """
+  def __init__(self, rows:dict, dh=0.0):
+    self.keys_ = list(rows.keys())
+    self.index = {k: n for n, k in enumerate(self.keys_)}
+    self.elem = [r['elem'] for r in rows.values()]
+    self.monitor = [r['monitor'] for r in rows.values()]
+    self.bus = [r['bus'] for r in rows.values()]
+    self.basekv = np.array([r['basekv'] for r in rows.values()], dtype=float)
+    self.channels = {}
+    for ch in ['v', 'i', 'p', 'q']:
+      vals = [r.get(ch) for r in rows.values()]
+      nt = max([len(x) for x in vals if x is not None], default=None)
+      if nt is not None:
+        # rows without this channel (e.g. a missing monitor) are left nan
+        self.channels[ch] = np.vstack([np.full(nt, np.nan) if x is None else x for x in vals])
+        self.channels[ch].setflags(write=False)
+    self.stats = {}
+    if 'v' in self.channels:
+      v, i = self.channels['v'], self.channels['i']
+      self.stats.update({'vmin': v.min(axis=1), 'vmax': v.max(axis=1), 'vmean': v.mean(axis=1),
+                         'vdiff': np.abs(np.diff(v, axis=1)).max(axis=1), 'imin': i.min(axis=1), 'imax': i.max(axis=1)})
+    if 'p' in self.channels:
+      p, q = self.channels['p'], self.channels['q']
+      self.stats.update({'pmin': p.min(axis=1), 'pmax': p.max(axis=1), 'qmin': q.min(axis=1), 'qmax': q.max(axis=1)})
+      if dh > 0:
+        # energy, 0 for rows with missing values
+        self.stats['kWh'] = np.where(np.isnan(p).any(axis=1), 0.0, -trapz(p, dx=dh, axis=1))
+        self.stats['kvarh'] = np.where(np.isnan(q).any(axis=1), 0.0, -trapz(q, dx=dh, axis=1))
+
+  def __getattr__(self, name):
+    ## channels (self.v) and statistics (self.vmin) of all rows
+    if name in ('channels', 'stats'):
+      raise AttributeError(name)
+    if name in self.channels:
+      return self.channels[name]
+    if name in self.stats:
+      return self.stats[name]
+    raise AttributeError(name)
+
+  def __getitem__(self, key) -> dict:
+    n = self.index[key]
+    out = {'elem': self.elem[n], 'monitor': self.monitor[n], 'basekv': self.basekv[n], 'bus': self.bus[n]}
+    for k, v in self.stats.items():
+      out[k] = v[n]
+    for k, v in self.channels.items():
+      out[k] = v[n]
+    return out
+
+  def __iter__(self):
+    return iter(self.keys_)
+
+  def __len__(self):
+    return len(self.keys_)
+
+  def vbase(self) -> np.ndarray:
+    """line to neutral base voltage [V] of each row"""
+    return 1000*self.basekv/np.sqrt(3)
+
+def check_limits(dss:py_dss_interface.DSSDLL, vmin=0.0, vmax=np.inf, emerg=None, emerg_default=100.0, **kwargs) -> dict:
+  """Check the present solution against hard limits.
+  vmin and vmax are limits on the per unit voltage of all (energized) nodes,
+  emerg is a dictionary of allowed loading in percent of the emergency rating by (lower case) element name,
+  with emerg_default used for all other elements. With emerg=None the (slower) thermal check is skipped.
+  Returns a dictionary with the violations found (empty if none), the thermal check stops at the first violation.
+  """
+  out = {}
+  v = np.array(dss.circuit.buses_vmag_pu)
+  v = v[v > 0]
+  if v.min() < vmin:
+    out["vmin"] = v.min()
+  if v.max() > vmax:
+    out["vmax"] = v.max()
+  if emerg is None:
+    return out
+  idx = dss.circuit.pd_element_first()
+  while idx > 0:
+    amps = dss.cktelement.emerg_amps
+    if amps > 0:
+      nc = dss.cktelement.num_conductors
+      loading = 100*max(dss.cktelement.currents_mag_ang[0:2*nc:2])/amps
+      name = dss.cktelement.name.lower()
+      if loading > emerg.get(name, emerg_default):
+        out["emerg"] = {name: loading}
+        break
+    idx = dss.circuit.pd_element_next()
+  return out
+
+def solve_step(dss:py_dss_interface.DSSDLL, step:int, stepsize:int, control_state=None, debug_output=False):
+  """solve time step `step` (1 based) on its own, starting from the present state or control_state.
+  The solution mode (with number=1) must already be set.
   """
-  v = np.array(dss.monitors.channel(1))
-  amps = np.array(dss.monitors.channel(2))
-  if key not in d:
-    d[key] = {}
-    d[key]['elem'] = elem
-    d[key]['monitor'] = name
-    d[key]['basekv'] = get_basekv(dss, elem, dss.monitors.terminal)
-    d[key]['bus'] = get_bus(dss, elem, dss.monitors.terminal)
-    # d[key]['basekv'] = np.unique(get_basekv(dss, elem)).squeeze() # should lead to a single float except for transformers
-  d[key]['vmin'] = np.min(v)
-  d[key]['vmax'] = np.max(v)
-  d[key]['vmean'] = np.mean(v)
-  d[key]['vdiff'] = np.max(np.abs(np.diff(v)))
-  d[key]['imin'] = np.min(amps)
-  d[key]['imax'] = np.max(amps)
-  d[key]['v'] = v
-  d[key]['i'] = amps
-
-def get_pq_monitor(dss:py_dss_interface.DSSDLL, key:str, elem:str, name:str, d:dict, dh=0):
-  p = np.array(dss.monitors.channel(1))
-  q = np.array(dss.monitors.channel(2))
-  if key not in d:
-    d[key] = {}
-    d[key]['elem'] = elem
-    d[key]['monitor'] = name
-    d[key]['basekv'] = get_basekv(dss, elem, dss.monitors.terminal)
-    d[key]['bus'] = get_bus(dss, elem, dss.monitors.terminal)
-    # d[key]['basekv'] = np.unique(get_basekv(dss, elem)).squeeze() # should lead to a single float except for transformers
-  d[key]['pmin'] = np.min(p)
-  d[key]['pmax'] = np.max(p)
-  d[key]['p'] = p
-  d[key]['qmin'] = np.min(q)
-  d[key]['qmax'] = np.max(q)
-  d[key]['q'] = q
-  if dh > 0:
-    # calculate energy
-    ep = 0.0
-    eq = 0.0
-    if np.count_nonzero(np.isnan(p)) < 1:
-      ep = -trapz (p, dx=dh)
-    if np.count_nonzero(np.isnan(q)) < 1:
-      eq = -trapz (q, dx=dh)
-    d[key]['kWh'] = ep
-    d[key]['kvarh'] = eq
+  if control_state is not None:
+    set_control_state(dss, control_state)
+  ## the time is incremented before solving
+  sec = (step - 1)*stepsize
+  dss_line (dss, 'set time=({:d}, {:d})'.format(sec // 3600, sec % 3600), debug_output)
+  dss_line (dss, 'solve', debug_output)
+
+def bus_vmax_pu(dss:py_dss_interface.DSSDLL) -> dict:
+  """highest per unit node voltage of each (lower case) bus in the present solution"""
+  v = np.array(dss.circuit.buses_vmag_pu)
+  out = {}
+  for n, vn in zip(dss.circuit.nodes_names, v):
+    b = n.split('.')[0].lower()
+    if vn > out.get(b, -np.inf):
+      out[b] = vn
+  return out
+
+def branch_flows(dss:py_dss_interface.DSSDLL, kvbase:dict=None) -> dict:
+  """complex power [kVA] flowing into terminal 1 of each enabled power delivery element with an
+  emergency rating, by (lower case) element name: (bus1, power, emergency rating [kVA]).
+  kvbase is an optional dictionary of line to neutral base voltages by bus (see bus_kvbase).
+  """
+  if kvbase is None:
+    kvbase = bus_kvbase(dss)
+  out = {}
+  idx = dss.circuit.pd_element_first()
+  while idx > 0:
+    if (dss.cktelement.emerg_amps > 0) and dss.cktelement.is_enabled:
+      nc = dss.cktelement.num_conductors
+      pq = np.array(dss.cktelement.powers[:2*nc])
+      bus1 = dss.cktelement.bus_names[0].split('.')[0].lower()
+      rating = dss.cktelement.emerg_amps*kvbase.get(bus1, 0)*dss.cktelement.num_phases
+      out[dss.cktelement.name.lower()] = (bus1, complex(pq[0::2].sum(), pq[1::2].sum()), rating)
+    idx = dss.circuit.pd_element_next()
+  return out
+
+def bus_kvbase(dss:py_dss_interface.DSSDLL) -> dict:
+  """line to neutral base voltage [kV] of each (lower case) bus"""
+  out = {}
+  for b in dss.circuit.buses_names:
+    dss.circuit.set_active_bus(b)
+    out[b.lower()] = dss.bus.kv_base
+  return out
+
+def bus_zsc1(dss:py_dss_interface.DSSDLL, buses:list) -> dict:
+  """positive sequence short circuit impedance (r1, x1) [ohm] of the given buses.
+  Requires a solved circuit.
+  """
+  out = {}
+  for b in buses:
+    dss.circuit.set_active_bus(b)
+    dss.bus.zsc_refresh # (property) recalculates the short circuit data of the active bus
+    out[b] = tuple(dss.bus.zsc1)
+  return out
+
+def loadshape_values(dss:py_dss_interface.DSSDLL, name:str, hours) -> np.ndarray:
+  """multipliers of loadshape `name` at the given hours (linear interpolation)"""
+  dss.loadshapes.name = name
+  mult = np.array(dss.loadshapes.p_mult)
+  if dss.loadshapes.hr_interval > 0:
+    t = np.arange(len(mult))*dss.loadshapes.hr_interval
+  else:
+    t = np.array(dss.loadshapes.time_array)
+  return np.interp(hours, t, mult)
+
+def collect_di_rows(dss:py_dss_interface.DSSDLL, di_rows:dict):
+  """append the rows of the interval (DI_*) demand interval files to di_rows (file name: lines)"""
+  path = os.path.join(dss.dssinterface.datapath, dss.circuit.name, "DI_yr_0")
+  for fname in sorted(os.listdir(path)):
+    if fname.startswith("DI_"):
+      fname = os.path.join(path, fname)
+      with open(fname) as f:
+        lines = f.readlines()
+      if fname in di_rows:
+        di_rows[fname].extend(lines[1:]) # skip the header
+      else:
+        di_rows[fname] = lines
+
+def di_setup(dss:py_dss_interface.DSSDLL) -> dict:
+  """index of the present circuit used by di_sample: the Y node voltages needed for the 
+  terminal 1 currents of all rated PD elements (as a sparse product with their primitive Y matrices),
+  and the base voltage and bus of each node. Must be called again after the circuit topology changes.
+  """
+  ynodes = [n.upper() for n in dss.circuit.y_node_order]
+  yidx = {n: i for i, n in enumerate(ynodes)}
+  ny = len(ynodes)
+  kvbase = np.zeros(ny)
+  busidx = np.zeros(ny, dtype=int)
+  for b, bus in enumerate(dss.circuit.buses_names):
+    dss.circuit.set_active_bus(bus)
+    for n in dss.bus.nodes:
+      i = yidx.get(f"{bus.upper()}.{n}")
+      if i is not None:
+        kvbase[i] = dss.bus.kv_base
+        busidx[i] = b
+  rows, cols, elems, names, amps, kvs = [], [], [], [], [], []
+  r0 = 0
+  idx = dss.circuit.pd_element_first()
+  while idx > 0:
+    if (dss.cktelement.norm_amps > 0) and dss.cktelement.is_enabled:
+      nc, nph = dss.cktelement.num_conductors, dss.cktelement.num_phases
+      n = dss.cktelement.num_terminals*nc
+      buses = [b.split(".")[0].upper() for b in dss.cktelement.bus_names]
+      nodes = dss.cktelement.node_order
+      ## ground (node 0) refers to the extra zero voltage appended in di_sample
+      c = [ny if nodes[k] == 0 else yidx[f"{buses[k // nc]}.{nodes[k]}"] for k in range(n)]
+      rows.append(np.repeat(np.arange(r0, r0 + nph), n))
+      cols.append(np.tile(c, nph))
+      elems.append((dss.cktelement.name, nph, n))
+      cls, name = dss.cktelement.name.split(".", 1)
+      names.append(f"{cls}.{name.upper()}") # as in the DI_Overloads file
+      amps.append((dss.cktelement.norm_amps, dss.cktelement.emerg_amps))
+      kvs.append(kvbase[c[0]] if c[0] < ny else 0.0)
+      r0 += nph
+    idx = dss.circuit.pd_element_next()
+  nph = np.array([e[1] for e in elems])
+  info = {"kvbase": kvbase, "busidx": busidx, "buses": dss.circuit.buses_names, "rows": np.concatenate(rows), "cols": np.concatenate(cols),
+          "elems": elems, "names": names, "amps": np.array(amps), "nph": nph, "kvbase_elem": np.array(kvs),
+          "start": np.concatenate([[0], np.cumsum(nph)[:-1]]),
+          "off": np.concatenate([[0], np.cumsum([nph*n for _, nph, n in elems])])}
+  info["y"] = np.zeros(info["off"][-1], dtype=complex)
+  _di_yprims(dss, info, range(len(elems)))
+  ## regulator taps change during the solution, so their Yprim is refreshed in each sample
+  regs = set()
+  i = dss.regcontrols.first()
+  while i > 0:
+    regs.add(f"transformer.{dss.regcontrols.transformer}".lower())
+    i = dss.regcontrols.next()
+  info["regs"] = [e for e, (name, _, _) in enumerate(elems) if name.lower() in regs]
+  return info
+
+def _di_yprims(dss:py_dss_interface.DSSDLL, info:dict, which):
+  """copy the terminal 1 phase rows of the Yprim of elements `which` into info["y"]"""
+  for e in which:
+    name, nph, n = info["elems"][e]
+    dss.circuit.set_active_element(name)
+    yp = np.frombuffer(variant_bytes(dss.cktelement._dss_obj.CktElementV, 12)) # 12: y_prim
+    info["y"][info["off"][e]:info["off"][e+1]] = (yp[0::2] + 1j*yp[1::2]).reshape(n, n)[:nph, :].ravel()
+
+def di_sample(dss:py_dss_interface.DSSDLL, info:dict, rec:dict):
+  """append the demand interval results of the present solution to rec, with the same rows as the
+  DI_Overloads, DI_VoltExceptions and DI_Totals files (the latter as the raw meter register totals).
+  info comes from di_setup.
+  """
+  hour = dss.solution.dbl_hour
+  _di_yprims(dss, info, info["regs"])
+  v = np.frombuffer(variant_bytes(dss.circuit._dss_obj.CircuitV, 18)) # 18: y_node_varray
+  v = np.append(v[0::2] + 1j*v[1::2], 0)
+  iv = info["y"]*v[info["cols"]]
+  cur = np.abs(np.bincount(info["rows"], weights=iv.real) + 1j*np.bincount(info["rows"], weights=iv.imag))
+  imax = np.maximum.reduceat(cur, info["start"])
+  pnorm = 100*imax/info["amps"][:, 0]
+  for e in np.flatnonzero(pnorm > 100):
+    iph = list(cur[info["start"][e]:info["start"][e] + min(info["nph"][e], 3)])
+    rec["overloads"].append([hour, info["names"][e], *info["amps"][e], pnorm[e], 100*imax[e]/info["amps"][e, 1],
+                             info["kvbase_elem"][e], *iph, *[0.0]*(3 - len(iph))])
+  vmin, vmax = dss.settings.norm_vmin_pu, dss.settings.norm_vmax_pu
+  kvbase = info["kvbase"]
+  vpu = np.abs(v[:-1])/(1000*np.where(kvbase > 0, kvbase, np.inf))
+  row = [hour]
+  for sel in [kvbase > 1.0, (kvbase > 0) & (kvbase <= 1.0)]:
+    vs, b = vpu[sel], info["busidx"][sel]
+    b, vs = b[vs > 0], vs[vs > 0]
+    if len(vs) == 0:
+      # no energized nodes in this class, as written by OpenDSS
+      row += [0, vmax, 0, vmin, "", ""]
+      continue
+    kmin, kmax = vs.argmin(), vs.argmax()
+    row += [len(np.unique(b[vs < vmin])), vs[kmin], len(np.unique(b[vs > vmax])), vs[kmax],
+            info["buses"][b[kmin]], info["buses"][b[kmax]]]
+  rec["voltexceptions"].append(row)
+  rec["totals"].append([hour] + list(dss.meters.totals))
+
+def get_control_state(dss:py_dss_interface.DSSDLL) -> dict:
+  """transformer taps and capacitor states of the present solution"""
+  out = {"taps": {}, "capacitors": {}}
+  i = dss.transformers.first()
+  while i > 0:
+    name = dss.transformers.name
+    taps = []
+    for w in range(1, dss.transformers.num_windings + 1):
+      dss.transformers.wdg = w
+      taps.append(dss.transformers.tap)
+    out["taps"][name] = taps
+    i = dss.transformers.next()
+  i = dss.capacitors.first()
+  while i > 0:
+    out["capacitors"][dss.capacitors.name] = dss.capacitors.states
+    i = dss.capacitors.next()
+  return out
+
+def set_control_state(dss:py_dss_interface.DSSDLL, state:dict):
+  """set transformer taps and capacitor states obtained via get_control_state"""
+  for name, taps in state["taps"].items():
+    dss.transformers.name = name
+    for w, tap in enumerate(taps):
+      dss.transformers.wdg = w + 1
+      dss.transformers.tap = tap
+  for name, states in state["capacitors"].items():
+    dss.capacitors.name = name
+    dss.capacitors.states = states
 
 def check_element_status(dss:py_dss_interface.DSSDLL, elemname:str) -> int:
   index_str = dss.circuit.set_active_element(elemname)
@@ -306,53 +306,59 @@ def get_first_shunt_name (shunts, nclass):
       return toks[1]
   return '**NOT FOUND**'
 
+GRAPH_DIRS = ["pvder", "gender", "batder", "largeder", "resloads", "bus3phase", "all3phase"]
+
+def parse_opendss_node (G, n):
+  """entries of node n in the dictionaries of parse_opendss_graph (by dictionary name), and its load kW"""
+  out = {}
+  if 'ndata' not in G.nodes()[n] or 'nclass' not in G.nodes()[n]:
+    return out, 0.0
+  ndata = G.nodes()[n]['ndata']
+  nclass = G.nodes()[n]['nclass']
+  bus = n
+  nomkv = ndata['nomkv']
+  phases = ndata['phases']
+  if nclass == 'solar':
+    kva = ndata['pvkva']
+    key = get_first_shunt_name (ndata['shunts'], 'pvsystem')
+    out['pvder'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['pvkw'], 'phases':phases}}
+    if kva >= 100.0:
+      out['largeder'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['pvkw'], 'phases':phases, 'type':'solar'}}
+  elif nclass == 'generator':
+    kva = ndata['genkva']
+    key = get_first_shunt_name (ndata['shunts'], 'generator')
+    out['gender'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['genkw'], 'phases':phases}}
+    if kva >= 100.0:
+      out['largeder'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['genkw'], 'phases':phases, 'type':'generator'}}
+  elif nclass == 'storage':
+    kva = ndata['batkva']
+    key = get_first_shunt_name (ndata['shunts'], 'storage')
+    out['batder'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['batkw'], 'kwh':ndata['batkwh'], 'phases':phases}}
+    if kva >= 100.0:
+      out['largeder'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['batkw'], 'kwh':ndata['batkwh'], 'phases':phases, 'type':'storage'}}
+  elif nclass == 'load':
+    kw = ndata['loadkw']
+    if (phases == 2) and (nomkv < 1.0):
+      key = get_first_shunt_name (ndata['shunts'], 'load')
+      out['resloads'] = {key: {'bus':bus, 'kv':nomkv, 'kva':kw, 'phases': phases, 'derkw': get_der_kw(kw)}}
+  elif (nclass == 'bus') and (phases > 2):
+    out['bus3phase'] = {bus: {'kv':nomkv}}
+  
+  # collect all 3 phase buses
+  if phases > 2:
+    out['all3phase'] = {bus: {'kv':nomkv}}
+  return out, ndata['loadkw']
+
 def parse_opendss_graph (G, bSummarize=True):
-  pvder = {}
-  gender = {}
-  batder = {}
-  largeder = {}
-  resloads = {}
-  bus3phase = {}
-  all3phase = {}
+  dirs = {key: {} for key in GRAPH_DIRS}
   loadkw = 0.0
 
   for n in G.nodes():
-    if 'ndata' in G.nodes()[n] and 'nclass' in G.nodes()[n]:
-      ndata = G.nodes()[n]['ndata']
-      nclass = G.nodes()[n]['nclass']
-      bus = n
-      nomkv = ndata['nomkv']
-      phases = ndata['phases']
-      loadkw += ndata['loadkw']
-      if nclass == 'solar':
-        kva = ndata['pvkva']
-        key = get_first_shunt_name (ndata['shunts'], 'pvsystem')
-        pvder[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['pvkw'], 'phases':phases}
-        if kva >= 100.0:
-          largeder[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['pvkw'], 'phases':phases, 'type':'solar'}
-      elif nclass == 'generator':
-        kva = ndata['genkva']
-        key = get_first_shunt_name (ndata['shunts'], 'generator')
-        gender[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['genkw'], 'phases':phases}
-        if kva >= 100.0:
-          largeder[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['genkw'], 'phases':phases, 'type':'generator'}
-      elif nclass == 'storage':
-        kva = ndata['batkva']
-        key = get_first_shunt_name (ndata['shunts'], 'storage')
-        batder[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['batkw'], 'kwh':ndata['batkwh'], 'phases':phases}
-        if kva >= 100.0:
-          largeder[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'kw':ndata['batkw'], 'kwh':ndata['batkwh'], 'phases':phases, 'type':'storage'}
-      elif nclass == 'load':
-        kw = ndata['loadkw']
-        if (phases == 2) and (nomkv < 1.0):
-          key = get_first_shunt_name (ndata['shunts'], 'load')
-          resloads[key] = {'bus':bus, 'kv':nomkv, 'kva':kva, 'phases': phases, 'derkw': get_der_kw(kw)}
-      elif (nclass == 'bus') and (phases > 2):
-        bus3phase[bus] = {'kv':nomkv}
-      
-      # collect all 3 phase buses
-      if phases > 2:
-        all3phase[bus] = {'kv':nomkv}
+    entries, kw = parse_opendss_node (G, n)
+    loadkw += kw
+    for key, rows in entries.items():
+      dirs[key].update(rows)
+  pvder, gender, batder, largeder, resloads, bus3phase, all3phase = [dirs[key] for key in GRAPH_DIRS]
 
   if bSummarize:
     print ('\nLARGE_DER')
@@ -0,0 +1,193 @@
+# Copyright (C) 2023 Battelle Memorial Institute
+# file: solver_service.py
+"""Long-lived OpenDSS solver processes that keep the test feeders compiled
+
+Every call of run_opendss loads OpenDSS and compiles the feeder before it can
+solve. A SolverService starts worker processes that each keep one feeder
+compiled. A request (change lines and solve settings) is passed over a pipe
+to an idle worker of its feeder, solved with run_opendss on the compiled
+circuit, and the result returned. The worker then compiles its feeder again
+while it waits for the next request, so every request is solved on a freshly
+compiled circuit, but without the compile (and startup) latency. Concurrent
+requests for a feeder are spread over its workers. A worker that dies (e.g.
+crashed by OpenDSS) is restarted, and the request it was solving is retried
+once.
+
+Example::
+
+    import i2x.api as i2x
+
+    if __name__ == "__main__":
+      with i2x.SolverService(feeders=['ieee9500']) as svc:
+        d = svc.run('ieee9500', change_lines, pvcurve='pcloud', loadmult=1.0, ...)
+
+Workers are spawned, so a calling script must be protected by ``if __name__ == "__main__":``
+"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import Future
+from .opendss_interface import initialize_opendss, run_opendss
+
+FEEDERS = ['ieee9500', 'ieee_lvn', 'radial']
+
+def _solver_worker(conn, choice, workdir):
+  """worker process loop: solve requests on the compiled feeder until None is received"""
+  os.chdir(workdir) # run_opendss writes its demand interval files to the cwd
+  dss = initialize_opendss(choice, debug_output=False)
+  conn.send(('ready', None))
+  while True:
+    try:
+      msg = conn.recv()
+    except EOFError:
+      break
+    if msg is None:
+      break
+    if msg == 'cancel': # arrived after the run it was meant for had finished
+      continue
+    req, with_progress = msg
+    def progress(step, numsteps, partial):
+      conn.send(('progress', (step, numsteps, partial)))
+      while conn.poll():
+        if conn.recv() == 'cancel':
+          return False
+      return True
+    try:
+      res = run_opendss(**{**req, 'choice': choice, 'dss': dss, 'progress': progress if with_progress else None})
+      conn.send(('ok', None if res is None else {k: v for k, v in res.items() if k != 'dss'}))
+    except Exception:
+      conn.send(('error', traceback.format_exc()))
+    ## compile the feeder for the next request while waiting for it
+    dss = initialize_opendss(choice, debug_output=False)
+  conn.close()
+
+class SolverService:
+  """Pool of nproc worker processes per feeder, each keeping its feeder compiled.
+  submit() queues a request and returns a concurrent.futures.Future of the run_opendss result,
+  cancel() stops it.
+  """
+  def __init__(self, feeders=FEEDERS, nproc=1):
+    self.nproc = nproc
+    self.ctx = multiprocessing.get_context('spawn')
+    self.workdir = tempfile.mkdtemp(prefix='i2x_solver_')
+    self.queues = {choice: queue.Queue() for choice in feeders}
+    self.workers = []
+    self.threads = []
+    self.cancelling = set()
+    for choice in feeders:
+      for i in range(nproc):
+        t = threading.Thread(target=self._dispatch, args=(choice, len(self.workers)), daemon=True)
+        self.workers.append(self._start_worker(choice))
+        self.threads.append(t)
+        t.start()
+
+  def _start_worker(self, choice):
+    conn, child = self.ctx.Pipe()
+    proc = self.ctx.Process(target=_solver_worker, args=(child, choice, tempfile.mkdtemp(dir=self.workdir)), daemon=True)
+    proc.start()
+    child.close()
+    return proc, conn
+
+  def _restart_worker(self, choice, i):
+    """replace worker i, which died, by a new one. Returns the exit code of the old one"""
+    proc, conn = self.workers[i]
+    proc.join(timeout=10)
+    if proc.is_alive():
+      proc.terminate()
+      proc.join()
+    conn.close()
+    self.workers[i] = self._start_worker(choice)
+    return proc.exitcode
+
+  def _dispatch(self, choice, i):
+    """pass the requests of a feeder to worker i, one at a time. A worker that died is restarted,
+    and a request it died on is retried once on the new worker"""
+    proc, conn = self.workers[i]
+    ready = False
+    while True:
+      job = self.queues[choice].get()
+      if job is None:
+        try:
+          conn.send(None)
+        except OSError: # the worker died in the meantime
+          pass
+        return
+      fut, req, progress = job
+      if not fut.set_running_or_notify_cancel():
+        continue
+      for attempt in range(2):
+        if not proc.is_alive():
+          ## died while idle (e.g. compiling for this request), not the request's fault
+          self._restart_worker(choice, i)
+          proc, conn = self.workers[i]
+          ready = False
+        try:
+          if not ready:
+            conn.recv()
+            ready = True
+          conn.send((req, progress is not None))
+          while True:
+            status, val = conn.recv()
+            if status != 'progress':
+              break
+            progress(*val)
+            if fut in self.cancelling:
+              conn.send('cancel')
+          break
+        except (EOFError, OSError):
+          ## OpenDSS crashed the worker while solving, retry on a new one
+          status, val = 'died', self._restart_worker(choice, i)
+          proc, conn = self.workers[i]
+          ready = False
+      self.cancelling.discard(fut)
+      if status == 'ok':
+        fut.set_result(val)
+      elif status == 'died':
+        fut.set_exception(RuntimeError('SolverService: the {:s} worker died twice on the request (exit code {:s})'.format(choice, str(val))))
+      else:
+        fut.set_exception(RuntimeError('SolverService: run_opendss failed on {:s}\n{:s}'.format(choice, val)))
+
+  def submit(self, choice, change_lines=None, progress=None, **settings):
+    """queue a run_opendss of feeder choice with change_lines and settings (the other arguments of run_opendss).
+    progress(step, numsteps, partial) is called with the results so far (see run_opendss) from a thread of the service.
+    """
+    if choice not in self.queues:
+      raise ValueError('SolverService: feeder {:s} is not served, use one of {:s}'.format(choice, str(list(self.queues))))
+    settings.pop('dss', None)
+    fut = Future()
+    self.queues[choice].put((fut, {'debug_output': False, **settings, 'change_lines': change_lines}, progress))
+    return fut
+
+  def cancel(self, fut):
+    """cancel a request. A queued one is dropped, a running one submitted with progress stops 
+    at its next progress step and returns {'cancelled': True, ...}"""
+    if (not fut.cancel()) and (not fut.done()):
+      self.cancelling.add(fut)
+
+  def run(self, choice, change_lines=None, **settings):
+    """run_opendss of feeder choice on the service, waiting for the result"""
+    return self.submit(choice, change_lines, **settings).result()
+
+  def close(self):
+    """finish the queued requests and stop the workers"""
+    for q in self.queues.values():
+      for i in range(self.nproc):
+        q.put(None)
+    for t in self.threads:
+      t.join()
+    for proc, conn in self.workers:
+      proc.join(timeout=10)
+      if proc.is_alive():
+        proc.terminate()
+      conn.close()
+    shutil.rmtree(self.workdir, ignore_errors=True)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
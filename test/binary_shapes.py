@@ -0,0 +1,47 @@
+import os
+import glob
+import time
+import numpy as np
+import pkg_resources
+import i2x.api as i2x
+from i2x import feeder_cache
+
+settings = {'pvcurve': 'pcloud', 'invmode': 'CONSTANT_PF', 'invpf': 1.0, 'loadmult': 1.0, 'loadcurve': 'DEFAULT',
+            'stepsize': 300, 'numsteps': 288, 'solnmode': 'DAILY', 'ctrlmode': 'STATIC', 'debug_output': False}
+keys = ['converged', 'num_tap_changes', 'vminpu', 'vmaxpu', 'kWh_Load', 'kWh_Loss', 'kWh_PV']
+
+if __name__ == "__main__":
+  ## the memory mapped shapes should hold the values of the text files
+  for choices in [i2x.solarChoices, i2x.loadChoices]:
+    for key, row in choices.items():
+      if 'file' in row:
+        t = time.time()
+        ref = np.loadtxt(pkg_resources.resource_filename('i2x', 'models/support/' + row['file']))
+        t_text = time.time() - t
+        i2x.load_shape(row) # convert if needed
+        t = time.time()
+        data = i2x.load_shape(row)
+        t_map = time.time() - t
+        single = i2x.load_shape({**row, 'dtype': 'float32'})
+        print ('{:s}: {:d} points, load {:.4f} s from text, {:.4f} s mapped, match = {:s}, float32 max error = {:.3e}'.format(key,
+               len(data), t_text, t_map, str(np.array_equal(data, ref)), np.max(np.abs(single - ref))))
+
+  ## the shapes resampled to the time step should not change the solution
+  ref = i2x.run_opendss('ieee9500', **settings)
+  lines = [i2x.resampled_shape_line('pcloud', i2x.solarChoices['pcloud'], settings['stepsize'], settings['numsteps']),
+           i2x.resampled_shape_line('qdaily', i2x.loadChoices['qdaily'], settings['stepsize'], settings['numsteps'])]
+  d = i2x.run_opendss('ieee9500', change_lines=lines, **settings)
+  print ('resampled: kWh_Loss {:.3f} vs. {:.3f}, match = {:s}'.format(d['kWh_Loss'], ref['kWh_Loss'], str(all(d[k] == ref[k] for k in keys))))
+
+  ## only the most recently used resampled files of a loadshape are kept
+  for n in range(1, 12):
+    i2x.resampled_shape_line('qdaily', i2x.loadChoices['qdaily'], settings['stepsize'], n)
+  kept = glob.glob(os.path.join(feeder_cache.cache_dir(), 'shapes', 'qdaily-*x*-*'))
+  print ('resampled files kept: {:d}'.format(len(kept)))
+
+  ## without a writable cache, the text files are read and the resampled values are given in the command
+  os.environ['I2X_CACHE'] = os.path.join(os.devnull, 'i2x')
+  ref = np.loadtxt(pkg_resources.resource_filename('i2x', 'models/support/pcloud.dat'))
+  data = i2x.load_shape(i2x.solarChoices['pcloud'])
+  line = i2x.resampled_shape_line('pcloud', i2x.solarChoices['pcloud'], settings['stepsize'], settings['numsteps'])
+  print ('no cache: match = {:s}, inline values = {:s}'.format(str(np.array_equal(data, ref)), str('dblfile' not in line)))
@@ -0,0 +1,44 @@
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+import i2x.api as i2x
+from i2x import feeder_cache
+
+def loadshapes(dss):
+  out = {}
+  for name in dss.loadshapes.names:
+    dss.loadshapes.name = name
+    out[name] = np.array(dss.loadshapes.p_mult)
+  return out
+
+if __name__ == "__main__":
+  ## the cached feeders should compile faster to the same circuit
+  for choice in ['ieee9500', 'ieee_lvn', 'radial']:
+    t = time.time()
+    dss = i2x.initialize_opendss(choice, debug_output=False, feeder_cache=False)
+    t_text = time.time() - t
+    ref = (dss.circuit.num_ckt_elements, dss.circuit.nodes_names, loadshapes(dss))
+    i2x.initialize_opendss(choice, debug_output=False) # build the cache if needed
+    t = time.time()
+    dss = i2x.initialize_opendss(choice, debug_output=False)
+    t_cache = time.time() - t
+    match = (dss.circuit.num_ckt_elements == ref[0]) and (dss.circuit.nodes_names == ref[1]) and \
+            all(np.array_equal(v, ref[2][k]) for k, v in loadshapes(dss).items()) and (len(ref[2]) == len(loadshapes(dss)))
+    print ('{:s}: compile {:.3f} s from text, {:.3f} s cached, match = {:s}'.format(choice, t_text, t_cache, str(match)))
+
+  ## a change of a model file invalidates the cache
+  with tempfile.TemporaryDirectory() as tmp:
+    os.environ['I2X_CACHE'] = os.path.join(tmp, 'cache')
+    models = os.path.join(os.path.dirname(feeder_cache.__file__), 'models')
+    for d in ['radial', 'support']:
+      shutil.copytree(os.path.join(models, d), os.path.join(tmp, d))
+    base1 = feeder_cache.cached_base('radial', os.path.join(tmp, 'radial'))
+    with open(os.path.join(tmp, 'support', 'qdaily.dat'), 'a') as f:
+      f.write('1.0\n')
+    base2 = feeder_cache.cached_base('radial', os.path.join(tmp, 'radial'))
+    print ('rebuilt = {:s}, old version removed = {:s}'.format(str(base1 != base2), str(not os.path.exists(base1))))
+    ## a version with other loadshape dtypes does not remove the current one
+    base3 = feeder_cache.cached_base('radial', os.path.join(tmp, 'radial'), {'qdaily': 'float32'})
+    print ('other dtypes: built = {:s}, kept = {:s}'.format(str(base3 != base2), str(os.path.exists(base2) and os.path.exists(base3))))
@@ -0,0 +1,66 @@
+import time
+import i2x.api as i2x
+
+settings = {'pvcurve': 'pcloud', 'invmode': 'CONSTANT_PF', 'invpf': 1.0, 'loadmult': 1.0, 'loadcurve': 'DEFAULT',
+            'stepsize': 300, 'numsteps': 288, 'solnmode': 'DAILY', 'ctrlmode': 'STATIC', 'debug_output': False}
+keys = ['converged', 'num_tap_changes', 'vminpu', 'vmaxpu', 'kWh_Load', 'kWh_Loss', 'kWh_PV']
+
+if __name__ == "__main__":
+  ## results of the service should match those of compiling for every run
+  t = time.time()
+  ref = {}
+  for choice in ['ieee9500', 'ieee_lvn']:
+    for loadmult in [0.8, 1.0]:
+      ref[(choice, loadmult)] = i2x.run_opendss(choice, **{**settings, 'loadmult': loadmult})
+  t_direct = time.time() - t
+
+  with i2x.SolverService() as svc:
+    for choice in ['ieee9500', 'ieee_lvn']: # wait for the workers to start
+      svc.run(choice, **settings)
+    t = time.time()
+    futs = {key: svc.submit(key[0], **{**settings, 'loadmult': key[1]}) for key in ref}
+    res = {key: fut.result() for key, fut in futs.items()}
+    t_service = time.time() - t
+    ## requests on the same worker must not see the changes of earlier ones
+    lines = ['new pvsystem.pvtest bus1=m1047515 phases=3 kv=4.16 kva=3000 pmpp=3000']
+    d = svc.run('ieee9500', lines, **settings)
+    res_after = svc.run('ieee9500', **settings)
+    ## progress of a run solved in chunks, and cancelling a run at its first progress step
+    steps = []
+    d_progress = svc.run('ieee9500', progress=lambda step, numsteps, partial: steps.append((step, partial['kWh_Load'])), **settings)
+    futs = []
+    fut = svc.submit('ieee9500', progress=lambda step, numsteps, partial: svc.cancel(futs[0]), **settings)
+    futs.append(fut)
+    d_cancel = fut.result()
+    ## a worker killed while idle is replaced before the request is sent,
+    ## one killed while solving is replaced and the request retried
+    proc = svc.workers[0][0]
+    proc.kill()
+    proc.join()
+    d_idle = svc.run('ieee9500', **settings)
+    killed = []
+    def kill_once(step, numsteps, partial):
+      if not killed:
+        killed.append(step)
+        svc.workers[0][0].kill()
+    d_retry = svc.run('ieee9500', progress=kill_once, **settings)
+    ## a failed run (the radial daily solution fails in opendss_output) is raised by the future
+    failed = []
+    for i in range(2):
+      try:
+        svc.run('radial', **settings)
+      except RuntimeError as e:
+        failed.append(str(e).splitlines()[0])
+
+  for key, d_ref in ref.items():
+    match = all(res[key][k] == d_ref[k] for k in keys)
+    print ('{:s} loadmult={:.1f}: kWh_Loss {:.3f} vs. {:.3f}, match = {:s}'.format(key[0], key[1], res[key]['kWh_Loss'], d_ref['kWh_Loss'], str(match)))
+  print ('with pvtest kWh_PV = {:.3f}, after kWh_PV = {:.3f}, match = {:s}'.format(d['kWh_PV'], res_after['kWh_PV'],
+         str(all(res_after[k] == ref[('ieee9500', 1.0)][k] for k in keys))))
+  print ('{:d} progress steps, kWh_Load {:.3f} at step {:d}, match = {:s}'.format(len(steps), steps[0][1], steps[0][0],
+         str(all(d_progress[k] == ref[('ieee9500', 1.0)][k] for k in keys))))
+  print ('cancelled run:', d_cancel)
+  print ('radial:', failed)
+  print ('killed worker: match = {:s} (idle), {:s} (solving)'.format(str(all(d_idle[k] == ref[('ieee9500', 1.0)][k] for k in keys)),
+         str(all(d_retry[k] == ref[('ieee9500', 1.0)][k] for k in keys))))
+  print ('{:d} runs: {:.1f} s direct vs. {:.1f} s on the service'.format(len(ref), t_direct, t_service))